@@ -0,0 +1,19 @@
+from rest_framework import filters
+from products.search import search_products, search_rank
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Busca de produtos pelo índice de texto do banco (ver products.search) em
+    vez de ``icontains``, anotando a relevância como ``search_rank``.
+
+    Sem busca, ``search_rank`` é anotado como constante para que a ordenação
+    por ele continue válida.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        q = " ".join(self.get_search_terms(request))
+        rank = search_rank(queryset, q)
+        if q:
+            queryset = search_products(queryset, q)
+        return queryset.annotate(search_rank=rank)
@@ -0,0 +1,120 @@
+import json
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from products.pagination import (
+    convert_values,
+    json_value,
+    keyset_filter,
+    ordering_fields,
+)
+
+
+class StableCursorPagination(CursorPagination):
+    """
+    Paginação por cursor com tamanho de página limitado.
+
+    Usa a ordenação do OrderingFilter (ou o atributo ``ordering`` da view) e
+    acrescenta a chave primária como desempate na mesma direção: com valores
+    repetidos no campo ordenado (preço, estoque...), a ordem continua total e
+    nenhuma linha se repete ou some entre páginas.
+
+    A posição do cursor guarda os valores de todas as colunas da ordenação, e
+    não só da primeira como no CursorPagination do DRF: a página seguinte
+    começa com o mesmo filtro por tupla das listagens HTML
+    (``products.pagination.keyset_filter``), sem OFFSET para pular empates.
+    Os campos ordenáveis não podem ser nulos.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "-pk"
+
+    def get_ordering(self, request, queryset, view):
+        backends = getattr(view, "filter_backends", [])
+        if any(hasattr(backend, "get_ordering") for backend in backends):
+            ordering = tuple(super().get_ordering(request, queryset, view))
+        else:
+            ordering = getattr(view, "ordering", None) or self.ordering
+            if isinstance(ordering, str):
+                ordering = (ordering,)
+            ordering = tuple(ordering)
+
+        if ordering[-1].lstrip("-") not in ("pk", "id"):
+            prefix = "-" if ordering[0].startswith("-") else ""
+            ordering += (f"{prefix}pk",)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+
+        if position is not None:
+            try:
+                values = json.loads(position)
+            except ValueError:
+                values = None
+            values = convert_values(ordering_fields(queryset, self.ordering), values)
+            if values is None:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                keyset_filter(self.ordering, values, reverse=reverse)
+            )
+        if reverse:
+            queryset = queryset.order_by(
+                *(
+                    field[1:] if field.startswith("-") else f"-{field}"
+                    for field in self.ordering
+                )
+            )
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        # Posições únicas: o deslocamento só vem de cursores antigos
+        results = list(queryset[offset : offset + self.page_size + 1])
+        self.page = results[: self.page_size]
+        following = (
+            self._get_position_from_instance(results[-1], self.ordering)
+            if len(results) > len(self.page)
+            else None
+        )
+
+        current = position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = current, following is not None
+            self.next_position, self.previous_position = position, following
+        else:
+            self.has_next, self.has_previous = following is not None, current
+            self.next_position, self.previous_position = following, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        # Texto JSON com os valores de todas as colunas: o DRF compara posições
+        # como texto e as grava no parâmetro "p" do cursor
+        values = [getattr(instance, field.lstrip("-")) for field in ordering]
+        return json.dumps(values, default=json_value)
+
+
+class HistoryCursorPagination(StableCursorPagination):
+    """
+    Paginação do histórico de um produto (preços ou movimentações), sempre do
+    registro mais recente para o mais antigo, independente do OrderingFilter
+    da view.
+    """
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def get_ordering(self, request, queryset, view):
+        return (self.ordering, "-pk")
@@ -1,6 +1,17 @@
 from rest_framework import serializers
-from products.models import Category, Product, PriceHistory, ProductMovement
+from products.models import (
+    Category,
+    MovementRollup,
+    Product,
+    PriceHistory,
+    ProductMovement,
+)
 from django.contrib.auth.models import User
+from drf_spectacular.utils import extend_schema_field
+
+# Registros mais recentes embutidos no detalhe do produto; o histórico completo
+# fica nos sub-recursos paginados /products/{id}/price-history/ e /movements/
+HISTORY_PREVIEW_SIZE = 10
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -19,7 +30,7 @@ class CategorySerializer(serializers.ModelSerializer):
 class PriceHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = PriceHistory
-        fields = ["id", "price", "changed_at"]
+        fields = ["id", "price", "previous_price", "delta", "pct_change", "changed_at"]
 
 
 class ProductMovementSerializer(serializers.ModelSerializer):
@@ -38,6 +49,77 @@ class ProductMovementSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["product", "moved_at"]
 
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("A quantidade deve ser maior que zero.")
+        return value
+
+
+class MovementRollupQuerySerializer(serializers.Serializer):
+    """Parâmetros da série de movimentações por período."""
+
+    bucket = serializers.ChoiceField(
+        choices=list(MovementRollup.BUCKETS), default="day", required=False
+    )
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    product = serializers.IntegerField(required=False)
+    category = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError(
+                "A data inicial deve ser anterior à data final."
+            )
+        return attrs
+
+
+class MovementRollupSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    in_quantity = serializers.IntegerField()
+    out_quantity = serializers.IntegerField()
+    in_count = serializers.IntegerField()
+    out_count = serializers.IntegerField()
+    net_flow = serializers.IntegerField()
+
+
+class InventoryAsOfQuerySerializer(serializers.Serializer):
+    """Parâmetros da consulta de inventário em uma data."""
+
+    date = serializers.DateField(required=False)
+
+
+class InventoryAsOfSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    snapshot_date = serializers.DateField(allow_null=True)
+    replayed_products = serializers.IntegerField()
+    total_count = serializers.IntegerField()
+    total_stock = serializers.IntegerField()
+    total_value = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+
+class DashboardCategorySerializer(serializers.Serializer):
+    id = serializers.IntegerField(source="category_id")
+    name = serializers.CharField(source="category.name")
+    color = serializers.CharField(source="category.color")
+    product_count = serializers.IntegerField()
+    total_stock = serializers.IntegerField()
+    total_value = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+
+class DashboardTrendSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    total_stock = serializers.IntegerField()
+    total_value = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+
+class DashboardSerializer(serializers.Serializer):
+    total_count = serializers.IntegerField()
+    total_stock = serializers.IntegerField()
+    total_value = serializers.DecimalField(max_digits=18, decimal_places=2)
+    categories = DashboardCategorySerializer(many=True)
+    trend = DashboardTrendSerializer(many=True)
+
 
 class ProductSerializer(serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
@@ -65,10 +147,29 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["user", "created_at", "updated_at"]
 
+    def validate_stock(self, value):
+        if value < 0:
+            raise serializers.ValidationError(
+                "Ops! Você não pode ter um estoque menor que zero."
+            )
+        return value
+
 
 class ProductDetailSerializer(ProductSerializer):
-    price_history = PriceHistorySerializer(many=True, read_only=True)
-    movements = ProductMovementSerializer(many=True, read_only=True)
+    price_history = serializers.SerializerMethodField()
+    movements = serializers.SerializerMethodField()
 
     class Meta(ProductSerializer.Meta):
         fields = ProductSerializer.Meta.fields + ["price_history", "movements"]
+
+    @extend_schema_field(PriceHistorySerializer(many=True))
+    def get_price_history(self, obj):
+        entries = obj.price_history.order_by("-changed_at", "-pk")
+        return PriceHistorySerializer(entries[:HISTORY_PREVIEW_SIZE], many=True).data
+
+    @extend_schema_field(ProductMovementSerializer(many=True))
+    def get_movements(self, obj):
+        movements = obj.movements.order_by("-moved_at", "-pk")
+        return ProductMovementSerializer(
+            movements[:HISTORY_PREVIEW_SIZE], many=True
+        ).data
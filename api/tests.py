@@ -1,9 +1,20 @@
+import json
 import pytest
+from base64 import b64encode
+from datetime import timedelta
+from urllib.parse import urlencode
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
 from products.models import Product, Category, ProductMovement
+from api.pagination import StableCursorPagination
+from api.serializers import HISTORY_PREVIEW_SIZE
+from products.services import register_movement
 
 
 @pytest.fixture
@@ -122,9 +133,385 @@ class TestMovementAPI:
         Testa a realização de um movimento de entrada (IN) de estoque.
         Verifica que o estoque do produto é aumentado corretamente.
         """
+        url = reverse("product-movement", kwargs={"pk": product.pk})
+        response = auth_client.post(url, {"type": "IN", "quantity": 5})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["quantity"] == 5
+        product.refresh_from_db()
+        assert product.stock == 15
 
     def test_perform_out_movement_insufficient_stock(self, auth_client, product):
         """
         Testa que não é possível realizar um movimento de saída (OUT)
         quando o estoque é insuficiente.
         """
+        url = reverse("product-movement", kwargs={"pk": product.pk})
+        response = auth_client.post(url, {"type": "OUT", "quantity": 11})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        product.refresh_from_db()
+        assert product.stock == 10
+        assert not ProductMovement.objects.filter(product=product, type="OUT").exists()
+
+    def test_rollup_series(self, auth_client, user, product):
+        """
+        Testa a série de movimentações por período lida das linhas diárias,
+        com filtro por categoria e validação do agrupamento.
+        """
+        register_movement(product, "OUT", 3)
+        register_movement(product, "IN", 5)
+        Product.objects.create(user=user, name="Sem categoria", price=1, stock=4)
+
+        url = reverse("movement-rollup")
+        response = auth_client.get(url, {"bucket": "month"})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+        assert response.data[0]["in_quantity"] == 19
+        assert response.data[0]["net_flow"] == 16
+
+        response = auth_client.get(url, {"category": product.categories.get().pk})
+        assert response.data[0]["in_quantity"] == 15
+        assert response.data[0]["out_count"] == 1
+
+        response = auth_client.get(url, {"bucket": "year"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_inventory_as_of(self, auth_client, product):
+        """
+        Testa o inventário em uma data, sem snapshot gravado (reaplicando o
+        histórico) e antes da criação do produto.
+        """
+        register_movement(product, "OUT", 4)
+
+        url = reverse("inventory-as-of")
+        response = auth_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total_count"] == 1
+        assert response.data["total_stock"] == 6
+        assert response.data["total_value"] == "900.00"
+
+        response = auth_client.get(url, {"date": "2000-01-01"})
+        assert response.data["total_count"] == 0
+        assert response.data["snapshot_date"] is None
+
+    def test_dashboard(
+        self, auth_client, product, category, django_capture_on_commit_callbacks
+    ):
+        """
+        Testa os dados do dashboard (totais, valor por categoria e evolução) e
+        o ETag: 304 sem mudanças, novo ETag na virada do dia e depois de uma
+        movimentação.
+        """
+        url = reverse("inventory-dashboard")
+        response = auth_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total_value"] == "1500.00"
+        hardware = next(
+            row for row in response.data["categories"] if row["id"] == category.pk
+        )
+        assert hardware["product_count"] == 1
+        assert hardware["total_value"] == "1500.00"
+        assert len(response.data["trend"]) == 30
+        assert response.data["trend"][-1]["total_stock"] == 10
+
+        etag = response["ETag"]
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # Na virada do dia a janela da evolução anda, mesmo sem escritas
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with patch("django.utils.timezone.localdate", return_value=tomorrow):
+            response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["trend"][-1]["date"] == tomorrow.isoformat()
+
+        # Os resumos são atualizados depois do commit da movimentação
+        with django_capture_on_commit_callbacks(execute=True):
+            register_movement(product, "OUT", 4)
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert response.data["categories"][0]["total_stock"] == 6
+        assert response.data["trend"][-1]["total_value"] == "900.00"
+
+
+def collect_pages(client, url, params):
+    """Segue os links ``next`` até o fim e retorna os ids e as páginas lidas."""
+    ids, pages = [], 0
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        ids.extend(item["id"] for item in response.data["results"])
+        pages += 1
+        if not response.data["next"]:
+            return ids, pages
+        response = client.get(response.data["next"])
+
+
+@pytest.mark.django_db
+class TestPagination:
+    """
+    Testa a paginação por cursor das listagens da API.
+    """
+
+    @pytest.fixture
+    def products(self, user):
+        # Preços repetidos exercitam o desempate pela chave primária
+        return [
+            Product.objects.create(
+                user=user, name=f"Produto {i:02d}", price=10 + i % 3, stock=i
+            )
+            for i in range(12)
+        ]
+
+    @pytest.mark.parametrize("ordering", ["name", "-name", "price", "-price", "stock"])
+    def test_products_are_stable_under_ordering(self, auth_client, products, ordering):
+        """
+        Testa que cada produto aparece uma única vez, na ordem pedida.
+        """
+        ids, pages = collect_pages(
+            auth_client,
+            reverse("product-list"),
+            {"ordering": ordering, "page_size": 5},
+        )
+
+        field = ordering.lstrip("-")
+        expected = sorted(
+            products,
+            key=lambda p: (getattr(p, field), p.pk),
+            reverse=ordering.startswith("-"),
+        )
+        assert ids == [p.pk for p in expected]
+        assert pages == 3
+
+    def test_page_size_is_capped(self, auth_client, products, monkeypatch):
+        """
+        Testa que page_size acima do limite é reduzido ao máximo permitido.
+        """
+        monkeypatch.setattr(StableCursorPagination, "max_page_size", 5)
+
+        response = auth_client.get(reverse("product-list"), {"page_size": 10_000})
+
+        assert len(response.data["results"]) == 5
+
+    def test_cursor_positions_on_every_ordering_column(self, auth_client, products):
+        """
+        Testa que o cursor guarda (campo, pk) e que as páginas seguintes filtram
+        pela posição, sem OFFSET para pular os preços repetidos, e que os links
+        ``previous`` voltam pelas mesmas páginas.
+        """
+        url = reverse("product-list")
+        first = auth_client.get(url, {"ordering": "price", "page_size": 5})
+        with CaptureQueriesContext(connection) as ctx:
+            second = auth_client.get(first.data["next"])
+        assert not any("OFFSET" in query["sql"].upper() for query in ctx)
+
+        third = auth_client.get(second.data["next"])
+        back = auth_client.get(third.data["previous"])
+        assert [item["id"] for item in back.data["results"]] == [
+            item["id"] for item in second.data["results"]
+        ]
+        back = auth_client.get(back.data["previous"])
+        assert [item["id"] for item in back.data["results"]] == [
+            item["id"] for item in first.data["results"]
+        ]
+        assert back.data["previous"] is None
+
+    def test_mismatched_cursor_position_is_rejected(self, auth_client, products):
+        """
+        Testa que uma posição que não bate com a ordenação é um cursor inválido.
+        """
+        position = json.dumps(["barato", 1])
+        cursor = b64encode(urlencode({"p": position}).encode()).decode()
+
+        response = auth_client.get(
+            reverse("product-list"), {"ordering": "price", "cursor": cursor}
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_movements_are_paginated(self, auth_client, products):
+        """
+        Testa a paginação do histórico de movimentações (mais recentes primeiro).
+        """
+        ids, pages = collect_pages(
+            auth_client, reverse("movement-list"), {"page_size": 4}
+        )
+
+        expected = ProductMovement.objects.order_by("-moved_at", "-pk")
+        assert ids == list(expected.values_list("pk", flat=True))
+        assert pages == 3
+
+    def test_categories_are_paginated(self, auth_client, user):
+        """
+        Testa a paginação das categorias em ordem alfabética.
+        """
+        for name in ["c", "a", "b"]:
+            Category.objects.create(user=user, name=name, slug=name)
+
+        ids, pages = collect_pages(
+            auth_client, reverse("category-list"), {"page_size": 2}
+        )
+
+        expected = Category.objects.filter(user=user).order_by("name", "pk")
+        assert ids == list(expected.values_list("pk", flat=True))
+        assert pages > 1
+
+
+@pytest.mark.django_db
+class TestProductHistoryAPI:
+    """
+    Testa o histórico embutido no detalhe do produto e os sub-recursos paginados.
+    """
+
+    @pytest.fixture
+    def long_history(self, product):
+        for i in range(HISTORY_PREVIEW_SIZE + 5):
+            product.price = 200 + i
+            product.save()
+            register_movement(product, "IN", 1)
+        return product
+
+    def test_detail_embeds_latest_entries_only(self, auth_client, long_history):
+        """
+        Testa que o detalhe traz apenas os registros mais recentes do histórico.
+        """
+        response = auth_client.get(
+            reverse("product-detail", kwargs={"pk": long_history.pk})
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["price_history"]) == HISTORY_PREVIEW_SIZE
+        assert len(response.data["movements"]) == HISTORY_PREVIEW_SIZE
+        assert response.data["price_history"][0]["price"] == "214.00"
+
+    @pytest.mark.parametrize(
+        "url_name, related",
+        [
+            ("product-price-history", "price_history"),
+            ("product-movements", "movements"),
+        ],
+    )
+    def test_history_sub_resources_are_paginated(
+        self, auth_client, long_history, url_name, related
+    ):
+        """
+        Testa que o histórico completo é paginado, do mais recente ao mais antigo.
+        """
+        ids, pages = collect_pages(
+            auth_client,
+            reverse(url_name, kwargs={"pk": long_history.pk}),
+            {"page_size": 5},
+        )
+
+        expected = getattr(long_history, related).order_by("-pk")
+        assert ids == list(expected.values_list("pk", flat=True))
+        assert pages == 4
+
+    def test_history_of_other_user_product(self, api_client, other_user, product):
+        """
+        Testa que o histórico de produtos de outro usuário não é acessível.
+        """
+        api_client.force_authenticate(other_user)
+
+        response = api_client.get(
+            reverse("product-price-history", kwargs={"pk": product.pk})
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Consultas máximas por requisição de cada endpoint (autenticação incluída)
+API_QUERY_BUDGETS = {
+    "product-list": 3,
+    "movement-list": 2,
+    "category-list": 2,
+}
+
+
+@pytest.mark.django_db
+class TestProductSearchAPI:
+    """
+    Testa a busca de produtos da API pelo índice de texto.
+    """
+
+    @pytest.fixture
+    def products(self, user, other_user):
+        return {
+            "description": Product.objects.create(
+                user=user,
+                name="Aaa suporte",
+                description="Acessório de panela",
+                price=1,
+            ),
+            "name": Product.objects.create(user=user, name="Panela inox", price=1),
+            "other": Product.objects.create(user=user, name="Travessa", price=1),
+            "foreign": Product.objects.create(
+                user=other_user, name="Panela alheia", price=1
+            ),
+        }
+
+    def test_search_ranks_by_relevance(self, auth_client, products):
+        """
+        Testa que a busca retorna apenas produtos do usuário que casam com os
+        termos, do mais relevante para o menos relevante.
+        """
+        ids, _ = collect_pages(
+            auth_client, reverse("product-list"), {"search": "panela", "page_size": 1}
+        )
+        assert ids == [products["name"].pk, products["description"].pk]
+
+    def test_search_with_explicit_ordering(self, auth_client, products):
+        """
+        Testa que a ordenação explícita prevalece sobre a relevância.
+        """
+        ids, _ = collect_pages(
+            auth_client,
+            reverse("product-list"),
+            {"search": "panela", "ordering": "name"},
+        )
+        assert ids == [products["description"].pk, products["name"].pk]
+
+    def test_ordering_by_rank_without_search(self, auth_client, products):
+        """
+        Testa que ordenar por relevância sem busca não gera erro.
+        """
+        response = auth_client.get(
+            reverse("product-list"), {"ordering": "-search_rank"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 3
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    """
+    Testa que as listagens da API respeitam o orçamento de consultas,
+    independentemente da quantidade de produtos e categorias.
+    """
+
+    @pytest.fixture
+    def catalog(self, user):
+        categories = [
+            Category.objects.create(user=user, name=f"Cat {i}", slug=f"cat-{i}")
+            for i in range(3)
+        ]
+        for i in range(20):
+            product = Product.objects.create(
+                user=user, name=f"Produto {i}", price=10, stock=1
+            )
+            product.categories.add(*categories[: i % 3 + 1])
+
+    @pytest.mark.parametrize("url_name", API_QUERY_BUDGETS)
+    def test_list_within_budget(
+        self, auth_client, catalog, url_name, django_assert_max_num_queries
+    ):
+        """
+        Testa o número máximo de consultas de cada listagem.
+        """
+        with django_assert_max_num_queries(API_QUERY_BUDGETS[url_name]):
+            response = auth_client.get(reverse(url_name))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"]
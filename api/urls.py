@@ -15,6 +15,7 @@ router = DefaultRouter()
 router.register(r"categories", views.CategoryViewSet, basename="category")
 router.register(r"products", views.ProductViewSet, basename="product")
 router.register(r"movements", views.ProductMovementViewSet, basename="movement")
+router.register(r"inventory", views.InventoryViewSet, basename="inventory")
 
 urlpatterns = [
     path("", include(router.urls)),
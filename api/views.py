@@ -2,9 +2,32 @@ from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from products.models import Category, Product, ProductMovement
+from drf_spectacular.utils import extend_schema
+from rest_framework.settings import api_settings
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from products.models import (
+    Category,
+    CategorySummary,
+    DailyInventoryChange,
+    InventorySummary,
+    MovementRollup,
+    Product,
+    ProductMovement,
+)
+from products.page_cache import dashboard_scope, get_generation
+from products.services import InsufficientStockError, register_movement
+from products.snapshots import inventory_as_of
+from .filters import ProductSearchFilter
+from .pagination import HistoryCursorPagination, StableCursorPagination
 from .serializers import (
     CategorySerializer,
+    DashboardSerializer,
+    InventoryAsOfQuerySerializer,
+    InventoryAsOfSerializer,
+    MovementRollupQuerySerializer,
+    MovementRollupSerializer,
+    PriceHistorySerializer,
     ProductSerializer,
     ProductDetailSerializer,
     ProductMovementSerializer,
@@ -18,8 +41,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StableCursorPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ["name", "description"]
+    ordering = ["name"]
 
     def get_queryset(self):
         return Category.objects.filter(user=self.request.user)
@@ -34,17 +59,28 @@ class ProductViewSet(viewsets.ModelViewSet):
     """
 
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StableCursorPagination
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        ProductSearchFilter,
         filters.OrderingFilter,
     ]
     filterset_fields = ["is_public", "categories"]
     search_fields = ["name", "description"]
-    ordering_fields = ["name", "price", "stock", "created_at"]
+    ordering_fields = ["name", "price", "stock", "created_at", "search_rank"]
+
+    @property
+    def ordering(self):
+        # Com busca, os resultados mais relevantes vêm primeiro
+        request = getattr(self, "request", None)
+        if request is not None and request.GET.get(api_settings.SEARCH_PARAM):
+            return ["-search_rank"]
+        return ["name"]
 
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user)
+        # Mesmo carregamento das listagens HTML: categorias em uma consulta por
+        # página. O histórico do detalhe é limitado e lido pelo índice do produto.
+        return Product.objects.filter(user=self.request.user).for_listing()
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -63,27 +99,52 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer = ProductMovementSerializer(data=request.data)
 
         if serializer.is_valid():
-            movement_type = serializer.validated_data["type"]
-            quantity = serializer.validated_data["quantity"]
-
-            if movement_type == "OUT" and product.stock < quantity:
+            # Mesmo serviço da view HTML: UPDATE condicional e atômico do estoque
+            try:
+                movement = register_movement(
+                    product,
+                    serializer.validated_data["type"],
+                    serializer.validated_data["quantity"],
+                    serializer.validated_data.get("reason", ""),
+                )
+            except InsufficientStockError:
                 return Response(
                     {"error": "Estoque insuficiente para esta saída."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Salva o movimento
-            serializer.save(product=product)
+            return Response(
+                ProductMovementSerializer(movement).data,
+                status=status.HTTP_201_CREATED,
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            # Atualiza o estoque do produto manualmente para garantir consistência
-            if movement_type == "IN":
-                product.stock += quantity
-            else:
-                product.stock -= quantity
-            product.save()
+    def paginated_history(self, request, queryset, ordering, serializer_class):
+        paginator = HistoryCursorPagination(ordering)
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(serializer_class(page, many=True).data)
 
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    @extend_schema(responses=PriceHistorySerializer(many=True))
+    @action(detail=True, methods=["get"], url_path="price-history")
+    def price_history(self, request, pk=None):
+        """
+        Histórico completo de preços do produto, paginado por cursor.
+        """
+        product = self.get_object()
+        return self.paginated_history(
+            request, product.price_history.all(), "-changed_at", PriceHistorySerializer
+        )
+
+    @extend_schema(responses=ProductMovementSerializer(many=True))
+    @action(detail=True, methods=["get"], url_path="movements", url_name="movements")
+    def movement_history(self, request, pk=None):
+        """
+        Histórico completo de movimentações do produto, paginado por cursor.
+        """
+        product = self.get_object()
+        return self.paginated_history(
+            request, product.movements.all(), "-moved_at", ProductMovementSerializer
+        )
 
 
 class ProductMovementViewSet(viewsets.ReadOnlyModelViewSet):
@@ -93,9 +154,108 @@ class ProductMovementViewSet(viewsets.ReadOnlyModelViewSet):
 
     serializer_class = ProductMovementSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StableCursorPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["product", "type"]
     ordering_fields = ["moved_at"]
+    ordering = ["-moved_at"]
 
     def get_queryset(self):
-        return ProductMovement.objects.filter(product__user=self.request.user)
+        # Filtra pelo dono copiado na movimentação: o cursor percorre o índice
+        # (usuário, data) sem junção com produtos, mesmo em páginas profundas
+        return ProductMovement.objects.filter(user=self.request.user)
+
+    @extend_schema(
+        parameters=[MovementRollupQuerySerializer],
+        responses=MovementRollupSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], url_path="rollup", url_name="rollup")
+    def rollup(self, request):
+        """
+        Entradas e saídas agrupadas por dia, semana ou mês (``bucket``), lidas
+        das linhas diárias por produto em vez das movimentações brutas.
+
+        Sem ``start``, a série cobre a janela padrão do agrupamento.
+        """
+        params = MovementRollupQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        bucket = params.validated_data["bucket"]
+
+        rollups = MovementRollup.objects.filter(
+            user=request.user,
+            day__gte=params.validated_data.get(
+                "start", MovementRollup.default_start(bucket)
+            ),
+        )
+        if "end" in params.validated_data:
+            rollups = rollups.filter(day__lte=params.validated_data["end"])
+        if "product" in params.validated_data:
+            rollups = rollups.filter(product_id=params.validated_data["product"])
+        if "category" in params.validated_data:
+            rollups = rollups.filter(
+                product__categories__id=params.validated_data["category"]
+            )
+
+        return Response(
+            MovementRollupSerializer(rollups.series(bucket), many=True).data
+        )
+
+
+class InventoryViewSet(viewsets.ViewSet):
+    """
+    API endpoint para consultar o inventário do usuário em uma data.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        parameters=[InventoryAsOfQuerySerializer],
+        responses=InventoryAsOfSerializer,
+    )
+    @action(detail=False, methods=["get"], url_path="as-of", url_name="as-of")
+    def as_of(self, request):
+        """
+        Quantidade de produtos, estoque e valor total no fim do dia ``date``
+        (padrão: hoje), a partir do snapshot diário mais próximo mais as
+        mudanças posteriores a ele.
+        """
+        params = InventoryAsOfQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        day = params.validated_data.get("date", timezone.localdate())
+        totals = inventory_as_of(request.user, day)
+        return Response(InventoryAsOfSerializer(totals).data)
+
+    @extend_schema(responses=DashboardSerializer)
+    @action(detail=False, methods=["get"])
+    def dashboard(self, request):
+        """
+        Dados dos gráficos do dashboard: totais do inventário, distribuição de
+        valor por categoria e evolução do estoque e do valor nos últimos 30
+        dias, lidos dos resumos mantidos pelas escritas.
+
+        A resposta leva um ETag que muda a cada escrita nos totais do usuário
+        e na virada do dia (a janela da evolução termina hoje); com
+        ``If-None-Match`` igual, responde 304 sem consultar o banco.
+        """
+        # O ETag é lido antes dos dados: uma escrita durante a leitura muda a
+        # geração, e a próxima requisição recebe os dados novos
+        generation = get_generation(dashboard_scope(request.user.pk))
+        etag = quote_etag(
+            f"dashboard-{generation}-{timezone.localdate():%Y%m%d}"
+            f"-{DailyInventoryChange.TREND_DAYS}"
+        )
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        summary = InventorySummary.for_user(request.user)
+        categories = (
+            CategorySummary.objects.filter(user=request.user)
+            .select_related("category")
+            .order_by("-total_value", "category__name")
+        )
+        data = {
+            **summary.stats(),
+            "categories": categories,
+            "trend": DailyInventoryChange.trend(summary),
+        }
+        return Response(DashboardSerializer(data).data, headers={"ETag": etag})
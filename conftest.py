@@ -0,0 +1,10 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cada teste começa com o cache vazio (o banco é recriado, o cache não)."""
+    cache.clear()
+    yield
+    cache.clear()
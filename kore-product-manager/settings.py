@@ -140,6 +140,54 @@ else:
     }
 
 
+# Cache
+# Redis (ou compatível) com REDIS_URL; sem Redis, CACHE_DIR usa arquivos
+# compartilhados entre processos. O padrão é a memória local do processo.
+REDIS_URL = os.environ.get("REDIS_URL")
+CACHE_DIR = os.environ.get("CACHE_DIR")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+elif CACHE_DIR:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "kore-product-manager",
+        }
+    }
+
+# Sessões: com um cache compartilhado, as leituras vêm do cache e o banco só
+# é gravado quando a sessão muda. SESSION_ENGINE permite escolher outro backend
+# (ex.: "django.contrib.sessions.backends.signed_cookies", sem banco algum).
+SESSION_ENGINE = os.environ.get("SESSION_ENGINE") or (
+    "django.contrib.sessions.backends.cached_db"
+    if REDIS_URL or CACHE_DIR
+    else "django.contrib.sessions.backends.db"
+)
+
+# Onde o dashboard lembra os últimos filtros: "session", "profile" (perfil no
+# cache, acompanha o usuário entre dispositivos) ou "url" (não lembra; os
+# filtros ficam apenas nos parâmetros da URL)
+DASHBOARD_FILTERS_STORAGE = os.environ.get("DASHBOARD_FILTERS_STORAGE", "session")
+
+# Movimentações mais antigas que este número de dias são compactadas em uma
+# linha por produto e mês pelo comando archive_movements; as linhas originais
+# vão comprimidas para MovementArchive
+MOVEMENT_RETENTION_DAYS = int(os.environ.get("MOVEMENT_RETENTION_DAYS", 365))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,137 @@
+"""
+Compactação e arquivamento do histórico de movimentações.
+
+``archive_movements(cutoff)`` percorre os produtos com movimentações
+anteriores a ``cutoff`` e, para cada mês, guarda as linhas originais
+comprimidas em MovementArchive e deixa na tabela uma única linha com o saldo
+líquido do mês. Essa linha é a última movimentação do mês reaproveitada: mantém
+o id, a data e o ``balance_after``, então o ledger, a paginação por cursor e os
+snapshots continuam consistentes. A tabela de movimentações passa a crescer
+com a janela de retenção, e não com todo o histórico.
+
+Nos meses compactados, contagens e totais brutos de entradas e saídas lidos da
+tabela de movimentações refletem apenas o saldo do mês; os totais diários
+continuam em MovementRollup, que o rebuild recalcula a partir dos arquivos.
+"""
+
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import MovementArchive, Product, ProductMovement
+
+
+def retention_cutoff(days=None, today=None):
+    """
+    Início do mês que contém o limite de retenção: apenas meses inteiros
+    anteriores a ele são compactados.
+    """
+    if days is None:
+        days = settings.MOVEMENT_RETENTION_DAYS
+    limit = (today or timezone.localdate()) - timedelta(days=days)
+    return month_start(limit)
+
+
+def month_start(day):
+    return timezone.make_aware(datetime.combine(day.replace(day=1), time.min))
+
+
+def archive_movements(cutoff):
+    """
+    Compacta as movimentações anteriores a ``cutoff``, um produto por
+    transação. Retorna (produtos, meses arquivados, movimentações arquivadas),
+    contando apenas o que foi de fato compactado.
+
+    Meses com uma única movimentação já estão no formato compactado e ficam
+    como estão; por isso não entram nos candidatos, e uma nova execução sobre
+    os mesmos dados retorna (0, 0, 0).
+    """
+    candidates = ProductMovement.objects.filter(
+        moved_at__lt=cutoff, archive__isnull=True
+    )
+    product_ids = list(
+        candidates.order_by()
+        .annotate(month=TruncMonth("moved_at"))
+        .values("product_id", "month")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+        .values_list("product_id", flat=True)
+        .distinct()
+    )
+    products = periods = movements = 0
+    for product_id in product_ids:
+        product_periods, product_movements = archive_product(product_id, candidates)
+        products += bool(product_periods)
+        periods += product_periods
+        movements += product_movements
+    return products, periods, movements
+
+
+def archive_product(product_id, candidates):
+    """
+    Compacta, mês a mês, as movimentações candidatas de um produto. Meses com
+    uma única movimentação são ignorados.
+    """
+    candidates = candidates.filter(product_id=product_id)
+    periods = movements = 0
+    with transaction.atomic():
+        # Mesmo bloqueio das escritas de movimentação (ver register_movement):
+        # nenhuma movimentação nova do produto é gravada durante a compactação
+        list(Product.objects.select_for_update().filter(pk=product_id).values("pk"))
+
+        months = (
+            candidates.order_by()
+            .annotate(month=TruncMonth("moved_at"))
+            .values("month")
+            .annotate(count=Count("pk"))
+            .filter(count__gt=1)
+            .values_list("month", flat=True)
+        )
+        for period in sorted(timezone.localdate(month) for month in months):
+            start = month_start(period)
+            end = month_start(period + timedelta(days=32))
+            group = list(
+                candidates.filter(moved_at__gte=start, moved_at__lt=end).order_by(
+                    "moved_at", "pk"
+                )
+            )
+            # A contagem foi lida antes do bloqueio; confere de novo
+            if len(group) > 1:
+                compact_period(period, group)
+                periods += 1
+                movements += len(group)
+    return periods, movements
+
+
+def compact_period(period, group):
+    """
+    Arquiva as movimentações de um mês (em ordem cronológica) e transforma a
+    última delas na linha de saldo do período; as demais são removidas.
+    """
+    last = group[-1]
+    archive = MovementArchive.objects.create(
+        product_id=last.product_id,
+        user_id=last.user_id,
+        period=period,
+        movement_count=len(group),
+        data=MovementArchive.pack(group),
+    )
+
+    net = sum(movement.signed_quantity for movement in group)
+    last.type = "IN" if net >= 0 else "OUT"
+    last.quantity = abs(net)
+    last.reason = f"Saldo compactado de {period:%m/%Y} ({len(group)} movimentações)"
+    last.archive = archive
+    last.save(update_fields=["type", "quantity", "reason", "archive"])
+
+    # As demais linhas do mês estão entre a primeira e a última, e a última
+    # já aponta para o arquivo
+    ProductMovement.objects.filter(
+        product_id=last.product_id,
+        archive__isnull=True,
+        moved_at__gte=group[0].moved_at,
+        moved_at__lte=last.moved_at,
+    ).delete()
+    return archive
@@ -0,0 +1,232 @@
+"""
+Índice em memória para o autocompletar de nomes de produtos.
+
+Cada usuário tem um índice com os nomes dos seus produtos, montado na primeira
+busca e mantido pelos sinais de gravação e exclusão de Product (ver
+models.py). A busca não consulta o banco:
+
+- prefixo: busca binária no vocabulário ordenado dos nomes;
+- erros de digitação: trigramas de cada termo contra um índice invertido de
+  trigramas do vocabulário, com a similaridade de Jaccard (como o pg_trgm).
+
+Os índices são locais ao processo. Como outros processos não recebem os
+sinais, cada índice é descartado após ``INDEX_TTL`` segundos e remontado na
+busca seguinte; e apenas os ``MAX_INDEXES`` usuários mais recentes ficam em
+memória.
+"""
+
+import heapq
+import math
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+SUGGESTION_LIMIT = 8
+MIN_SIMILARITY = 0.3
+INDEX_TTL = 300
+MAX_INDEXES = 256
+# Palavras do vocabulário consideradas por termo digitado
+MAX_EXPANSIONS = 50
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e com espaços simples."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join("".join(c if c.isalnum() else " " for c in text).split())
+
+
+def trigrams(text):
+    """Trigramas de cada palavra com bordas, como no pg_trgm."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """
+    Índice dos nomes de produtos de um usuário.
+
+    Guarda o vocabulário (palavras distintas dos nomes) ordenado, para as
+    buscas por prefixo, os produtos de cada palavra e os trigramas de cada
+    palavra, para achar palavras parecidas com um termo digitado errado.
+    """
+
+    def __init__(self, names):
+        self.built_at = time.monotonic()
+        self.names = {}
+        self.word_ids = {}
+        self.gram_words = {}
+        self.lock = threading.Lock()
+        for product_id, name in names:
+            self.index_name(product_id, name)
+        # Carga inicial: o vocabulário é ordenado uma única vez no fim
+        self.vocabulary = sorted(self.word_ids)
+
+    def index_name(self, product_id, name):
+        """Indexa o nome e retorna as palavras que ainda não existiam."""
+        normalized = normalize(name)
+        self.names[product_id] = (name, normalized)
+        new_words = []
+        for word in set(normalized.split()):
+            ids = self.word_ids.get(word)
+            if ids is None:
+                ids = self.word_ids[word] = set()
+                new_words.append(word)
+                for gram in trigrams(word):
+                    self.gram_words.setdefault(gram, set()).add(word)
+            ids.add(product_id)
+        return new_words
+
+    def remove(self, product_id):
+        entry = self.names.pop(product_id, None)
+        if entry is None:
+            return
+        for word in set(entry[1].split()):
+            ids = self.word_ids[word]
+            ids.discard(product_id)
+            if ids:
+                continue
+            del self.word_ids[word]
+            del self.vocabulary[bisect_left(self.vocabulary, word)]
+            for gram in trigrams(word):
+                words = self.gram_words[gram]
+                words.discard(word)
+                if not words:
+                    del self.gram_words[gram]
+
+    def update(self, product_id, name):
+        with self.lock:
+            entry = self.names.get(product_id)
+            if entry is not None and entry[0] == name:
+                return
+            self.remove(product_id)
+            for word in self.index_name(product_id, name):
+                insort(self.vocabulary, word)
+
+    def discard(self, product_id):
+        with self.lock:
+            self.remove(product_id)
+
+    def similar_words(self, term):
+        # Com similaridade mínima t, uma palavra precisa ter ao menos t * |Q|
+        # dos trigramas do termo; logo aparece em algum dos |Q| - t * |Q| + 1
+        # trigramas mais raros, e só esses são percorridos (filtro de prefixo)
+        postings = sorted(
+            (self.gram_words.get(gram, set()) for gram in trigrams(term)), key=len
+        )
+        required = math.ceil(MIN_SIMILARITY * len(postings))
+        scored = []
+        for word in set().union(*postings[: len(postings) - required + 1]):
+            shared = sum(1 for words in postings if word in words)
+            # Uma palavra de n letras tem n + 1 trigramas (com as bordas)
+            similarity = shared / (len(postings) + len(word) + 1 - shared)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((similarity, word))
+        return heapq.nlargest(MAX_EXPANSIONS, scored)
+
+    def term_scores(self, term):
+        """
+        Pontuação de cada produto para um termo: 1 para palavras que começam
+        pelo termo e a similaridade de trigramas para as parecidas.
+        """
+        words = {}
+        position = bisect_left(self.vocabulary, term)
+        while position < len(self.vocabulary) and len(words) < MAX_EXPANSIONS:
+            word = self.vocabulary[position]
+            if not word.startswith(term):
+                break
+            words[word] = 1.0
+            position += 1
+        for similarity, word in self.similar_words(term):
+            words.setdefault(word, similarity)
+
+        scores = {}
+        for word, score in sorted(words.items(), key=lambda item: item[1]):
+            scores.update(dict.fromkeys(self.word_ids[word], score))
+        return scores
+
+    def suggest(self, text, limit=SUGGESTION_LIMIT):
+        """
+        Retorna até ``limit`` pares (id, nome) com todos os termos digitados
+        (por prefixo ou parecidos), dos mais próximos para os menos próximos
+        e, no empate, em ordem alfabética.
+        """
+        terms = normalize(text).split()
+        if not terms:
+            return []
+        with self.lock:
+            totals = None
+            for term in terms:
+                scores = self.term_scores(term)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {
+                        product_id: total + scores[product_id]
+                        for product_id, total in totals.items()
+                        if product_id in scores
+                    }
+                if not totals:
+                    return []
+            best = heapq.nsmallest(
+                limit,
+                totals,
+                key=lambda product_id: (
+                    -totals[product_id],
+                    self.names[product_id][1],
+                ),
+            )
+            return [(product_id, self.names[product_id][0]) for product_id in best]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(user_id):
+    """Índice do usuário, montado a partir do banco se ausente ou expirado."""
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None and time.monotonic() - index.built_at < INDEX_TTL:
+            _indexes.move_to_end(user_id)
+            return index
+
+    from .models import Product
+
+    index = NameIndex(
+        Product.objects.filter(user_id=user_id).values_list("id", "name").iterator()
+    )
+    with _indexes_lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def loaded_index(user_id):
+    """Índice do usuário, apenas se já estiver em memória."""
+    with _indexes_lock:
+        return _indexes.get(user_id)
+
+
+def refresh_product(user_id, product_id, name):
+    index = loaded_index(user_id)
+    if index is not None:
+        index.update(product_id, name)
+
+
+def forget_product(user_id, product_id):
+    index = loaded_index(user_id)
+    if index is not None:
+        index.discard(product_id)
+
+
+def clear_indexes():
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,96 @@
+"""
+Operações de migração que dependem do banco de dados em uso.
+
+O projeto roda em SQLite (desenvolvimento) ou PostgreSQL (produção), então as
+operações abaixo usam recursos do PostgreSQL quando disponíveis e caem para o
+comportamento padrão do Django nos demais bancos.
+"""
+
+from django.db.migrations.operations import AddIndex, RemoveIndex
+
+
+def is_partitioned(connection, table):
+    """Indica se a tabela é particionada (PostgreSQL, ``relkind = 'p'``)."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def concurrently(schema_editor, model):
+    """
+    CONCURRENTLY só é usado no PostgreSQL e em tabelas comuns: em tabelas
+    particionadas o índice é criado/removido no pai e em todas as partições,
+    o que o PostgreSQL não permite fazer de forma concorrente.
+    """
+    connection = schema_editor.connection
+    return connection.vendor == "postgresql" and not is_partitioned(
+        connection, model._meta.db_table
+    )
+
+
+class AddIndexConcurrentlyIfPostgres(AddIndex):
+    """
+    Cria o índice com CREATE INDEX CONCURRENTLY no PostgreSQL, sem bloquear
+    escritas na tabela. Nos outros bancos e em tabelas particionadas, equivale
+    ao AddIndex comum.
+
+    A migração que usa esta operação precisa declarar ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if concurrently(schema_editor, model):
+                schema_editor.add_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if concurrently(schema_editor, model):
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, self.index)
+
+    def describe(self):
+        return "Concurrently " + super().describe()
+
+
+class RemoveIndexConcurrentlyIfPostgres(RemoveIndex):
+    """
+    Remove o índice com DROP INDEX CONCURRENTLY no PostgreSQL. Nos outros
+    bancos e em tabelas particionadas, equivale ao RemoveIndex comum.
+
+    A migração que usa esta operação precisa declarar ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[
+                app_label, self.model_name_lower
+            ].get_index_by_name(self.name)
+            if concurrently(schema_editor, model):
+                schema_editor.remove_index(model, index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(
+                self.name
+            )
+            if concurrently(schema_editor, model):
+                schema_editor.add_index(model, index, concurrently=True)
+            else:
+                schema_editor.add_index(model, index)
+
+    def describe(self):
+        return "Concurrently " + super().describe()
@@ -0,0 +1,148 @@
+"""
+Exportação em CSV de produtos, histórico de preços e movimentações.
+
+As views de listagem respondem com CSV quando recebem ``export=csv``, aplicando
+os mesmos filtros e a mesma ordenação da página. O arquivo é enviado por
+StreamingHttpResponse: o cabeçalho sai antes da primeira consulta, e as linhas
+são lidas com ``iterator(chunk_size=...)`` (cursor no servidor no PostgreSQL),
+então a memória não cresce com o tamanho da exportação.
+"""
+
+import csv
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .models import Category
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_PARAM = "export"
+
+
+def wants_csv(request):
+    return request.GET.get(EXPORT_PARAM) == "csv"
+
+
+class Echo:
+    """Pseudo-arquivo: o csv.writer devolve cada linha em vez de guardá-la."""
+
+    def write(self, value):
+        return value
+
+
+def local_timestamp(value):
+    return timezone.localtime(value).isoformat(timespec="seconds") if value else ""
+
+
+def csv_response(filename, header, rows):
+    """
+    Resposta em CSV gerada sob demanda a partir do iterável ``rows``. O BOM
+    inicial faz planilhas abrirem o arquivo como UTF-8 (acentos).
+    """
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield "\ufeff" + writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_products(products, filename="produtos.csv"):
+    """Produtos com suas categorias (uma consulta de categorias por lote)."""
+    categories = Prefetch(
+        "categories", queryset=Category.objects.only("name").order_by("name")
+    )
+    rows = (
+        (
+            product.pk,
+            product.name,
+            product.description,
+            ", ".join(category.name for category in product.categories.all()),
+            product.price,
+            product.stock,
+            "sim" if product.is_public else "não",
+            local_timestamp(product.created_at),
+            local_timestamp(product.updated_at),
+        )
+        for product in products.prefetch_related(categories).iterator(
+            chunk_size=EXPORT_CHUNK_SIZE
+        )
+    )
+    return csv_response(
+        filename,
+        [
+            "id",
+            "nome",
+            "descricao",
+            "categorias",
+            "preco",
+            "estoque",
+            "publico",
+            "criado_em",
+            "atualizado_em",
+        ],
+        rows,
+    )
+
+
+def export_price_history(entries, filename="historico_precos.csv"):
+    """Registros de preço, lidos como tuplas (sem instanciar modelos)."""
+    rows = (
+        (*row[:-1], local_timestamp(row[-1]))
+        for row in entries.values_list(
+            "product_id",
+            "product__name",
+            "price",
+            "previous_price",
+            "delta",
+            "pct_change",
+            "changed_at",
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return csv_response(
+        filename,
+        [
+            "produto_id",
+            "produto",
+            "preco",
+            "preco_anterior",
+            "variacao",
+            "variacao_percentual",
+            "alterado_em",
+        ],
+        rows,
+    )
+
+
+def export_movements(movements, filename="movimentacoes.csv"):
+    """Movimentações de estoque, lidas como tuplas (sem instanciar modelos)."""
+    rows = (
+        (*row[:-1], local_timestamp(row[-1]))
+        for row in movements.values_list(
+            "pk",
+            "product_id",
+            "product__name",
+            "type",
+            "quantity",
+            "balance_after",
+            "reason",
+            "moved_at",
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return csv_response(
+        filename,
+        [
+            "id",
+            "produto_id",
+            "produto",
+            "tipo",
+            "quantidade",
+            "saldo_apos",
+            "motivo",
+            "movimentado_em",
+        ],
+        rows,
+    )
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from products.archive import archive_movements, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacta as movimentações mais antigas que a janela de retenção em uma "
+        "linha de saldo por produto e mês, arquivando as originais comprimidas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.MOVEMENT_RETENTION_DAYS,
+            help=(
+                "Janela de retenção em dias (padrão: MOVEMENT_RETENTION_DAYS, "
+                f"{settings.MOVEMENT_RETENTION_DAYS})"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options["days"])
+        self.stdout.write(
+            self.style.WARNING(
+                f"Compactando movimentações anteriores a {cutoff:%d/%m/%Y}..."
+            )
+        )
+
+        products, periods, movements = archive_movements(cutoff)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ {movements} movimentações de {products} produtos "
+                f"compactadas em {periods} linhas de saldo mensais."
+            )
+        )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+from products.models import PriceHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula preço anterior, variação e variação percentual do histórico de preços"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Quantidade de registros gravados por lote (padrão: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        fields = ["previous_price", "delta", "pct_change"]
+
+        self.stdout.write(
+            self.style.WARNING("Iniciando cálculo das variações de preço...")
+        )
+
+        # Uma única passada: o preço anterior de cada registro vem do LAG
+        # calculado pelo banco dentro do histórico do próprio produto.
+        entries = (
+            PriceHistory.objects.annotate(
+                lag_price=Window(
+                    Lag("price"),
+                    partition_by=[F("product_id")],
+                    order_by=[F("changed_at").asc(), F("pk").asc()],
+                )
+            )
+            .only("id", "price")
+            .order_by()
+            .iterator(chunk_size=batch_size)
+        )
+
+        pending = []
+        entry_count = 0
+
+        with transaction.atomic():
+            for entry in entries:
+                entry.set_previous_price(entry.lag_price)
+                pending.append(entry)
+                entry_count += 1
+
+                if len(pending) >= batch_size:
+                    PriceHistory.objects.bulk_update(pending, fields)
+                    pending = []
+
+            if pending:
+                PriceHistory.objects.bulk_update(pending, fields)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ Variações atualizadas! {entry_count} registros de histórico."
+            )
+        )
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.models import Product, ProductMovement
+
+
+class Command(BaseCommand):
+    help = "Calcula o saldo acumulado (balance_after) das movimentações existentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Quantidade de registros gravados por lote (padrão: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        self.stdout.write(
+            self.style.WARNING("Iniciando cálculo do ledger de estoque...")
+        )
+
+        # Uma única passada ordenada: o saldo é acumulado por produto e
+        # reiniciado sempre que o produto muda.
+        movements = (
+            ProductMovement.objects.order_by("product_id", "moved_at", "id")
+            .only("id", "product_id", "type", "quantity", "balance_after")
+            .iterator(chunk_size=batch_size)
+        )
+
+        balances = {}
+        pending = []
+        movement_count = 0
+
+        with transaction.atomic():
+            for movement in movements:
+                balance = (
+                    balances.get(movement.product_id, 0) + movement.signed_quantity
+                )
+                balances[movement.product_id] = balance
+                movement.balance_after = balance
+                pending.append(movement)
+                movement_count += 1
+
+                if len(pending) >= batch_size:
+                    ProductMovement.objects.bulk_update(pending, ["balance_after"])
+                    pending = []
+
+            if pending:
+                ProductMovement.objects.bulk_update(pending, ["balance_after"])
+
+            # Produtos sem movimentações ficam com saldo zero
+            Product.objects.update(ledger_balance=0)
+            Product.objects.bulk_update(
+                [
+                    Product(pk=product_id, ledger_balance=balance)
+                    for product_id, balance in balances.items()
+                ],
+                ["ledger_balance"],
+                batch_size=batch_size,
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ Ledger atualizado! {movement_count} movimentações em {len(balances)} produtos."
+            )
+        )
@@ -0,0 +1,62 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from products.models import InventorySummary, Product
+
+
+class Command(BaseCommand):
+    help = "Compara o resumo de inventário com os totais reais dos produtos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Recalcula os resumos divergentes em vez de apenas reportá-los",
+        )
+
+    def handle(self, *args, **options):
+        expected = InventorySummary.compute(Product.objects.all())
+        stored = {
+            summary.user_id: summary for summary in InventorySummary.objects.all()
+        }
+
+        divergent = []
+        for user_id in expected.keys() | stored.keys():
+            values = expected.get(
+                user_id, dict.fromkeys(InventorySummary.TOTAL_FIELDS, 0)
+            )
+            summary = stored.get(user_id)
+            if summary is None:
+                # Sem linha: será criada na primeira leitura do dashboard
+                continue
+            diffs = [
+                f"{field}: {getattr(summary, field)} != {values[field]}"
+                for field in InventorySummary.TOTAL_FIELDS
+                if self.normalize(getattr(summary, field))
+                != self.normalize(values[field])
+            ]
+            if diffs:
+                divergent.append(user_id)
+                self.stdout.write(
+                    self.style.ERROR(f"✗ Usuário {user_id}: " + "; ".join(diffs))
+                )
+
+        if not divergent:
+            self.stdout.write(
+                self.style.SUCCESS("✅ Resumo de inventário consistente.")
+            )
+            return
+
+        if options["fix"]:
+            for user_id in divergent:
+                InventorySummary.rebuild(user_id)
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ {len(divergent)} resumos recalculados.")
+            )
+        else:
+            raise CommandError(
+                f"{len(divergent)} resumos divergentes. Use --fix para recalculá-los."
+            )
+
+    @staticmethod
+    def normalize(value):
+        return Decimal(value).quantize(Decimal("0.01"))
@@ -0,0 +1,84 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from products.partitioning import (
+    COPY_BATCH_SIZE,
+    PARTITION_KEYS,
+    PartitioningError,
+    convert_table,
+    detach_partitions,
+    ensure_partitions,
+)
+
+
+def year_month(value):
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+class Command(BaseCommand):
+    help = (
+        "Particiona por mês as tabelas de movimentações e de histórico de preços "
+        "(PostgreSQL), cria as partições dos próximos meses e desanexa as antigas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Converte as tabelas ainda não particionadas",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Meses futuros com partição criada (padrão: 3)",
+        )
+        parser.add_argument(
+            "--detach-before",
+            type=year_month,
+            help="Desanexa as partições anteriores ao mês AAAA-MM",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=COPY_BATCH_SIZE,
+            help=f"Linhas copiadas por lote na conversão (padrão: {COPY_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Particionamento disponível apenas no PostgreSQL.")
+
+        if options["convert"]:
+            for table in PARTITION_KEYS:
+                self.stdout.write(self.style.WARNING(f"Convertendo {table}..."))
+                try:
+                    converted = convert_table(
+                        connection,
+                        table,
+                        batch_size=options["batch_size"],
+                        months_ahead=options["months_ahead"],
+                    )
+                except PartitioningError as error:
+                    raise CommandError(str(error))
+                if converted:
+                    self.stdout.write(
+                        f"  {table} particionada; original mantida como "
+                        f"{table}_unpartitioned"
+                    )
+                else:
+                    self.stdout.write(f"  {table} já é particionada")
+
+        created = ensure_partitions(connection, months_ahead=options["months_ahead"])
+        detached = []
+        if options["detach_before"]:
+            detached = detach_partitions(connection, options["detach_before"])
+            for name in detached:
+                self.stdout.write(f"  {name} desanexada")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ {len(created)} partições criadas, "
+                f"{len(detached)} desanexadas."
+            )
+        )
@@ -1,9 +1,10 @@
 from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
 from products.models import Product, PriceHistory
 
 
 class Command(BaseCommand):
-    help = "Popula o histórico de preços para produtos existentes"
+    help = "Popula o histórico de preços e o último preço registrado dos produtos existentes"
 
     def handle(self, *args, **options):
         self.stdout.write(
@@ -26,6 +27,17 @@ class Command(BaseCommand):
                 self.stdout.write(f"- {product.name} já possui histórico")
                 skipped_count += 1
 
+        # Sincroniza o último preço registrado de todos os produtos em um único UPDATE
+        latest = PriceHistory.objects.filter(product=OuterRef("pk")).order_by(
+            "-changed_at", "-id"
+        )
+        synced_count = Product.objects.update(
+            last_recorded_price=Subquery(latest.values("price")[:1])
+        )
+        self.stdout.write(
+            f"- Último preço registrado sincronizado em {synced_count} produtos"
+        )
+
         self.stdout.write(
             self.style.SUCCESS(
                 f"\n✅ Migração concluída! {created_count} registros criados, {skipped_count} ignorados."
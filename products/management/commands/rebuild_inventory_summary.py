@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.models import Category, CategorySummary, InventorySummary, Product
+from products.page_cache import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula o resumo de inventário (InventorySummary) de todos os usuários "
+        "e os totais por categoria (CategorySummary)"
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("Recalculando resumo de inventário..."))
+
+        # Um único GROUP BY sobre os produtos; as linhas são recriadas em lote
+        totals = InventorySummary.compute(Product.objects.all())
+        with transaction.atomic():
+            InventorySummary.objects.all().delete()
+            InventorySummary.objects.bulk_create(
+                [
+                    InventorySummary(user_id=user_id, **values)
+                    for user_id, values in totals.items()
+                ],
+                batch_size=1000,
+            )
+        categories = CategorySummary.rebuild(Category.objects.all())
+        invalidate_dashboard(*totals)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ Resumo recalculado para {len(totals)} usuários "
+                f"e {categories} categorias."
+            )
+        )
@@ -0,0 +1,53 @@
+from itertools import batched
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.models import MovementArchive, MovementRollup, ProductMovement
+
+
+class Command(BaseCommand):
+    help = "Recalcula as linhas diárias de movimentação (MovementRollup)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="Recalcula apenas as linhas do usuário com este id",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Linhas inseridas por INSERT (padrão: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("Recalculando linhas diárias..."))
+
+        # Linhas de saldo de meses compactados ficam de fora: as movimentações
+        # originais desses meses são lidas dos arquivos
+        movements = ProductMovement.objects.filter(archive__isnull=True)
+        archives = MovementArchive.objects.all()
+        rollups = MovementRollup.objects.all()
+        if options["user"] is not None:
+            movements = movements.filter(user_id=options["user"])
+            archives = archives.filter(user_id=options["user"])
+            rollups = rollups.filter(user_id=options["user"])
+
+        # Um único GROUP BY lido pelo cursor do banco e inserido em lotes: a
+        # memória não cresce com a quantidade de movimentações
+        batch_size = options["batch_size"]
+        rows = MovementRollup.compute(movements).iterator(chunk_size=batch_size)
+        total = 0
+        with transaction.atomic():
+            rollups.delete()
+            for batch in batched(rows, batch_size):
+                MovementRollup.objects.bulk_create(
+                    [MovementRollup(**row) for row in batch]
+                )
+                total += len(batch)
+            for archive in archives.iterator(chunk_size=100):
+                MovementRollup.record(archive.movements())
+
+        self.stdout.write(
+            self.style.SUCCESS(f"\n✅ {total} linhas diárias recalculadas.")
+        )
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from products.snapshots import SnapshotOrderError, take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Grava o snapshot diário de inventário (estoque e preço por produto e "
+        "totais por usuário) a partir das mudanças desde o snapshot anterior"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=date.fromisoformat,
+            help="Dia do snapshot no formato AAAA-MM-DD (padrão: ontem)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Produtos processados por lote (padrão: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        day = options["date"] or timezone.localdate() - timedelta(days=1)
+        self.stdout.write(
+            self.style.WARNING(f"Gravando snapshot de {day:%d/%m/%Y}...")
+        )
+
+        try:
+            products, users = take_snapshot(day, batch_size=options["batch_size"])
+        except SnapshotOrderError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✅ Snapshot gravado: {products} produtos alterados, "
+                f"{users} usuários atualizados."
+            )
+        )
@@ -0,0 +1,52 @@
+# Generated by Django 6.1.2 on 2026-10-16 22:37
+
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """Preenche balance_after e ledger_balance em uma única passada ordenada."""
+    Product = apps.get_model("products", "Product")
+    ProductMovement = apps.get_model("products", "ProductMovement")
+
+    balances = {}
+    pending = []
+    movements = ProductMovement.objects.order_by("product_id", "moved_at", "id").only(
+        "id", "product_id", "type", "quantity"
+    )
+    for movement in movements.iterator(chunk_size=2000):
+        signed = movement.quantity if movement.type == "IN" else -movement.quantity
+        balances[movement.product_id] = balances.get(movement.product_id, 0) + signed
+        movement.balance_after = balances[movement.product_id]
+        pending.append(movement)
+        if len(pending) >= 2000:
+            ProductMovement.objects.bulk_update(pending, ["balance_after"])
+            pending = []
+    if pending:
+        ProductMovement.objects.bulk_update(pending, ["balance_after"])
+
+    Product.objects.bulk_update(
+        [Product(pk=pk, ledger_balance=balance) for pk, balance in balances.items()],
+        ["ledger_balance"],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_productmovement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='ledger_balance',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productmovement',
+            name='balance_after',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-16 22:42
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_recorded_price(apps, schema_editor):
+    """Copia o preço do registro mais recente do histórico em um único UPDATE."""
+    Product = apps.get_model("products", "Product")
+    PriceHistory = apps.get_model("products", "PriceHistory")
+
+    latest = PriceHistory.objects.filter(product=OuterRef("pk")).order_by(
+        "-changed_at", "-id"
+    )
+    Product.objects.update(last_recorded_price=Subquery(latest.values("price")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='last_recorded_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_last_recorded_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.1.2 on 2026-10-16 22:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_movement_user(apps, schema_editor):
+    """Copia o dono do produto para as movimentações existentes."""
+    Product = apps.get_model("products", "Product")
+    ProductMovement = apps.get_model("products", "ProductMovement")
+
+    owner = Product.objects.filter(pk=OuterRef("product_id")).values("user_id")[:1]
+    ProductMovement.objects.update(user_id=Subquery(owner))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_product_last_recorded_price"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productmovement",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(backfill_movement_user, migrations.RunPython.noop),
+    ]
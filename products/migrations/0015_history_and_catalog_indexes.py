@@ -0,0 +1,96 @@
+# Generated by Django 6.1.2 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+from products.db_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ("products", "0014_productmovement_user"),
+    ]
+
+    operations = [
+        # Históricos e listagens ordenam por (campo, pk): com o id no fim do
+        # índice o PostgreSQL entrega a ordem completa sem Sort, também nas
+        # páginas seguintes da paginação por cursor
+        AddIndexConcurrentlyIfPostgres(
+            model_name="pricehistory",
+            index=models.Index(
+                fields=["product", "-changed_at", "-id"],
+                name="pricehist_product_cursor_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                fields=["user", "name", "id"], name="product_user_name_cursor_idx"
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                fields=["user", "price", "id"], name="product_user_price_cursor_idx"
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                fields=["user", "stock", "id"], name="product_user_stock_cursor_idx"
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                fields=["user", "is_public", "id"],
+                name="product_user_status_cursor_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                fields=["user", "is_public", "name", "id"],
+                name="product_user_pub_name_cur_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["name", "id"],
+                name="product_pub_name_cursor_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["price", "id"],
+                name="product_pub_price_cursor_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["stock", "id"],
+                name="product_pub_stock_cursor_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="productmovement",
+            index=models.Index(
+                fields=["product", "-moved_at", "-id"],
+                name="movement_product_cursor_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="productmovement",
+            index=models.Index(
+                fields=["user", "-moved_at", "-id"], name="movement_user_cursor_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.1.2 on 2026-10-16 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clamp_negative_stock(apps, schema_editor):
+    """Zera estoques negativos com uma entrada de ajuste antes da constraint."""
+    Product = apps.get_model("products", "Product")
+    ProductMovement = apps.get_model("products", "ProductMovement")
+
+    for product in Product.objects.filter(stock__lt=0):
+        quantity = -product.stock
+        product.ledger_balance += quantity
+        ProductMovement.objects.create(
+            product=product,
+            user_id=product.user_id,
+            type="IN",
+            quantity=quantity,
+            reason="Ajuste de estoque",
+            balance_after=product.ledger_balance,
+        )
+        product.stock = 0
+        product.save(update_fields=["stock", "ledger_balance"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0015_history_and_catalog_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_negative_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="product",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("stock__gte", 0)), name="product_stock_non_negative"
+            ),
+        ),
+    ]
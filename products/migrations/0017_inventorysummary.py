@@ -0,0 +1,47 @@
+# Generated by Django 6.1.2 on 2026-10-16 23:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("products", "0016_product_stock_non_negative"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventorySummary",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="inventory_summary",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("total_count", models.IntegerField(default=0)),
+                ("total_stock", models.BigIntegerField(default=0)),
+                (
+                    "total_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                ("public_count", models.IntegerField(default=0)),
+                ("public_stock", models.BigIntegerField(default=0)),
+                (
+                    "public_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "Inventory Summaries",
+            },
+        ),
+    ]
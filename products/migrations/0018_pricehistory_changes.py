@@ -0,0 +1,75 @@
+# Generated by Django 6.1.2 on 2026-10-16 23:17
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+
+
+def backfill_price_changes(apps, schema_editor):
+    """Preenche preço anterior e variações em uma única passada com LAG."""
+    PriceHistory = apps.get_model("products", "PriceHistory")
+
+    entries = (
+        PriceHistory.objects.annotate(
+            lag_price=Window(
+                Lag("price"),
+                partition_by=[F("product_id")],
+                order_by=[F("changed_at").asc(), F("id").asc()],
+            )
+        )
+        .only("id", "price")
+        .order_by()
+    )
+    pending = []
+    for entry in entries.iterator(chunk_size=2000):
+        previous = entry.lag_price
+        entry.previous_price = previous
+        entry.delta = entry.price - previous if previous is not None else None
+        entry.pct_change = (
+            (entry.delta / previous * 100).quantize(Decimal("0.01"))
+            if previous
+            else None
+        )
+        pending.append(entry)
+        if len(pending) >= 2000:
+            PriceHistory.objects.bulk_update(
+                pending, ["previous_price", "delta", "pct_change"]
+            )
+            pending = []
+    if pending:
+        PriceHistory.objects.bulk_update(
+            pending, ["previous_price", "delta", "pct_change"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0017_inventorysummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pricehistory",
+            name="delta",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="pricehistory",
+            name="pct_change",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=14, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="pricehistory",
+            name="previous_price",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_price_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from products.search import install_search_index
+
+    install_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from products.search import uninstall_search_index
+
+    uninstall_search_index(schema_editor.connection)
+
+
+def create_search_gin_index(apps, schema_editor):
+    from products.search import install_search_gin_index
+
+    install_search_gin_index(schema_editor.connection)
+
+
+def drop_search_gin_index(apps, schema_editor):
+    from products.search import uninstall_search_gin_index
+
+    uninstall_search_gin_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY não podem rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ("products", "0018_pricehistory_changes"),
+    ]
+
+    operations = [
+        # Coluna gerada (PostgreSQL) ou tabela FTS5 (SQLite)
+        migrations.RunPython(create_search_index, drop_search_index),
+        # Índice GIN da coluna (PostgreSQL), criado sem bloquear escritas em
+        # products_product
+        migrations.RunPython(create_search_gin_index, drop_search_gin_index),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 6.1.2 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from itertools import batched
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    """Agrega as movimentações existentes por produto e dia."""
+    ProductMovement = apps.get_model("products", "ProductMovement")
+    MovementRollup = apps.get_model("products", "MovementRollup")
+
+    rows = (
+        ProductMovement.objects.order_by()
+        .annotate(day=TruncDate("moved_at"))
+        .values("product_id", "user_id", "day")
+        .annotate(
+            in_quantity=Sum("quantity", filter=Q(type="IN"), default=0),
+            out_quantity=Sum("quantity", filter=Q(type="OUT"), default=0),
+            in_count=Count("pk", filter=Q(type="IN")),
+            out_count=Count("pk", filter=Q(type="OUT")),
+        )
+    )
+    for batch in batched(rows.iterator(chunk_size=1000), 1000):
+        MovementRollup.objects.bulk_create([MovementRollup(**row) for row in batch])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0021_product_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MovementRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("in_quantity", models.BigIntegerField(default=0)),
+                ("out_quantity", models.BigIntegerField(default=0)),
+                ("in_count", models.IntegerField(default=0)),
+                ("out_count", models.IntegerField(default=0)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="products.product",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Movement Rollups",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "day"], name="movement_rollup_user_day_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "day"),
+                        name="movement_rollup_product_day_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+from products.db_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ("products", "0023_inventory_snapshots"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name="productmovement",
+            index=models.Index(fields=["moved_at"], name="movement_moved_at_idx"),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="pricehistory",
+            index=models.Index(fields=["changed_at"], name="pricehist_changed_at_idx"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+from products.db_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ("products", "0025_movementarchive"),
+    ]
+
+    operations = [
+        # Parcial: só as linhas de saldo de meses compactados entram no índice
+        AddIndexConcurrentlyIfPostgres(
+            model_name="productmovement",
+            index=models.Index(
+                condition=models.Q(("archive__isnull", False)),
+                fields=["archive"],
+                name="movement_archive_idx",
+            ),
+        ),
+    ]
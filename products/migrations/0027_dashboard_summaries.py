@@ -0,0 +1,121 @@
+# Generated by Django 6.1.2 on 2026-10-17 14:05
+
+import django.db.models.deletion
+from itertools import batched
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def populate_category_summaries(apps, schema_editor):
+    """Calcula os totais das categorias existentes a partir dos produtos."""
+    Category = apps.get_model("products", "Category")
+    CategorySummary = apps.get_model("products", "CategorySummary")
+
+    value = models.ExpressionWrapper(
+        F("products__price") * F("products__stock"),
+        output_field=models.DecimalField(max_digits=18, decimal_places=2),
+    )
+    rows = (
+        Category.objects.order_by()
+        .annotate(
+            product_count=Count("products"),
+            total_stock=Sum("products__stock", default=0),
+            total_value=Sum(value, default=0),
+        )
+        .values("pk", "user_id", "product_count", "total_stock", "total_value")
+    )
+    for batch in batched(rows.iterator(chunk_size=1000), 1000):
+        CategorySummary.objects.bulk_create(
+            [
+                CategorySummary(
+                    category_id=row.pop("pk"), user_id=row.pop("user_id"), **row
+                )
+                for row in batch
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0026_movement_archive_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyInventoryChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("stock_change", models.BigIntegerField(default=0)),
+                (
+                    "value_change",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Daily Inventory Changes",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "day"),
+                        name="inventory_change_user_day_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CategorySummary",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="products.category",
+                    ),
+                ),
+                ("product_count", models.IntegerField(default=0)),
+                ("total_stock", models.BigIntegerField(default=0)),
+                (
+                    "total_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="category_summaries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Category Summaries",
+            },
+        ),
+        migrations.RunPython(populate_category_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 6.1.2 on 2026-10-17 16:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0027_dashboard_summaries"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductDeletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("product_id", models.BigIntegerField()),
+                (
+                    "deleted_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("snapshot_day", models.DateField()),
+                ("covered_until", models.DateField()),
+                ("stock", models.IntegerField()),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Product Deletions",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "deleted_at"],
+                        name="product_deletion_user_idx",
+                    ),
+                    models.Index(
+                        fields=["deleted_at"], name="product_deletion_date_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
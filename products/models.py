@@ -1,8 +1,23 @@
-from django.db import models
+import json
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import IntegrityError, NotSupportedError, models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.functions import (
+    RowNumber,
+    TruncDate,
+    TruncDay,
+    TruncMonth,
+    TruncWeek,
+)
+from django.utils import timezone
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from typing import TYPE_CHECKING
+from . import autocomplete
+from .page_cache import invalidate_catalogs, invalidate_dashboard
 
 if TYPE_CHECKING:
     from .models import PriceHistory, ProductMovement
@@ -27,6 +42,16 @@ class Category(models.Model):
         ]
 
 
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Carrega junto o que as listagens exibem de cada produto: o dono (uma
+        junção) e as categorias (uma consulta para a página inteira), evitando
+        uma consulta extra por produto nos templates e serializers.
+        """
+        return self.select_related("user").prefetch_related("categories")
+
+
 class Product(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="products", null=True, blank=True
@@ -43,6 +68,20 @@ class Product(models.Model):
     is_public = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Saldo acumulado do ledger de movimentações (mantido por ProductMovement.save)
+    ledger_balance = models.IntegerField(default=0, editable=False)
+    # Último preço registrado no histórico (mantido por PriceHistory.save)
+    last_recorded_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, editable=False
+    )
+
+    objects = ProductQuerySet.as_manager()
+
+    # Campos derivados mantidos pelos registros de histórico. Um save() completo
+    # não os sobrescreve, evitando que uma instância desatualizada apague o saldo.
+    DERIVED_FIELDS = ("ledger_balance", "last_recorded_price")
+    # Campos que compõem os totais do InventorySummary
+    SUMMARY_FIELDS = ("user_id", "stock", "price", "is_public")
 
     """ Como price_history é injetado em Product com  <related_name="price_history">
         isso avisa ao linter que price_history defato existe em Product.
@@ -53,6 +92,74 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            # Dashboard do dono: filtro por usuário (e status) + ordenação. O id
+            # fecha cada índice porque a paginação ordena por (campo, pk).
+            models.Index(
+                fields=["user", "name", "id"], name="product_user_name_cursor_idx"
+            ),
+            models.Index(
+                fields=["user", "price", "id"], name="product_user_price_cursor_idx"
+            ),
+            models.Index(
+                fields=["user", "stock", "id"], name="product_user_stock_cursor_idx"
+            ),
+            models.Index(
+                fields=["user", "is_public", "id"],
+                name="product_user_status_cursor_idx",
+            ),
+            models.Index(
+                fields=["user", "is_public", "name", "id"],
+                name="product_user_pub_name_cur_idx",
+            ),
+            # Catálogo público: índices parciais apenas com produtos públicos
+            models.Index(
+                fields=["name", "id"],
+                name="product_pub_name_cursor_idx",
+                condition=models.Q(is_public=True),
+            ),
+            models.Index(
+                fields=["price", "id"],
+                name="product_pub_price_cursor_idx",
+                condition=models.Q(is_public=True),
+            ),
+            models.Index(
+                fields=["stock", "id"],
+                name="product_pub_stock_cursor_idx",
+                condition=models.Q(is_public=True),
+            ),
+        ]
+        constraints = [
+            # Última barreira contra saídas concorrentes que deixariam o estoque negativo
+            models.CheckConstraint(
+                condition=models.Q(stock__gte=0), name="product_stock_non_negative"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            if kwargs.get("update_fields") is None:
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.DERIVED_FIELDS
+                ]
+            # Uma única leitura por chave primária deixa os campos derivados
+            # atualizados para os signals de histórico, sem consultar o histórico,
+            # e guarda os valores gravados para o delta do resumo de inventário.
+            stored = (
+                Product.objects.filter(pk=self.pk)
+                .values(*self.DERIVED_FIELDS, *self.SUMMARY_FIELDS)
+                .get()
+            )
+            self.ledger_balance = stored["ledger_balance"]
+            self.last_recorded_price = stored["last_recorded_price"]
+            self._stored_state = stored
+        else:
+            self._stored_state = None
+        super().save(*args, **kwargs)
+
 
 class PriceHistory(models.Model):
     product = models.ForeignKey(
@@ -60,13 +167,115 @@ class PriceHistory(models.Model):
     )
     price = models.DecimalField(max_digits=10, decimal_places=2)
     changed_at = models.DateTimeField(auto_now_add=True)
+    # Variação em relação ao registro anterior do mesmo produto, gravada na
+    # criação para que o histórico seja exibido sem comparar linhas vizinhas
+    previous_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, editable=False
+    )
+    delta = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, editable=False
+    )
+    pct_change = models.DecimalField(
+        max_digits=14, decimal_places=2, null=True, blank=True, editable=False
+    )
 
     def __str__(self):
         return f"{self.product.name} - R$ {self.price} em {self.changed_at.strftime('%d/%m/%Y %H:%M')}"
 
+    def save(self, *args, **kwargs):
+        """
+        Ao criar um registro, grava a variação em relação ao último preço
+        registrado e guarda o novo preço em Product.last_recorded_price para que
+        os próximos saves comparem o preço sem consultar o histórico.
+        """
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # A linha do produto fica bloqueada até o fim da transação, então
+            # o preço anterior lido aqui é o do registro imediatamente anterior
+            previous_price = (
+                Product.objects.select_for_update()
+                .filter(pk=self.product_id)
+                .values_list("last_recorded_price", flat=True)
+                .get()
+            )
+            self.set_previous_price(previous_price)
+            super().save(*args, **kwargs)
+            Product.objects.filter(pk=self.product_id).update(
+                last_recorded_price=self.price
+            )
+        if self._meta.get_field("product").is_cached(self):
+            self.product.last_recorded_price = self.price
+
+    def set_previous_price(self, previous_price):
+        """Preenche o preço anterior e as variações absoluta e percentual."""
+        self.previous_price = previous_price
+        if previous_price is None:
+            self.delta = self.pct_change = None
+            return
+        self.delta = Decimal(self.price) - previous_price
+        self.pct_change = (
+            (self.delta / previous_price * 100).quantize(Decimal("0.01"))
+            if previous_price
+            else None
+        )
+
+    @classmethod
+    def recent_by_product(cls, products, limit=10):
+        """
+        Retorna, para cada produto, apenas os ``limit`` registros mais recentes,
+        com a posição (ROW_NUMBER, 1 = mais recente) e o total de alterações do
+        produto. O preço anterior já vem gravado em cada registro.
+
+        As funções de janela rodam sobre todo o histórico no banco; o Python
+        recebe no máximo ``limit`` linhas por produto.
+        """
+        return (
+            cls.objects.filter(product__in=products)
+            .annotate(
+                row_number=models.Window(
+                    RowNumber(),
+                    partition_by=[models.F("product_id")],
+                    order_by=[models.F("changed_at").desc(), models.F("pk").desc()],
+                ),
+                change_count=models.Window(
+                    models.Count("pk"), partition_by=[models.F("product_id")]
+                ),
+            )
+            .filter(row_number__lte=limit)
+            .order_by("product_id", "row_number")
+        )
+
     class Meta:
         verbose_name_plural = "Price Histories"
         ordering = ["-changed_at"]
+        indexes = [
+            # Histórico de um produto, do mais recente para o mais antigo, com o
+            # id como desempate (mesma ordem da paginação por cursor)
+            models.Index(
+                fields=["product", "-changed_at", "-id"],
+                name="pricehist_product_cursor_idx",
+            ),
+            # Mudanças de preço de um intervalo de datas (snapshots de inventário)
+            models.Index(fields=["changed_at"], name="pricehist_changed_at_idx"),
+        ]
+
+
+class ProductMovementQuerySet(models.QuerySet):
+    def stats(self):
+        """
+        Estatísticas das movimentações em uma única consulta agregada:
+        quantidade, unidades por tipo, saldo líquido e produtos distintos.
+        """
+        totals = self.aggregate(
+            total_movements=models.Count("pk"),
+            total_in=models.Sum("quantity", filter=models.Q(type="IN"), default=0),
+            total_out=models.Sum("quantity", filter=models.Q(type="OUT"), default=0),
+            products_touched=models.Count("product", distinct=True),
+        )
+        totals["net_flow"] = totals["total_in"] - totals["total_out"]
+        return totals
 
 
 class ProductMovement(models.Model):
@@ -77,17 +286,816 @@ class ProductMovement(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="movements"
     )
+    # Dono do produto, copiado na criação para permitir consultas por usuário
+    # ordenadas por data sem junção com a tabela de produtos
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,  # coberto pelo índice (user, -moved_at)
+    )
     type = models.CharField(max_length=3, choices=MOVEMENT_TYPES)
     quantity = models.IntegerField()
     reason = models.CharField(max_length=255, blank=True)
     moved_at = models.DateTimeField(auto_now_add=True)
+    # Saldo do produto logo após esta movimentação (running balance)
+    balance_after = models.IntegerField(null=True, blank=True, editable=False)
+    # Preenchido nas linhas que resumem um período compactado: as
+    # movimentações originais ficam comprimidas no arquivo
+    archive = models.ForeignKey(
+        "MovementArchive",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,  # coberto pelo índice parcial movement_archive_idx
+    )
+
+    objects = ProductMovementQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.get_type_display()} - {self.product.name} ({self.quantity}) em {self.moved_at.strftime('%d/%m/%Y %H:%M')}"
 
+    @property
+    def signed_quantity(self):
+        return self.quantity if self.type == "IN" else -self.quantity
+
+    def save(self, *args, **kwargs):
+        """
+        Ao criar uma movimentação, atualiza o saldo do ledger do produto e grava
+        o saldo resultante em balance_after, sem reagregar o histórico.
+        """
+        if not self._state.adding or self.balance_after is not None:
+            if self._state.adding and self.user_id is None:
+                self.user_id = self.product.user_id
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # O UPDATE bloqueia a linha do produto até o fim da transação,
+            # então o saldo lido em seguida é consistente.
+            ledger = Product.objects.filter(pk=self.product_id)
+            ledger.update(
+                ledger_balance=models.F("ledger_balance") + self.signed_quantity
+            )
+            self.balance_after, self.user_id = ledger.values_list(
+                "ledger_balance", "user_id"
+            ).get()
+            super().save(*args, **kwargs)
+
+        # Mantém a instância em memória sincronizada para o signal de estoque
+        if self._meta.get_field("product").is_cached(self):
+            self.product.ledger_balance = self.balance_after
+
     class Meta:
         verbose_name_plural = "Product Movements"
         ordering = ["-moved_at"]
+        indexes = [
+            models.Index(
+                fields=["product", "-moved_at", "-id"],
+                name="movement_product_cursor_idx",
+            ),
+            # Listagens e cursores por usuário: data decrescente com o id como
+            # desempate, na mesma ordem da paginação
+            models.Index(
+                fields=["user", "-moved_at", "-id"], name="movement_user_cursor_idx"
+            ),
+            # Movimentações de um intervalo de datas (snapshots de inventário)
+            models.Index(fields=["moved_at"], name="movement_moved_at_idx"),
+            models.Index(
+                fields=["archive"],
+                name="movement_archive_idx",
+                condition=models.Q(archive__isnull=False),
+            ),
+        ]
+
+
+class MovementArchive(models.Model):
+    """
+    Movimentações originais de um produto em um mês já compactado, gravadas
+    como JSON comprimido (zlib). Na tabela de movimentações, o mês fica
+    representado por uma única linha com o saldo líquido do período.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="movement_archives"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        blank=True,
+        db_index=False,
+    )
+    # Primeiro dia do mês arquivado
+    period = models.DateField()
+    movement_count = models.IntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Campos de cada movimentação guardados no arquivo
+    FIELDS = ("id", "type", "quantity", "reason", "balance_after")
+
+    def __str__(self):
+        return f"{self.product.name} em {self.period.strftime('%m/%Y')}"
+
+    class Meta:
+        verbose_name_plural = "Movement Archives"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "period"],
+                name="movement_archive_product_period_uniq",
+            ),
+        ]
+
+    @classmethod
+    def pack(cls, movements):
+        """Serializa e comprime uma lista de movimentações."""
+        rows = [
+            {
+                **{field: getattr(movement, field) for field in cls.FIELDS},
+                "moved_at": movement.moved_at.isoformat(),
+            }
+            for movement in movements
+        ]
+        return zlib.compress(json.dumps(rows, separators=(",", ":")).encode())
+
+    def movements(self):
+        """
+        Movimentações originais do arquivo, em ordem cronológica, como
+        instâncias não salvas de ProductMovement.
+        """
+        rows = json.loads(zlib.decompress(bytes(self.data)))
+        return [
+            ProductMovement(
+                product_id=self.product_id,
+                user_id=self.user_id,
+                moved_at=datetime.fromisoformat(row.pop("moved_at")),
+                **row,
+            )
+            for row in rows
+        ]
+
+
+class InventorySummary(models.Model):
+    """
+    Totais de inventário por usuário (quantidade, estoque e valor), mantidos
+    incrementalmente pelas escritas de produtos e movimentações. O dashboard
+    sem filtros lê uma única linha em vez de agregar todos os produtos.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="inventory_summary",
+    )
+    total_count = models.IntegerField(default=0)
+    total_stock = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    public_count = models.IntegerField(default=0)
+    public_stock = models.BigIntegerField(default=0)
+    public_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    TOTAL_FIELDS = (
+        "total_count",
+        "total_stock",
+        "total_value",
+        "public_count",
+        "public_stock",
+        "public_value",
+    )
+
+    def __str__(self):
+        return f"Inventário de {self.user.username}"
+
+    class Meta:
+        verbose_name_plural = "Inventory Summaries"
+
+    @staticmethod
+    def totals(products):
+        """
+        Calcula total_count, total_stock e total_value de um queryset de produtos
+        em uma única consulta agregada (usado pelas listagens filtradas).
+        """
+        value = models.ExpressionWrapper(
+            models.F("price") * models.F("stock"),
+            output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        )
+        totals = products.aggregate(
+            total_count=models.Count("pk"),
+            total_stock=models.Sum("stock"),
+            total_value=models.Sum(value),
+        )
+        return {key: totals[key] or 0 for key in totals}
+
+    @classmethod
+    def compute(cls, products):
+        """
+        Agrega os totais por usuário de um queryset de produtos com um único
+        GROUP BY. Retorna {user_id: {campo: valor}}.
+        """
+        value = models.ExpressionWrapper(
+            models.F("price") * models.F("stock"),
+            output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        )
+        public = models.Q(is_public=True)
+        rows = (
+            products.filter(user__isnull=False)
+            .order_by()
+            .values("user_id")
+            .annotate(
+                total_count=models.Count("pk"),
+                total_stock=models.Sum("stock"),
+                total_value=models.Sum(value),
+                public_count=models.Count("pk", filter=public),
+                public_stock=models.Sum("stock", filter=public),
+                public_value=models.Sum(value, filter=public),
+            )
+        )
+        return {
+            row["user_id"]: {field: row[field] or 0 for field in cls.TOTAL_FIELDS}
+            for row in rows
+        }
+
+    @classmethod
+    def rebuild(cls, user_id):
+        """Recalcula a linha de um usuário a partir dos produtos."""
+        values = cls.compute(Product.objects.filter(user_id=user_id)).get(
+            user_id, dict.fromkeys(cls.TOTAL_FIELDS, 0)
+        )
+        summary, _ = cls.objects.update_or_create(user_id=user_id, defaults=values)
+        return summary
+
+    @classmethod
+    def for_user(cls, user):
+        """Retorna o resumo do usuário, criando-o na primeira leitura."""
+        summary = cls.objects.filter(user=user).first()
+        return summary or cls.rebuild(user.pk)
+
+    @staticmethod
+    def contribution(stock, price, is_public, count=1):
+        """
+        Parcela de um produto nos totais do resumo. Com count=0, representa só
+        uma variação de estoque de um produto já contabilizado.
+        """
+        value = Decimal(price) * stock
+        return {
+            "total_count": count,
+            "total_stock": stock,
+            "total_value": value,
+            "public_count": count if is_public else 0,
+            "public_stock": stock if is_public else 0,
+            "public_value": value if is_public else 0,
+        }
+
+    @classmethod
+    def collect(cls, deltas, state, sign=1):
+        """
+        Acumula em deltas[user_id] a parcela de um produto, dado seu estado
+        (dict com Product.SUMMARY_FIELDS). Use sign=-1 para retirar a parcela.
+        """
+        user_deltas = deltas.setdefault(state["user_id"], {})
+        contribution = cls.contribution(
+            state["stock"], state["price"], state["is_public"]
+        )
+        for field, value in contribution.items():
+            user_deltas[field] = user_deltas.get(field, 0) + sign * value
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """Aplica os deltas acumulados por collect(), um UPDATE por usuário."""
+        for user_id, user_deltas in deltas.items():
+            cls.apply_delta(user_id, **user_deltas)
+
+    @classmethod
+    def apply_delta(cls, user_id, **deltas):
+        """
+        Soma os deltas à linha do usuário com um UPDATE atômico (F expressions).
+        Se a linha ainda não existe, nada é feito: ela será criada já com os
+        valores corretos na primeira leitura.
+
+        A variação de estoque e valor também entra na linha do dia de
+        DailyInventoryChange, e o ETag do dashboard do usuário muda.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if user_id is None or not deltas:
+            return
+        updated = cls.objects.filter(user_id=user_id).update(
+            **{field: models.F(field) + delta for field, delta in deltas.items()}
+        )
+        if updated:
+            DailyInventoryChange.record(
+                user_id,
+                deltas.get("total_stock", 0),
+                deltas.get("total_value", 0),
+            )
+        invalidate_dashboard(user_id)
+
+    def stats(self, status=""):
+        """Totais no formato usado pelas listagens, opcionalmente por status."""
+        if status == "public":
+            count, stock, value = (
+                self.public_count,
+                self.public_stock,
+                self.public_value,
+            )
+        elif status == "private":
+            count = self.total_count - self.public_count
+            stock = self.total_stock - self.public_stock
+            value = self.total_value - self.public_value
+        else:
+            count, stock, value = self.total_count, self.total_stock, self.total_value
+        return {"total_count": count, "total_stock": stock, "total_value": value}
+
+
+class DailyInventoryChange(models.Model):
+    """
+    Variação diária do estoque e do valor total de cada usuário, somada a cada
+    atualização do InventorySummary. A evolução dos últimos dias é o total
+    atual menos as variações posteriores a cada dia, lida de poucas linhas.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+    day = models.DateField()
+    stock_change = models.BigIntegerField(default=0)
+    value_change = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # Dias cobertos pela evolução do dashboard
+    TREND_DAYS = 30
+
+    class Meta:
+        verbose_name_plural = "Daily Inventory Changes"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "day"], name="inventory_change_user_day_uniq"
+            )
+        ]
+
+    @classmethod
+    def record(cls, user_id, stock, value):
+        """Soma a variação à linha de hoje do usuário, criando-a se preciso."""
+        if not stock and not value:
+            return
+        changes = {
+            "stock_change": models.F("stock_change") + stock,
+            "value_change": models.F("value_change") + value,
+        }
+        today = cls.objects.filter(user_id=user_id, day=timezone.localdate())
+        if today.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    user_id=user_id,
+                    day=timezone.localdate(),
+                    stock_change=stock,
+                    value_change=value,
+                )
+        except IntegrityError:
+            # Outra escrita criou a linha do dia entre o UPDATE e o INSERT
+            today.update(**changes)
+
+    @classmethod
+    def trend(cls, summary, days=TREND_DAYS):
+        """
+        Estoque e valor total no fim de cada um dos últimos ``days`` dias
+        (o último é hoje), partindo dos totais atuais do ``summary``.
+        """
+        today = timezone.localdate()
+        first = today - timedelta(days=days - 1)
+        changes = {
+            day: (stock, value)
+            for day, stock, value in cls.objects.filter(
+                user_id=summary.user_id, day__gt=first
+            ).values_list("day", "stock_change", "value_change")
+        }
+        stock, value = summary.total_stock, summary.total_value
+        points = []
+        for offset in range(days):
+            day = today - timedelta(days=offset)
+            points.append({"date": day, "total_stock": stock, "total_value": value})
+            # Fim do dia anterior: desfaz as variações deste dia
+            day_stock, day_value = changes.get(day, (0, 0))
+            stock -= day_stock
+            value -= day_value
+        points.reverse()
+        return points
+
+
+class CategorySummary(models.Model):
+    """
+    Totais de cada categoria (produtos, estoque e valor), mantidos pelas
+    escritas de produtos, movimentações e pela associação produto-categoria.
+    A distribuição de valor por categoria do dashboard lê apenas essas linhas,
+    sem juntar produtos e categorias.
+
+    Um produto com várias categorias entra nos totais de cada uma delas.
+    """
+
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="category_summaries",
+    )
+    product_count = models.IntegerField(default=0)
+    total_stock = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    TOTAL_FIELDS = ("product_count", "total_stock", "total_value")
+
+    def __str__(self):
+        return f"Resumo de {self.category.name}"
+
+    class Meta:
+        verbose_name_plural = "Category Summaries"
+
+    @classmethod
+    def compute(cls, categories):
+        """
+        Totais de um queryset de categorias em uma única consulta agregada.
+        Retorna {category_id: {campo: valor}}.
+        """
+        value = models.ExpressionWrapper(
+            models.F("products__price") * models.F("products__stock"),
+            output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        )
+        rows = categories.order_by().annotate(
+            product_count=models.Count("products"),
+            total_stock=models.Sum("products__stock"),
+            total_value=models.Sum(value),
+        )
+        return {
+            row["pk"]: {field: row[field] or 0 for field in cls.TOTAL_FIELDS}
+            for row in rows.values("pk", *cls.TOTAL_FIELDS)
+        }
+
+    @classmethod
+    def rebuild(cls, categories):
+        """Recria as linhas das categorias a partir dos produtos."""
+        totals = cls.compute(categories)
+        owners = dict(categories.values_list("pk", "user_id"))
+        with transaction.atomic():
+            cls.objects.filter(category__in=categories).delete()
+            cls.objects.bulk_create(
+                [
+                    cls(category_id=pk, user_id=owners[pk], **values)
+                    for pk, values in totals.items()
+                ],
+                batch_size=1000,
+            )
+        return len(totals)
+
+    @staticmethod
+    def contribution(stock, price, count=1):
+        """Parcela de um produto nos totais (count=0: só variação de estoque)."""
+        return {
+            "product_count": count,
+            "total_stock": stock,
+            "total_value": Decimal(price) * stock,
+        }
+
+    @classmethod
+    def change(cls, stored, current):
+        """Diferença de totais entre dois estados de um produto já contado."""
+        before = cls.contribution(stored["stock"], stored["price"], count=0)
+        after = cls.contribution(current["stock"], current["price"], count=0)
+        return {field: after[field] - before[field] for field in after}
+
+    @staticmethod
+    def add(rows, deltas):
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            rows.update(
+                **{field: models.F(field) + delta for field, delta in deltas.items()}
+            )
+
+    @classmethod
+    def apply_product_delta(cls, product_id, **deltas):
+        """Soma os deltas às linhas de todas as categorias do produto (um UPDATE)."""
+        cls.add(cls.objects.filter(category__products=product_id), deltas)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """Aplica deltas acumulados por categoria, um UPDATE por categoria."""
+        for category_id, category_deltas in deltas.items():
+            cls.add(cls.objects.filter(category_id=category_id), category_deltas)
+
+    @classmethod
+    def apply_membership(cls, category_ids, products, sign=1):
+        """
+        Soma (ou, com sign=-1, retira) os totais dos ``products`` das
+        categorias informadas: uma agregação e um UPDATE.
+        """
+        totals = InventorySummary.totals(products)
+        cls.add(
+            cls.objects.filter(category_id__in=category_ids),
+            {
+                "product_count": sign * totals["total_count"],
+                "total_stock": sign * totals["total_stock"],
+                "total_value": sign * totals["total_value"],
+            },
+        )
+
+
+class MovementRollupQuerySet(models.QuerySet):
+    def series(self, bucket="day"):
+        """
+        Entradas e saídas agrupadas por período (``day``, ``week`` ou
+        ``month``), em ordem cronológica, com o saldo líquido de cada período.
+        """
+        period = MovementRollup.BUCKETS[bucket]("day")
+        return (
+            self.order_by()
+            .annotate(period=period)
+            .values("period")
+            .annotate(
+                in_quantity=models.Sum("in_quantity"),
+                out_quantity=models.Sum("out_quantity"),
+                in_count=models.Sum("in_count"),
+                out_count=models.Sum("out_count"),
+            )
+            .annotate(net_flow=models.F("in_quantity") - models.F("out_quantity"))
+            .order_by("period")
+        )
+
+
+class MovementRollup(models.Model):
+    """
+    Entradas e saídas diárias por produto (unidades e número de movimentações),
+    mantidas incrementalmente a cada movimentação gravada. Relatórios por
+    período leem uma linha por produto e dia em vez das movimentações brutas.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_rollups"
+    )
+    # Dono do produto, como em ProductMovement, para séries por usuário sem
+    # junção com produtos
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        blank=True,
+        db_index=False,  # coberto pelo índice (user, day)
+    )
+    day = models.DateField()
+    in_quantity = models.BigIntegerField(default=0)
+    out_quantity = models.BigIntegerField(default=0)
+    in_count = models.IntegerField(default=0)
+    out_count = models.IntegerField(default=0)
+
+    TOTAL_FIELDS = ("in_quantity", "out_quantity", "in_count", "out_count")
+    BUCKETS = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+    # Janela padrão (em dias) das séries quando nenhuma data inicial é informada
+    DEFAULT_SPANS = {"day": 30, "week": 7 * 12, "month": 365}
+
+    objects = MovementRollupQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.product.name} em {self.day.strftime('%d/%m/%Y')}"
+
+    class Meta:
+        verbose_name_plural = "Movement Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "day"], name="movement_rollup_product_day_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "day"], name="movement_rollup_user_day_idx"),
+        ]
+
+    @classmethod
+    def default_start(cls, bucket, today=None):
+        """Primeiro dia da janela padrão de uma série."""
+        today = today or timezone.localdate()
+        return today - timedelta(days=cls.DEFAULT_SPANS[bucket])
+
+    @classmethod
+    def compute(cls, movements):
+        """
+        Agrega um queryset de movimentações por produto e dia (no fuso da
+        aplicação) com um único GROUP BY. Usado na reconstrução das linhas.
+        """
+        return (
+            movements.order_by()
+            .annotate(day=TruncDate("moved_at"))
+            .values("product_id", "user_id", "day")
+            .annotate(
+                in_quantity=models.Sum(
+                    "quantity", filter=models.Q(type="IN"), default=0
+                ),
+                out_quantity=models.Sum(
+                    "quantity", filter=models.Q(type="OUT"), default=0
+                ),
+                in_count=models.Count("pk", filter=models.Q(type="IN")),
+                out_count=models.Count("pk", filter=models.Q(type="OUT")),
+            )
+        )
+
+    @classmethod
+    def collect(cls, deltas, movement):
+        """
+        Acumula em deltas[(produto, usuário, dia)] a parcela de uma
+        movimentação, para aplicar várias de uma vez com apply_deltas().
+        """
+        day = timezone.localdate(movement.moved_at)
+        key = (movement.product_id, movement.user_id, day)
+        row = deltas.setdefault(key, dict.fromkeys(cls.TOTAL_FIELDS, 0))
+        prefix = "in" if movement.type == "IN" else "out"
+        row[f"{prefix}_quantity"] += movement.quantity
+        row[f"{prefix}_count"] += 1
+
+    @classmethod
+    def record(cls, movements):
+        """Soma movimentações recém-gravadas às linhas diárias."""
+        deltas = {}
+        for movement in movements:
+            cls.collect(deltas, movement)
+        cls.apply_deltas(deltas)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Aplica os deltas em lote: lê as linhas existentes dos pares (produto,
+        dia), soma os deltas e grava com um bulk_update e um bulk_create, sem
+        uma consulta por movimentação.
+
+        Toda gravação de movimentação bloqueia antes a linha do produto (ver
+        ProductMovement.save e register_movement), então duas transações nunca
+        alteram a linha diária do mesmo produto ao mesmo tempo.
+        """
+        if not deltas:
+            return
+        existing = {
+            (row.product_id, row.day): row
+            for row in cls.objects.filter(
+                product_id__in={product_id for product_id, _, _ in deltas},
+                day__in={day for _, _, day in deltas},
+            )
+        }
+        to_update, to_create = [], []
+        for (product_id, user_id, day), values in deltas.items():
+            row = existing.get((product_id, day))
+            if row is None:
+                to_create.append(
+                    cls(product_id=product_id, user_id=user_id, day=day, **values)
+                )
+                continue
+            for field, delta in values.items():
+                setattr(row, field, getattr(row, field) + delta)
+            to_update.append(row)
+        cls.objects.bulk_update(to_update, cls.TOTAL_FIELDS)
+        cls.objects.bulk_create(to_create)
+
+
+class ProductSnapshot(models.Model):
+    """
+    Estoque e preço de um produto no fim de um dia. Gravado apenas nos dias em
+    que o produto teve movimentações ou mudanças de preço desde o snapshot
+    anterior: o estado em uma data é a linha mais recente até ela.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="snapshots"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        blank=True,
+        db_index=False,
+    )
+    day = models.DateField()
+    stock = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.product.name} em {self.day.strftime('%d/%m/%Y')}"
+
+    class Meta:
+        verbose_name_plural = "Product Snapshots"
+        constraints = [
+            # Também serve à busca da linha mais recente até uma data
+            models.UniqueConstraint(
+                fields=["product", "day"], name="product_snapshot_product_day_uniq"
+            ),
+        ]
+
+
+class InventorySnapshot(models.Model):
+    """
+    Totais de inventário de um usuário no fim de um dia, calculados a partir
+    dos ProductSnapshot. Gravado apenas nos dias em que algum produto do
+    usuário mudou; consultas "em uma data" partem da linha mais recente até ela
+    (ver products.snapshots).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="inventory_snapshots",
+        db_index=False,  # coberto pela restrição única (user, day)
+    )
+    day = models.DateField()
+    total_count = models.IntegerField(default=0)
+    total_stock = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    TOTAL_FIELDS = ("total_count", "total_stock", "total_value")
+
+    def __str__(self):
+        return f"Inventário de {self.user.username} em {self.day.strftime('%d/%m/%Y')}"
+
+    class Meta:
+        verbose_name_plural = "Inventory Snapshots"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "day"], name="inventory_snapshot_user_day_uniq"
+            ),
+        ]
+
+
+class ProductDeletion(models.Model):
+    """
+    Parcela de um produto excluído nos snapshots já gravados: o último
+    ProductSnapshot do produto e o último dia de snapshot existente na
+    exclusão. Os snapshots do produto são apagados com ele; esta linha permite
+    retirá-lo dos totais "em uma data" e recalcular o usuário no snapshot
+    seguinte (ver products.snapshots).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,  # coberto pelo índice (user, deleted_at)
+    )
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    snapshot_day = models.DateField()
+    covered_until = models.DateField()
+    stock = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"Produto {self.product_id} excluído em {self.deleted_at:%d/%m/%Y}"
+
+    class Meta:
+        verbose_name_plural = "Product Deletions"
+        indexes = [
+            models.Index(
+                fields=["user", "deleted_at"], name="product_deletion_user_idx"
+            ),
+            models.Index(fields=["deleted_at"], name="product_deletion_date_idx"),
+        ]
+
+
+class JSONSetKey(models.Func):
+    """
+    Define uma chave de primeiro nível de um campo JSON dentro do próprio
+    UPDATE, sem regravar as outras chaves do documento.
+    """
+
+    output_field = models.JSONField()
+
+    def __init__(self, field, key, value):
+        self.key = key
+        self.value = json.dumps(value)
+        super().__init__(models.F(field))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(
+            f"JSONSetKey não é suportado no banco {connection.vendor}."
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        field, params = compiler.compile(self.get_source_expressions()[0])
+        sql = f"jsonb_set(COALESCE({field}, '{{}}'::jsonb), ARRAY[%s], %s::jsonb)"
+        return sql, (*params, self.key, self.value)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # json_set substitui o valor da chave; json_patch (RFC 7396) mesclaria
+        # objetos e não limparia a chave ao gravar {}
+        field, params = compiler.compile(self.get_source_expressions()[0])
+        sql = f"json_set(COALESCE({field}, '{{}}'), %s, json(%s))"
+        return sql, (*params, f'$."{self.key}"', self.value)
 
 
 class Profile(models.Model):
@@ -99,9 +1107,83 @@ class Profile(models.Model):
     theme = models.CharField(max_length=10, choices=THEME_CHOICES, default="light")
     view_preferences = models.JSONField(default=dict, blank=True)
 
+    # Perfis guardados no cache entre requisições (mesmo tempo de uma sessão
+    # longa); as escritas abaixo atualizam o cache junto com o banco
+    CACHE_TIMEOUT = 60 * 60 * 24
+
     def __str__(self):
         return f"{self.user.username}'s profile"
 
+    @staticmethod
+    def cache_key(user_id):
+        return f"profile:{user_id}"
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Perfil do usuário sem consultar o banco a cada requisição.
+
+        Dentro da requisição o perfil fica em ``user.profile``; entre
+        requisições, tema e preferências ficam no cache. Cria o perfil se o
+        usuário ainda não tiver um.
+        """
+        related = User.profile.related  # type: ignore[attr-defined]
+        if related.is_cached(user):
+            return user.profile
+
+        data = cache.get(cls.cache_key(user.pk))
+        if data is None:
+            profile, _ = cls.objects.get_or_create(user=user)
+            profile.store_in_cache()
+        else:
+            profile = cls.from_db(
+                cls.objects.db,
+                ["id", "user_id", "theme", "view_preferences"],
+                [data["id"], user.pk, data["theme"], data["view_preferences"]],
+            )
+            profile.user = user
+        related.set_cached_value(user, profile)
+        return profile
+
+    def store_in_cache(self):
+        cache.set(
+            self.cache_key(self.user_id),
+            {
+                "id": self.pk,
+                "theme": self.theme,
+                "view_preferences": self.view_preferences,
+            },
+            self.CACHE_TIMEOUT,
+        )
+
+    @classmethod
+    def set_theme(cls, user, theme):
+        """Grava só a coluna do tema, e apenas se ele mudou."""
+        profile = cls.for_user(user)
+        if profile.theme == theme:
+            return
+        cls.objects.filter(pk=profile.pk).update(theme=theme)
+        profile.theme = theme
+        profile.store_in_cache()
+
+    @classmethod
+    def set_view_preference(cls, user, context, mode):
+        """
+        Grava uma preferência de visualização alterando apenas a chave
+        ``context`` do JSON no banco (sem reescrever as demais), e apenas se
+        o valor mudou.
+        """
+        profile = cls.for_user(user)
+        if not isinstance(profile.view_preferences, dict):
+            profile.view_preferences = {}
+        if profile.view_preferences.get(context) == mode:
+            return
+        cls.objects.filter(pk=profile.pk).update(
+            view_preferences=JSONSetKey("view_preferences", context, mode)
+        )
+        profile.view_preferences = {**profile.view_preferences, context: mode}
+        profile.store_in_cache()
+
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -109,21 +1191,19 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.get_or_create(user=instance)
 
 
-from django.contrib.auth.signals import user_logged_in
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def forget_cached_profile(sender, instance, **kwargs):
+    # Gravações diretas (admin, save()) descartam a cópia do cache
+    cache.delete(Profile.cache_key(instance.user_id))
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if not hasattr(instance, "profile"):
-        Profile.objects.create(user=instance)
-    else:
-        instance.profile.save()
+from django.contrib.auth.signals import user_logged_in
 
 
 @receiver(user_logged_in)
 def load_user_theme(sender, request, user, **kwargs):
-    if hasattr(user, "profile"):
-        request.session["theme"] = user.profile.theme
+    request.session["theme"] = Profile.for_user(user).theme
 
 
 @receiver(post_save, sender=Product)
@@ -136,14 +1216,9 @@ def track_price_changes(sender, instance, created, **kwargs):
         # Primeiro registro de preço ao criar o produto
         PriceHistory.objects.create(product=instance, price=instance.price)
     else:
-        # Verifica se o preço mudou comparando com o último registro
-        last_price_entry = instance.price_history.first()
-
-        # Se não há histórico anterior, cria o primeiro registro
-        if not last_price_entry:
-            PriceHistory.objects.create(product=instance, price=instance.price)
-        # Se o preço mudou, cria um novo registro
-        elif last_price_entry.price != instance.price:
+        # Compara com o último preço registrado, guardado no próprio produto.
+        # Se não há histórico anterior (None) ou o preço mudou, cria um registro.
+        if instance.last_recorded_price != instance.price:
             PriceHistory.objects.create(product=instance, price=instance.price)
 
 
@@ -163,29 +1238,10 @@ def track_stock_changes(sender, instance, created, **kwargs):
                 reason="Registro inicial do produto",
             )
     else:
-        # Verifica se o estoque mudou comparando com o último estado conhecido
-        # Precisamos saber o estoque anterior. Como o Django não guarda o estado anterior nativamente no save,
-        # poderíamos usar um middleware ou buscar o último registro de movimentação para calcular.
-        # Mas uma forma mais simples é ver o saldo acumulado das movimentações.
-        # No entanto, se o usuário editar o campo 'stock' livremente, queremos capturar a diferença.
-
-        from django.db.models import Sum
-
-        movements_sum = (
-            instance.movements.aggregate(
-                total=Sum(
-                    models.Case(
-                        models.When(type="IN", then=models.F("quantity")),
-                        models.When(type="OUT", then=-models.F("quantity")),
-                        default=0,
-                        output_field=models.IntegerField(),
-                    )
-                )
-            )["total"]
-            or 0
-        )
-
-        diff = instance.stock - movements_sum
+        # O saldo do ledger é mantido a cada movimentação (e recarregado em
+        # Product.save), então a diferença é calculada em O(1), sem reagregar
+        # todo o histórico do produto.
+        diff = instance.stock - instance.ledger_balance
 
         if diff > 0:
             ProductMovement.objects.create(
@@ -200,6 +1256,192 @@ def track_stock_changes(sender, instance, created, **kwargs):
             )
 
 
+@receiver(post_save, sender=ProductMovement)
+def update_movement_rollup(sender, instance, created, **kwargs):
+    # Lotes gravados com bulk_create não disparam o signal: os serviços de
+    # escrita chamam MovementRollup.record diretamente
+    if created:
+        MovementRollup.record([instance])
+
+
+def saved_states(instance, update_fields):
+    """
+    Estado do produto antes do save() (None na criação) e o estado gravado,
+    com os campos de Product.SUMMARY_FIELDS.
+    """
+    stored = getattr(instance, "_stored_state", None)
+    current = {field: getattr(instance, field) for field in Product.SUMMARY_FIELDS}
+    if stored and update_fields is not None:
+        # Campos fora do update_fields não foram gravados
+        for field in Product.SUMMARY_FIELDS:
+            if field.removesuffix("_id") not in update_fields:
+                current[field] = stored[field]
+    return stored, current
+
+
+@receiver(post_save, sender=Product)
+def update_inventory_summary(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Aplica ao InventorySummary a diferença entre o estado gravado antes do
+    save() e o estado atual do produto.
+    """
+    stored, current = saved_states(instance, update_fields)
+    deltas = {}
+    if stored:
+        InventorySummary.collect(deltas, stored, sign=-1)
+    InventorySummary.collect(deltas, current)
+    InventorySummary.apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_inventory_summary(sender, instance, **kwargs):
+    deltas = {}
+    state = {field: getattr(instance, field) for field in Product.SUMMARY_FIELDS}
+    InventorySummary.collect(deltas, state, sign=-1)
+    InventorySummary.apply_deltas(deltas)
+
+
+@receiver(post_save, sender=Product)
+def update_category_summaries(sender, instance, created, update_fields=None, **kwargs):
+    # Produtos novos ainda não têm categorias: entram pelo m2m_changed
+    stored, current = saved_states(instance, update_fields)
+    if stored:
+        CategorySummary.apply_product_delta(
+            instance.pk, **CategorySummary.change(stored, current)
+        )
+
+
+@receiver(pre_delete, sender=Product)
+def remove_from_category_summaries(sender, instance, **kwargs):
+    # Antes da exclusão, enquanto as associações com categorias existem
+    CategorySummary.apply_product_delta(
+        instance.pk,
+        **CategorySummary.contribution(-instance.stock, instance.price, count=-1),
+    )
+
+
+@receiver(pre_delete, sender=Product)
+def record_product_deletion(sender, instance, **kwargs):
+    # Antes da exclusão, enquanto os snapshots do produto existem. Produtos
+    # que nunca entraram em um snapshot não estão em nenhum total gravado.
+    last = instance.snapshots.order_by("-day").first()
+    if last is None or instance.user_id is None:
+        return
+    ProductDeletion.objects.create(
+        user_id=instance.user_id,
+        product_id=instance.pk,
+        snapshot_day=last.day,
+        covered_until=InventorySnapshot.objects.aggregate(day=models.Max("day"))[
+            "day"
+        ],
+        stock=last.stock,
+        price=last.price,
+    )
+
+
+@receiver(post_delete, sender=User)
+def forget_product_deletions(sender, instance, **kwargs):
+    # A exclusão do usuário apaga seus produtos e grava as linhas acima depois
+    # que o Django já coletou o que apagar em cascata
+    ProductDeletion.objects.filter(user_id=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def update_category_membership(sender, instance, action, pk_set, **kwargs):
+    """
+    Soma os produtos associados (post_add) aos totais das categorias e retira
+    os desassociados antes da remoção (pre_remove, pre_clear), enquanto ainda
+    dá para saber quais associações existem. Vale para os dois lados da relação.
+    """
+    if action == "post_add":
+        sign = 1
+    elif action in ("pre_remove", "pre_clear"):
+        sign = -1
+    else:
+        return
+    if action != "pre_clear" and not pk_set:
+        return
+
+    if isinstance(instance, Category):
+        category_ids = [instance.pk]
+        if action == "post_add":
+            products = Product.objects.filter(pk__in=pk_set)
+        else:
+            products = instance.products.all()
+            if pk_set is not None:
+                products = products.filter(pk__in=pk_set)
+    else:
+        products = Product.objects.filter(pk=instance.pk)
+        if action == "post_add":
+            category_ids = list(pk_set)
+        else:
+            category_ids = instance.categories.values("pk")
+            if pk_set is not None:
+                category_ids = category_ids.filter(pk__in=pk_set)
+    CategorySummary.apply_membership(category_ids, products, sign)
+    invalidate_dashboard(instance.user_id)
+
+
+@receiver(post_save, sender=Product)
+def refresh_autocomplete_index(sender, instance, update_fields=None, **kwargs):
+    # Só atualiza índices já carregados e apenas depois do commit, para não
+    # sugerir nomes de uma transação desfeita
+    if update_fields is not None and "name" not in update_fields:
+        return
+    user_id, product_id, name = instance.user_id, instance.pk, instance.name
+    transaction.on_commit(
+        lambda: autocomplete.refresh_product(user_id, product_id, name)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def forget_autocomplete_entry(sender, instance, **kwargs):
+    user_id, product_id = instance.user_id, instance.pk
+    transaction.on_commit(lambda: autocomplete.forget_product(user_id, product_id))
+
+
+@receiver(post_save, sender=Product)
+def invalidate_catalog_pages(sender, instance, **kwargs):
+    # Produtos privados não aparecem nos catálogos, a não ser que tenham
+    # acabado de deixar de ser públicos
+    stored = getattr(instance, "_stored_state", None) or {}
+    if instance.is_public or stored.get("is_public"):
+        invalidate_catalogs(instance.user_id)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_pages_on_delete(sender, instance, **kwargs):
+    if instance.is_public:
+        invalidate_catalogs(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_catalog_pages_on_categories(sender, instance, action, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, Category) or instance.is_public:
+        invalidate_catalogs(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_pages_on_category(sender, instance, **kwargs):
+    invalidate_catalogs(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+def create_category_summary(sender, instance, created, **kwargs):
+    # Categoria nova começa sem produtos; as escritas seguintes somam à linha
+    if created:
+        CategorySummary.objects.create(category=instance, user_id=instance.user_id)
+    invalidate_dashboard(instance.user_id)
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_dashboard_on_category(sender, instance, **kwargs):
+    invalidate_dashboard(instance.user_id)
+
+
 @receiver(post_save, sender=User)
 def create_default_categories(sender, instance, created, **kwargs):
     if created:
@@ -0,0 +1,177 @@
+"""
+Cache das páginas do catálogo público.
+
+``public_product_list`` e ``user_public_catalog`` guardam no cache o resultado
+do pipeline de consultas (página de produtos, estatísticas e categorias),
+com chave formada pelos parâmetros de filtro e ordenação normalizados e pela
+geração do catálogo. O HTML continua sendo renderizado a cada requisição,
+porque depende do usuário (modo de visualização, tema, menu).
+
+Cada catálogo tem um contador de geração no cache: ``public`` para o catálogo
+geral e ``user:<id>`` para o catálogo de cada usuário. Os sinais de Product e
+Category (e os serviços de escrita em lote) incrementam as gerações afetadas;
+as entradas da geração anterior deixam de ser lidas e expiram sozinhas.
+
+O mesmo contador dá o ETag do dashboard JSON de cada usuário
+(``dashboard:<id>``), incrementado pelas escritas que mudam seus totais; uma
+requisição condicional com o ETag atual é respondida sem consultar o banco.
+
+As páginas vão para o cache como linhas simples (``cached_product``), com os
+campos que a listagem exibe e os valores da ordenação, nunca como instâncias
+de modelo: o dono carregado com o produto levaria junto o registro completo do
+usuário, inclusive o hash da senha.
+
+Funciona com qualquer backend que implemente ``incr`` (memória local, arquivo,
+Redis). Com memória local o cache é por processo, então só serve para
+desenvolvimento ou para um único processo.
+"""
+
+import hashlib
+import time
+from types import SimpleNamespace
+from django.core.cache import cache
+from django.db import transaction
+
+PAGE_CACHE_TIMEOUT = 600
+PUBLIC_SCOPE = "public"
+
+# Parâmetros que mudam o conteúdo das páginas do catálogo
+CACHED_PARAMS = (
+    "q",
+    "category",
+    "min_price",
+    "max_price",
+    "min_stock",
+    "max_stock",
+    "sort",
+    "dir",
+    "cursor",
+)
+
+# Campos de cada produto exibidos pela listagem do catálogo
+CACHED_PRODUCT_FIELDS = (
+    "pk",
+    "name",
+    "description",
+    "price",
+    "stock",
+    "is_public",
+    "user_id",
+)
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def generation_key(scope):
+    return f"catalog-generation:{scope}"
+
+
+def get_generation(scope):
+    key = generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        # Começa pelo relógio: um contador perdido (descartado pelo backend)
+        # nunca volta a uma geração que já tenha páginas guardadas
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(generation_key(scope))
+        except ValueError:
+            cache.add(generation_key(scope), time.time_ns(), timeout=None)
+
+
+def invalidate_catalogs(*user_ids):
+    """
+    Invalida o catálogo público e os catálogos dos usuários informados.
+
+    Incrementa as gerações agora e de novo após o commit: uma leitura feita
+    entre as duas (ainda sem ver a escrita) não fica guardada na geração
+    final.
+    """
+    scopes = [PUBLIC_SCOPE] + [user_scope(user_id) for user_id in set(user_ids)]
+    bump_generation(*scopes)
+    transaction.on_commit(lambda: bump_generation(*scopes))
+
+
+def dashboard_scope(user_id):
+    return f"dashboard:{user_id}"
+
+
+def invalidate_dashboard(*user_ids):
+    """Muda o ETag do dashboard dos usuários, agora e após o commit."""
+    scopes = [dashboard_scope(user_id) for user_id in set(user_ids) if user_id]
+    if scopes:
+        bump_generation(*scopes)
+        transaction.on_commit(lambda: bump_generation(*scopes))
+
+
+def normalized_params(request):
+    params = []
+    for name in CACHED_PARAMS:
+        value = " ".join(request.GET.get(name, "").split())
+        if name == "q":
+            value = value.lower()
+        if value:
+            params.append(f"{name}={value}")
+    return "&".join(params)
+
+
+def page_cache_key(request, scope):
+    digest = hashlib.sha1(normalized_params(request).encode()).hexdigest()
+    return f"catalog-page:{scope}:{get_generation(scope)}:{digest}"
+
+
+class CachedRelation(list):
+    """Lista com o ``all()`` dos gerenciadores de relação usado pelo template."""
+
+    def all(self):
+        return self
+
+
+def cached_category(category):
+    return SimpleNamespace(id=category.id, name=category.name, color=category.color)
+
+
+def cached_product(product, ordering):
+    """
+    Linha do produto para o cache: os campos exibidos, o nome do dono, as
+    categorias e os valores de cada coluna da ``ordering`` (usados nos links
+    da paginação).
+    """
+    values = {name: getattr(product, name) for name in CACHED_PRODUCT_FIELDS}
+    for field in ordering:
+        values[field.lstrip("-")] = getattr(product, field.lstrip("-"))
+    values["user"] = (
+        SimpleNamespace(username=product.user.username) if product.user_id else None
+    )
+    values["categories"] = CachedRelation(
+        cached_category(category) for category in product.categories.all()
+    )
+    return SimpleNamespace(**values)
+
+
+def cached_page_state(page):
+    """``state()`` da ``KeysetPage`` com as linhas de ``cached_product``."""
+    rows, has_next, has_previous = page.state()
+    rows = [cached_product(product, page.ordering) for product in rows]
+    return rows, has_next, has_previous
+
+
+def cached_page(request, scope, build):
+    """
+    Retorna os dados da página do catálogo ``scope`` para a requisição,
+    chamando ``build()`` e guardando o resultado apenas em caso de falta.
+    """
+    key = page_cache_key(request, scope)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, PAGE_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,225 @@
+"""
+Paginação por chave (keyset) das listagens HTML.
+
+Em vez de OFFSET, o link de cada página carrega os valores de ordenação da
+última (ou primeira) linha exibida e a consulta seguinte começa com um WHERE
+sobre esses valores. Assim qualquer página custa o mesmo que a primeira: o
+banco lê apenas ``page_size`` linhas a partir do ponto do índice.
+"""
+
+import base64
+import binascii
+import json
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.http import urlencode
+
+PAGE_SIZE = 24
+CURSOR_PARAM = "cursor"
+
+
+def json_value(value):
+    """Datas e decimais do cursor como texto, sem perder precisão."""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def encode_cursor(direction, values):
+    """Serializa a direção e os valores de ordenação em um token de URL."""
+    payload = json.dumps({"d": direction, "v": values}, default=json_value)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, fields=None):
+    """
+    Retorna (direção, valores) do token ou None se ele for inválido.
+
+    Com ``fields`` (um campo de modelo por coluna da ordenação), os valores
+    são convertidos e validados por cada campo; um cursor adulterado ou de
+    outra ordenação (tipos ou faixas que não batem) também é inválido.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload["d"], payload["v"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+    if direction not in ("next", "prev") or not isinstance(values, list):
+        return None
+    if fields is not None:
+        values = convert_values(fields, values)
+        if values is None:
+            return None
+    return direction, values
+
+
+def convert_values(fields, values):
+    """
+    Converte e valida os valores de um cursor com o campo de cada coluna da
+    ordenação. Retorna None se algum não couber no campo ou se a quantidade
+    não bater com a da ordenação.
+    """
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+        for field, value in zip(fields, values):
+            field.run_validators(value)
+    except (ValidationError, ValueError, TypeError):
+        return None
+    if None in values:
+        return None
+    return values
+
+
+def ordering_fields(queryset, ordering):
+    """Campo de modelo (ou de saída da anotação) de cada coluna da ordenação."""
+    fields = []
+    for field in ordering:
+        name = field.lstrip("-")
+        if name in queryset.query.annotations:
+            fields.append(queryset.query.annotations[name].output_field)
+        elif name == "pk":
+            fields.append(queryset.model._meta.pk)
+        else:
+            fields.append(queryset.model._meta.get_field(name))
+    return fields
+
+
+def sort_queryset(queryset, sort_options, sort_field, sort_direction, default):
+    """
+    Aplica a ordenação escolhida e retorna (queryset, ordering).
+
+    ``sort_options`` mapeia o nome do parâmetro ``sort`` para um campo ou para
+    uma expressão; expressões são anotadas como ``sort_key``. A chave primária
+    entra como desempate, na mesma direção, para que a ordem seja total.
+    """
+    target = sort_options.get(sort_field, sort_options[default])
+    prefix = "-" if sort_direction == "desc" else ""
+    if not isinstance(target, str):
+        queryset = queryset.annotate(sort_key=target)
+        target = "sort_key"
+    ordering = [f"{prefix}{target}", f"{prefix}pk"]
+    return queryset.order_by(*ordering), ordering
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Monta o filtro "depois de ``values``" para a ordenação dada:
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        descending = field.startswith("-") != reverse
+        lookup = "lt" if descending else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+class KeysetPage:
+    """Página de resultados com os links para a página anterior e a próxima."""
+
+    def __init__(self, object_list, ordering, request, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.request = request
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    @classmethod
+    def restore(cls, state, ordering, request):
+        """Recria a página a partir de ``state()`` (ex.: lido do cache)."""
+        object_list, has_next, has_previous = state
+        return cls(object_list, ordering, request, has_next, has_previous)
+
+    def state(self):
+        """Linhas e indicadores da página, sem a requisição."""
+        return list(self.object_list), self.has_next, self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def cursor_values(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip("-"))
+            values.append(str(value) if isinstance(value, Decimal) else value)
+        return values
+
+    def query_with_cursor(self, cursor):
+        params = self.request.GET.copy()
+        params.pop(CURSOR_PARAM, None)
+        if cursor:
+            params[CURSOR_PARAM] = cursor
+        return urlencode(sorted(params.lists()), doseq=True)
+
+    @property
+    def next_query(self):
+        if not self.has_next:
+            return ""
+        return self.query_with_cursor(
+            encode_cursor("next", self.cursor_values(self.object_list[-1]))
+        )
+
+    @property
+    def previous_query(self):
+        if not self.has_previous:
+            return ""
+        return self.query_with_cursor(
+            encode_cursor("prev", self.cursor_values(self.object_list[0]))
+        )
+
+    @property
+    def first_query(self):
+        return self.query_with_cursor(None)
+
+
+def keyset_paginate(request, queryset, ordering, page_size=PAGE_SIZE):
+    """
+    Retorna a página indicada pelo parâmetro ``cursor`` da requisição.
+
+    ``ordering`` deve ser a ordenação completa já aplicada ao queryset
+    (terminando na chave primária), como retornada por ``sort_queryset``.
+    Cursores inválidos levam de volta à primeira página.
+    """
+    cursor = decode_cursor(
+        request.GET.get(CURSOR_PARAM, ""), ordering_fields(queryset, ordering)
+    )
+    if cursor is None:
+        rows = list(queryset[: page_size + 1])
+        return KeysetPage(
+            rows[:page_size], ordering, request, len(rows) > page_size, False
+        )
+
+    direction, values = cursor
+    if direction == "next":
+        rows = list(queryset.filter(keyset_filter(ordering, values))[: page_size + 1])
+        return KeysetPage(
+            rows[:page_size], ordering, request, len(rows) > page_size, True
+        )
+
+    # Página anterior: percorre a ordenação invertida e desfaz a inversão
+    reversed_ordering = [
+        field[1:] if field.startswith("-") else f"-{field}" for field in ordering
+    ]
+    rows = list(
+        queryset.filter(keyset_filter(ordering, values, reverse=True)).order_by(
+            *reversed_ordering
+        )[: page_size + 1]
+    )
+    has_previous = len(rows) > page_size
+    rows = rows[:page_size]
+    rows.reverse()
+    return KeysetPage(rows, ordering, request, True, has_previous)
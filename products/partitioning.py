@@ -0,0 +1,392 @@
+"""
+Particionamento mensal das tabelas de histórico no PostgreSQL.
+
+As movimentações (por ``moved_at``) e o histórico de preços (por
+``changed_at``) podem ser convertidos em tabelas particionadas por intervalo
+mensal (PARTITION BY RANGE). Consultas que filtram essas colunas por data leem
+apenas as partições do período (partition pruning), e meses antigos podem ser
+desanexados como tabelas comuns, sem DELETE.
+
+O particionamento é opcional e feito pelo comando ``partition_history``:
+
+- ``--convert`` cria a tabela particionada, copia as linhas em lotes com a
+  original em uso e troca as tabelas em uma transação curta. A original fica
+  como ``<tabela>_unpartitioned`` até ser removida manualmente;
+- a cada execução, cria as partições dos próximos meses;
+- ``--detach-before AAAA-MM`` desanexa as partições anteriores ao mês.
+
+No banco, a chave primária passa a ser (id, data), exigência do PostgreSQL
+para tabelas particionadas; o id continua único pela sequência. Uma partição
+DEFAULT recebe linhas fora dos meses criados, para que nenhuma escrita falhe.
+"""
+
+import re
+from datetime import date, datetime, time
+from django.db import transaction
+from django.utils import timezone
+from .db_operations import is_partitioned
+from .models import PriceHistory, ProductMovement
+
+# Tabela particionável -> coluna de data usada como chave de partição
+PARTITION_KEYS = {
+    ProductMovement._meta.db_table: "moved_at",
+    PriceHistory._meta.db_table: "changed_at",
+}
+
+COPY_BATCH_SIZE = 10000
+
+# Início de uma definição de pg_indexes: "CREATE [UNIQUE] INDEX nome ON tabela "
+INDEX_DEFINITION = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ ")
+
+
+class PartitioningError(Exception):
+    """A tabela não pode ser convertida (banco ou restrições incompatíveis)."""
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first, last):
+    """Primeiros dias dos meses de ``first`` a ``last``, inclusive."""
+    month = first.replace(day=1)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_month(table, name):
+    """Mês de uma partição mensal a partir do nome (None para as demais)."""
+    suffix = name.removeprefix(f"{table}_p")
+    if suffix == name or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+def partition_bound(month):
+    """Início do mês no fuso da aplicação, como literal de timestamptz."""
+    return timezone.make_aware(datetime.combine(month, time.min)).isoformat(" ")
+
+
+def list_partitions(connection, table):
+    """Meses das partições mensais anexadas à tabela, em ordem."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return sorted(
+        month for month in (partition_month(table, name) for name in names) if month
+    )
+
+
+def create_partition(cursor, table, month, parent=None):
+    """
+    Cria a partição do mês. ``parent`` permite criá-la na tabela nova durante a
+    conversão, já com o nome definitivo.
+    """
+    qn = cursor.db.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {qn(partition_name(table, month))} "
+        f"PARTITION OF {qn(parent or table)} FOR VALUES "
+        f"FROM ('{partition_bound(month)}') "
+        f"TO ('{partition_bound(add_months(month, 1))}')"
+    )
+
+
+def default_name(table):
+    return f"{table}_default"
+
+
+def create_partition_from_default(cursor, table, month):
+    """
+    Cria a partição do mês com as linhas do intervalo que estão na DEFAULT. O
+    PostgreSQL recusa ``CREATE TABLE ... PARTITION OF`` enquanto a DEFAULT tem
+    linhas do intervalo: elas passam para uma tabela nova, anexada em seguida.
+    Precisa rodar em uma transação; retorna False, sem criar nada, quando a
+    DEFAULT não tem linhas do mês.
+    """
+    qn = cursor.db.ops.quote_name
+    default = default_name(table)
+    column = PARTITION_KEYS[table]
+    bounds = [partition_bound(month), partition_bound(add_months(month, 1))]
+    in_month = f"{qn(column)} >= %s AND {qn(column)} < %s"
+
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [default])
+    if not cursor.fetchone()[0]:
+        return False
+    # O ATTACH bloqueia a DEFAULT de qualquer forma; bloqueá-la antes impede
+    # que novas linhas do mês cheguem a ela entre a cópia e o ATTACH
+    cursor.execute(f"LOCK TABLE {qn(default)} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {qn(default)} WHERE {in_month})", bounds
+    )
+    if not cursor.fetchone()[0]:
+        return False
+
+    name = partition_name(table, month)
+    cursor.execute(
+        f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS "
+        "INCLUDING CONSTRAINTS)"
+    )
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {qn(default)} WHERE {in_month} RETURNING *) "
+        f"INSERT INTO {qn(name)} SELECT * FROM moved",
+        bounds,
+    )
+    # Índices e chaves estrangeiras da tabela particionada são criados na
+    # partição pelo próprio ATTACH
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES "
+        f"FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+    )
+    return True
+
+
+def ensure_partitions(connection, months_ahead=3, today=None):
+    """
+    Cria as partições do mês atual e dos ``months_ahead`` meses seguintes nas
+    tabelas já particionadas, levando para elas as linhas do mês que já
+    estejam na DEFAULT. Retorna os nomes das partições criadas.
+    """
+    current = (today or timezone.localdate()).replace(day=1)
+    created = []
+    for table in PARTITION_KEYS:
+        if not is_partitioned(connection, table):
+            continue
+        existing = set(list_partitions(connection, table))
+        with connection.cursor() as cursor:
+            for month in month_range(current, add_months(current, months_ahead)):
+                if month in existing:
+                    continue
+                with transaction.atomic(using=connection.alias):
+                    if not create_partition_from_default(cursor, table, month):
+                        create_partition(cursor, table, month)
+                created.append(partition_name(table, month))
+    return created
+
+
+def detach_partitions(connection, before):
+    """
+    Desanexa as partições de meses anteriores a ``before``. Elas continuam no
+    banco como tabelas comuns (para arquivo ou DROP). Retorna os nomes.
+    """
+    qn = connection.ops.quote_name
+    detached = []
+    for table in PARTITION_KEYS:
+        if not is_partitioned(connection, table):
+            continue
+        with connection.cursor() as cursor:
+            for month in list_partitions(connection, table):
+                if month >= before.replace(day=1):
+                    break
+                name = partition_name(table, month)
+                cursor.execute(
+                    f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}"
+                )
+                detached.append(name)
+    return detached
+
+
+def copy_rows(cursor, source, target, after_id, batch_size):
+    """
+    Copia, em lotes por id, as linhas de ``source`` com id maior que
+    ``after_id``. Cada lote é uma instrução (e uma transação) própria.
+    Retorna o último id copiado.
+    """
+    qn = cursor.db.ops.quote_name
+    while True:
+        cursor.execute(
+            f"WITH copied AS (INSERT INTO {qn(target)} OVERRIDING SYSTEM VALUE "
+            f"SELECT * FROM {qn(source)} WHERE id > %s ORDER BY id LIMIT %s "
+            "RETURNING id) SELECT max(id) FROM copied",
+            [after_id, batch_size],
+        )
+        last_id = cursor.fetchone()[0]
+        if last_id is None:
+            return after_id
+        after_id = last_id
+
+
+def reconcile_rows(cursor, source, target):
+    """
+    Aplica em ``target`` as escritas feitas em ``source`` depois da cópia:
+    remove as linhas excluídas ou alteradas na origem e insere as que faltam
+    (alteradas, ou gravadas com id menor que o último copiado, já que a
+    sequência não segue a ordem de commit). Retorna (removidas, inseridas).
+    """
+    qn = cursor.db.ops.quote_name
+    cursor.execute(
+        f"DELETE FROM {qn(target)} AS t WHERE NOT EXISTS "
+        f"(SELECT 1 FROM {qn(source)} AS s WHERE s.id = t.id "
+        "AND ROW(s.*) IS NOT DISTINCT FROM ROW(t.*))"
+    )
+    removed = cursor.rowcount
+    cursor.execute(
+        f"INSERT INTO {qn(target)} OVERRIDING SYSTEM VALUE "
+        f"SELECT * FROM {qn(source)} AS s WHERE NOT EXISTS "
+        f"(SELECT 1 FROM {qn(target)} AS t WHERE t.id = s.id)"
+    )
+    return removed, cursor.rowcount
+
+
+def convert_table(connection, table, batch_size=COPY_BATCH_SIZE, months_ahead=3):
+    """
+    Converte a tabela em particionada por mês, mantendo colunas, identidade,
+    chaves estrangeiras, checks e índices. Precisa rodar fora de transação
+    (autocommit): a cópia em lotes acontece com a tabela original em uso, e só
+    a troca final a bloqueia.
+
+    As escritas feitas na original durante a cópia (inclusive alterações e
+    exclusões) são reconciliadas antes da troca, uma vez com a tabela em uso e
+    outra sob o bloqueio. Por isso o bloqueio final dura duas varreduras da
+    tabela, mais a validação das chaves estrangeiras e dos checks, que só são
+    criados nele: até lá a cópia não tem restrições que impeçam as exclusões
+    em cascata feitas pelo ORM na original.
+    """
+    if connection.vendor != "postgresql":
+        raise PartitioningError("Particionamento disponível apenas no PostgreSQL.")
+    if is_partitioned(connection, table):
+        return False
+
+    qn = connection.ops.quote_name
+    column = PARTITION_KEYS[table]
+    new = f"{table}_partitioned"
+    old = f"{table}_unpartitioned"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s)",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        if any(kind == "u" for _, kind, _ in constraints):
+            raise PartitioningError(
+                f"{table} tem restrições UNIQUE sem a coluna {column}."
+            )
+        cursor.execute(
+            "SELECT count(*) FROM pg_constraint WHERE confrelid = to_regclass(%s)",
+            [table],
+        )
+        if cursor.fetchone()[0]:
+            raise PartitioningError(f"Outras tabelas referenciam {table}.")
+        primary_key = next(name for name, kind, _ in constraints if kind == "p")
+
+        # 1. Estrutura e chave primária com a coluna de data; chaves
+        # estrangeiras e checks só na troca
+        cursor.execute(
+            f"CREATE TABLE {qn(new)} (LIKE {qn(table)} INCLUDING DEFAULTS "
+            f"INCLUDING IDENTITY) PARTITION BY RANGE ({qn(column)})"
+        )
+        cursor.execute(f"ALTER TABLE {qn(new)} ADD PRIMARY KEY (id, {qn(column)})")
+
+        # 2. Partições dos meses com dados até os próximos meses, e a DEFAULT
+        cursor.execute(f"SELECT min({qn(column)}) FROM {qn(table)}")
+        first = cursor.fetchone()[0]
+        today = timezone.localdate()
+        first = timezone.localdate(first) if first else today
+        for month in month_range(first, add_months(today, months_ahead)):
+            create_partition(cursor, table, month, parent=new)
+        cursor.execute(
+            f"CREATE TABLE {qn(default_name(table))} PARTITION OF {qn(new)} DEFAULT"
+        )
+
+        # 3. Cópia em lotes com a original em uso
+        last_id = copy_rows(cursor, table, new, 0, batch_size)
+
+        # 4. Índices com nomes provisórios (a tabela nova ainda não é lida)
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s",
+            [table],
+        )
+        indexes = [
+            (name, definition)
+            for name, definition in cursor.fetchall()
+            if name != primary_key
+        ]
+        for name, definition in indexes:
+            cursor.execute(
+                INDEX_DEFINITION.sub(
+                    lambda match: (
+                        f"CREATE {match[1] or ''}INDEX {qn(temporary_name(name))} "
+                        f"ON {qn(new)} "
+                    ),
+                    definition,
+                )
+            )
+
+        # 5. Reconciliação com a original ainda em uso, para que a etapa
+        # bloqueada encontre poucas diferenças
+        copy_rows(cursor, table, new, last_id, batch_size)
+        reconcile_rows(cursor, table, new)
+
+        # 6. Troca: bloqueia a original, reconcilia o restante, cria as
+        # restrições e renomeia
+        with transaction.atomic(using=connection.alias):
+            cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+            reconcile_rows(cursor, table, new)
+            cursor.execute(
+                f"SELECT (SELECT count(*) FROM {qn(table)}), "
+                f"(SELECT count(*) FROM {qn(new)})"
+            )
+            source_count, copied_count = cursor.fetchone()
+            if source_count != copied_count:
+                # Desfaz a troca; a tabela nova fica para ser removida
+                raise PartitioningError(
+                    f"{table} tem {source_count} linhas e a cópia particionada "
+                    f"{copied_count}; remova {new} e converta de novo."
+                )
+            for name, kind, definition in constraints:
+                if kind in ("f", "c"):
+                    cursor.execute(
+                        f"ALTER TABLE {qn(new)} ADD CONSTRAINT {qn(name)} "
+                        f"{definition}"
+                    )
+                if kind == "f":
+                    # A original mantida é só um arquivo: sem a chave, não
+                    # impede a exclusão dos produtos e usuários referenciados
+                    cursor.execute(
+                        f"ALTER TABLE {qn(table)} DROP CONSTRAINT {qn(name)}"
+                    )
+            cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(old)}")
+            cursor.execute(
+                f"ALTER TABLE {qn(old)} RENAME CONSTRAINT {qn(primary_key)} "
+                f"TO {qn(archived_name(primary_key))}"
+            )
+            for name, _ in indexes:
+                cursor.execute(
+                    f"ALTER INDEX {qn(name)} RENAME TO {qn(archived_name(name))}"
+                )
+                cursor.execute(
+                    f"ALTER INDEX {qn(temporary_name(name))} RENAME TO {qn(name)}"
+                )
+            cursor.execute(f"ALTER TABLE {qn(new)} RENAME TO {qn(table)}")
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} RENAME CONSTRAINT {qn(new + '_pkey')} "
+                f"TO {qn(primary_key)}"
+            )
+            # A identidade da tabela nova continua do maior id copiado
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), max(id)) "
+                f"FROM {qn(table)}",
+                [table],
+            )
+    return True
+
+
+def temporary_name(name):
+    return f"{name[:59]}_new"
+
+
+def archived_name(name):
+    return f"{name[:49]}_unpartitioned"
@@ -0,0 +1,241 @@
+"""
+Busca textual de produtos.
+
+Nome e descrição ficam em um índice de texto próprio do banco, mantido pelo
+próprio banco a cada escrita em products_product (inclusive bulk_create e
+update), e a busca é feita por ele em vez de ``icontains``:
+
+- PostgreSQL: coluna gerada ``search_vector`` (tsvector, nome com peso A e
+  descrição com peso B) com índice GIN; ranking por ``ts_rank``.
+- SQLite: tabela virtual FTS5 ``products_product_fts`` com conteúdo externo,
+  sincronizada por triggers; ranking por ``bm25``.
+
+O índice casa cada palavra da busca como prefixo de uma palavra do produto
+("cafe" acha "Cafeteira"), não como trecho. Quando o índice não acha nada (ex.:
+"phone" para "Smartphone") ou a busca não tem palavras (só pontuação), a busca
+cai para ``icontains`` termo a termo, como antes do índice. Os outros bancos
+usam sempre ``icontains``, sem ranking.
+"""
+
+import re
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = "portuguese"
+FTS_TABLE = "products_product_fts"
+
+POSTGRESQL_COLUMN_SQL = f"""
+    ALTER TABLE products_product ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+"""
+POSTGRESQL_DROP_COLUMN_SQL = (
+    "ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector"
+)
+# CONCURRENTLY: criado em uma migração sem transação, sem bloquear escritas
+POSTGRESQL_INDEX_SQL = """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS product_search_vector_idx
+    ON products_product USING GIN (search_vector)
+"""
+POSTGRESQL_DROP_INDEX_SQL = (
+    "DROP INDEX CONCURRENTLY IF EXISTS product_search_vector_idx"
+)
+
+SQLITE_TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+# O SQLite recria a tabela em algumas alterações de schema, descartando os
+# triggers; por isso eles são recriados também após cada migrate.
+SQLITE_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products_product
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products_product
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF name, description ON products_product
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+SQLITE_DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def install_search_index(connection):
+    """
+    Cria a coluna (PostgreSQL) ou a tabela FTS5 (SQLite) da busca, de forma
+    idempotente, e a preenche. O índice GIN do PostgreSQL é criado à parte,
+    por ``install_search_gin_index``.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(POSTGRESQL_COLUMN_SQL)
+        elif connection.vendor == "sqlite":
+            cursor.execute(SQLITE_TABLE_SQL)
+            for sql in SQLITE_TRIGGERS_SQL:
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            statements = [POSTGRESQL_DROP_COLUMN_SQL]
+        elif connection.vendor == "sqlite":
+            statements = SQLITE_DROP_SQL
+        else:
+            statements = []
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def install_search_gin_index(connection):
+    """Índice GIN da coluna de busca (PostgreSQL); precisa rodar fora de transação."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRESQL_INDEX_SQL)
+
+
+def uninstall_search_gin_index(connection):
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRESQL_DROP_INDEX_SQL)
+
+
+def ensure_search_triggers(using="default", **kwargs):
+    """Recria os triggers do FTS5 caso uma migração tenha recriado a tabela."""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    if FTS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for sql in SQLITE_TRIGGERS_SQL:
+            cursor.execute(sql)
+
+
+def search_terms(q):
+    """Palavras da busca, sem operadores ou pontuação."""
+    return re.findall(r"\w+", (q or "").lower())
+
+
+def match_query(vendor, terms):
+    # Cada termo casa como prefixo e todos os termos precisam aparecer
+    if vendor == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def substring_filter(q, terms):
+    """
+    Filtro ``icontains`` em nome ou descrição, termo a termo (ou com a busca
+    inteira, quando ela não tem palavras).
+    """
+    condition = Q()
+    for term in terms or [q.strip()]:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def search_products(queryset, q):
+    """
+    Restringe o queryset de produtos aos que casam com a busca ``q``.
+
+    O filtro é um ``pk IN (subconsulta no índice)`` que não depende do alias
+    da tabela, então o queryset resultante pode ser usado em subconsultas.
+    Sem resultados no índice, ou sem palavras na busca, cai para a busca por
+    trecho (``icontains``); ver a descrição do módulo.
+    """
+    terms = search_terms(q)
+    if not (q or "").strip():
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if not terms or vendor not in ("postgresql", "sqlite"):
+        return queryset.filter(substring_filter(q, terms))
+
+    if vendor == "postgresql":
+        matches = RawSQL(
+            "SELECT id FROM products_product "
+            "WHERE search_vector @@ to_tsquery(%s, %s)",
+            (SEARCH_CONFIG, match_query(vendor, terms)),
+        )
+    else:
+        matches = RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            (match_query(vendor, terms),),
+        )
+    indexed = queryset.filter(pk__in=matches)
+    if indexed.exists():
+        return indexed
+    return queryset.filter(substring_filter(q, terms))
+
+
+def search_rank(queryset, q):
+    """
+    Expressão de relevância da busca ``q`` (maior = mais relevante), para
+    anotar em um queryset já filtrado por ``search_products``.
+    """
+    terms = search_terms(q)
+    vendor = connections[queryset.db].vendor
+    if not terms or vendor not in ("postgresql", "sqlite"):
+        return Value(0.0, output_field=FloatField())
+
+    if vendor == "postgresql":
+        # ts_rank é real; em double precision o valor lido volta igual nos
+        # filtros dos cursores (keyset_filter) e não perde os empates
+        return RawSQL(
+            'ts_rank("products_product"."search_vector", to_tsquery(%s, %s))'
+            "::double precision",
+            (SEARCH_CONFIG, match_query(vendor, terms)),
+            output_field=FloatField(),
+        )
+    # bm25 é menor para os mais relevantes; o nome pesa mais que a descrição.
+    # Produtos achados só pela busca por trecho ficam com relevância 0.
+    return Coalesce(
+        RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "products_product"."id"',
+            (match_query(vendor, terms),),
+            output_field=FloatField(),
+        ),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def search_sorts(queryset, q, sort_options):
+    """
+    Opções de ordenação de uma listagem acrescidas de ``relevance`` quando há
+    busca, para uso com ``sort_queryset``.
+    """
+    if not search_terms(q):
+        return sort_options
+    return {**sort_options, "relevance": search_rank(queryset, q)}
@@ -0,0 +1,279 @@
+"""
+Serviços de escrita do domínio de produtos.
+
+Concentram as operações que alteram estoque e histórico para que as views HTML
+e a API compartilhem as mesmas regras e garantias de consistência.
+"""
+
+from functools import partial
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import (
+    CategorySummary,
+    InventorySummary,
+    MovementRollup,
+    PriceHistory,
+    Product,
+    ProductMovement,
+)
+from .page_cache import invalidate_catalogs
+
+BULK_BATCH_SIZE = 500
+
+
+class InsufficientStockError(Exception):
+    """Saída maior que o estoque disponível no momento da gravação."""
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        super().__init__(
+            f"Estoque insuficiente para a saída de {quantity} unidade(s) de {product.name}."
+        )
+
+
+def apply_summary_deltas(summary_deltas, category_deltas=None):
+    """
+    Aplica os deltas do InventorySummary (e da variação do dia) e do
+    CategorySummary em uma transação própria e curta.
+    """
+    with transaction.atomic():
+        InventorySummary.apply_deltas(summary_deltas)
+        CategorySummary.apply_deltas(category_deltas or {})
+
+
+def apply_summaries_after_commit(summary_deltas, category_deltas=None):
+    """
+    Agenda os deltas dos resumos para depois do commit da transação atual (ou
+    aplica na hora, fora de transação). Os resumos têm uma linha por usuário,
+    por usuário e dia e por categoria: atualizá-los junto com o bloqueio do
+    produto faria todas as movimentações do usuário esperarem umas pelas
+    outras nessas linhas, mesmo em produtos diferentes. Se a transação for
+    desfeita, nada é aplicado.
+    """
+    transaction.on_commit(
+        partial(apply_summary_deltas, summary_deltas, category_deltas)
+    )
+
+
+def register_movement(product, type, quantity, reason=""):
+    """
+    Registra uma entrada (IN) ou saída (OUT) e atualiza o estoque do produto.
+
+    O estoque é alterado por um único UPDATE condicional
+    (``stock = stock - q WHERE stock >= q``), que bloqueia apenas a linha do
+    produto até o fim da transação. Movimentações de produtos diferentes seguem
+    em paralelo e duas saídas concorrentes nunca deixam o estoque negativo. Os
+    resumos do usuário e das categorias são atualizados depois do commit, fora
+    desse bloqueio.
+
+    Levanta InsufficientStockError quando a saída não cabe no estoque atual.
+    """
+    delta = quantity if type == "IN" else -quantity
+
+    with transaction.atomic():
+        target = Product.objects.filter(pk=product.pk)
+        if type == "OUT":
+            target = target.filter(stock__gte=quantity)
+
+        # Estoque e saldo do ledger andam juntos no mesmo UPDATE
+        updated = target.update(
+            stock=F("stock") + delta,
+            ledger_balance=F("ledger_balance") + delta,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            raise InsufficientStockError(product, quantity)
+
+        # A linha continua bloqueada pelo UPDATE, então a leitura é consistente
+        stock, balance, user_id, price, is_public = (
+            Product.objects.filter(pk=product.pk)
+            .values_list("stock", "ledger_balance", "user_id", "price", "is_public")
+            .get()
+        )
+        # Apenas o estoque mudou: a quantidade de produtos continua a mesma.
+        # As categorias são lidas agora; os UPDATEs ficam para depois do commit.
+        category_change = CategorySummary.contribution(delta, price, count=0)
+        apply_summaries_after_commit(
+            {user_id: InventorySummary.contribution(delta, price, is_public, count=0)},
+            {
+                category_id: category_change
+                for category_id in Product.categories.through.objects.filter(
+                    product_id=product.pk
+                ).values_list("category_id", flat=True)
+            },
+        )
+        movement = ProductMovement.objects.create(
+            product=product,
+            user_id=user_id,
+            type=type,
+            quantity=quantity,
+            reason=reason,
+            balance_after=balance,
+        )
+        # O UPDATE não dispara sinais: o estoque exibido nos catálogos mudou
+        if is_public:
+            invalidate_catalogs(user_id)
+
+    product.stock = stock
+    product.ledger_balance = balance
+    return movement
+
+
+def bulk_create_products(products, batch_size=BULK_BATCH_SIZE):
+    """
+    Cria produtos em lote com o mesmo histórico que os signals de save()
+    gerariam: o preço inicial e a entrada inicial de estoque (quando > 0).
+
+    Cada lote custa um INSERT de produtos, um de histórico de preços e um de
+    movimentações, independentemente da quantidade de linhas, mais a
+    atualização das linhas diárias de MovementRollup (uma por produto e dia).
+    """
+    products = list(products)
+    created = []
+    summary_deltas = {}
+    with transaction.atomic():
+        for start in range(0, len(products), batch_size):
+            batch = products[start : start + batch_size]
+            for product in batch:
+                product.ledger_balance = product.stock
+                product.last_recorded_price = product.price
+                InventorySummary.collect(
+                    summary_deltas,
+                    {
+                        field: getattr(product, field)
+                        for field in Product.SUMMARY_FIELDS
+                    },
+                )
+
+            batch = Product.objects.bulk_create(batch)
+            PriceHistory.objects.bulk_create(
+                [
+                    PriceHistory(product=product, price=product.price)
+                    for product in batch
+                ]
+            )
+            movements = ProductMovement.objects.bulk_create(
+                [
+                    ProductMovement(
+                        product=product,
+                        user_id=product.user_id,
+                        type="IN",
+                        quantity=product.stock,
+                        reason="Registro inicial do produto",
+                        balance_after=product.stock,
+                    )
+                    for product in batch
+                    if product.stock > 0
+                ]
+            )
+            MovementRollup.record(movements)
+            created.extend(batch)
+
+        # Uma atualização do resumo por usuário, não por produto
+        apply_summaries_after_commit(summary_deltas)
+        public_owners = [p.user_id for p in created if p.is_public]
+        if public_owners:
+            invalidate_catalogs(*public_owners)
+    return created
+
+
+def bulk_update_products(products, fields, batch_size=BULK_BATCH_SIZE):
+    """
+    Atualiza produtos em lote registrando as mudanças de preço e os ajustes de
+    estoque, com a mesma semântica de track_price_changes e track_stock_changes.
+
+    Os campos derivados (último preço e saldo do ledger) são lidos de uma vez
+    por lote, com as linhas bloqueadas, em vez de uma consulta por produto.
+    """
+    products = list(products)
+    fields = list(fields)
+    track_price = "price" in fields
+    track_stock = "stock" in fields
+    update_fields = fields + ["updated_at"]
+    if track_price:
+        update_fields.append("last_recorded_price")
+    if track_stock:
+        update_fields.append("ledger_balance")
+
+    now = timezone.now()
+    summary_deltas = {}
+    category_deltas = {}
+    public_owners = set()
+    with transaction.atomic():
+        for start in range(0, len(products), batch_size):
+            batch = products[start : start + batch_size]
+            stored_states = {
+                row["pk"]: row
+                for row in (
+                    Product.objects.select_for_update()
+                    .filter(pk__in=[product.pk for product in batch])
+                    .values("pk", *Product.DERIVED_FIELDS, *Product.SUMMARY_FIELDS)
+                )
+            }
+
+            price_entries = []
+            movements = []
+            product_changes = {}
+            for product in batch:
+                stored = stored_states[product.pk]
+                product.ledger_balance = stored["ledger_balance"]
+                product.last_recorded_price = stored["last_recorded_price"]
+                product.updated_at = now
+
+                if track_price and product.last_recorded_price != product.price:
+                    entry = PriceHistory(product=product, price=product.price)
+                    entry.set_previous_price(product.last_recorded_price)
+                    price_entries.append(entry)
+                    product.last_recorded_price = product.price
+
+                diff = product.stock - product.ledger_balance if track_stock else 0
+                if diff:
+                    movements.append(
+                        ProductMovement(
+                            product=product,
+                            user_id=product.user_id,
+                            type="IN" if diff > 0 else "OUT",
+                            quantity=abs(diff),
+                            reason="Ajuste de estoque",
+                            balance_after=product.stock,
+                        )
+                    )
+                    product.ledger_balance = product.stock
+
+                # Campos fora de `fields` continuam com o valor gravado
+                current = {
+                    field: (
+                        getattr(product, field)
+                        if field.removesuffix("_id") in fields
+                        else stored[field]
+                    )
+                    for field in Product.SUMMARY_FIELDS
+                }
+                InventorySummary.collect(summary_deltas, stored, sign=-1)
+                InventorySummary.collect(summary_deltas, current)
+                if stored["is_public"] or current["is_public"]:
+                    public_owners.add(stored["user_id"])
+                change = CategorySummary.change(stored, current)
+                if any(change.values()):
+                    product_changes[product.pk] = change
+
+            if product_changes:
+                # Categorias dos produtos alterados em uma consulta por lote
+                memberships = Product.categories.through.objects.filter(
+                    product_id__in=product_changes
+                ).values_list("product_id", "category_id")
+                for product_id, category_id in memberships:
+                    deltas = category_deltas.setdefault(category_id, {})
+                    for field, value in product_changes[product_id].items():
+                        deltas[field] = deltas.get(field, 0) + value
+
+            Product.objects.bulk_update(batch, update_fields)
+            PriceHistory.objects.bulk_create(price_entries)
+            ProductMovement.objects.bulk_create(movements)
+            MovementRollup.record(movements)
+
+        apply_summaries_after_commit(summary_deltas, category_deltas)
+        if public_owners:
+            invalidate_catalogs(*public_owners)
@@ -0,0 +1,255 @@
+"""
+Snapshots diários de inventário e consultas de estoque/valor em uma data.
+
+``take_snapshot(day)`` grava o estoque e o preço, no fim do dia, apenas dos
+produtos que tiveram movimentações ou mudanças de preço desde o snapshot
+anterior, e recalcula os totais apenas dos usuários desses produtos.
+
+``inventory_as_of(user, day)`` parte do snapshot do usuário mais próximo (até
+``day``) e reaplica só os produtos alterados entre ele e o fim de ``day``.
+Com snapshots diários, a reaplicação cobre no máximo um dia de mudanças. Sem
+snapshot anterior, lê o estado de cada produto do usuário direto nos índices
+do histórico, sem percorrer todas as movimentações.
+
+Produtos excluídos levam consigo seus snapshots e seu histórico; antes da
+exclusão, um ProductDeletion guarda a parcela do produto no último snapshot.
+Com ele, as consultas posteriores à exclusão retiram o produto dos totais e o
+snapshot seguinte recalcula os totais do dono.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import batched
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import (
+    InventorySnapshot,
+    PriceHistory,
+    Product,
+    ProductDeletion,
+    ProductMovement,
+    ProductSnapshot,
+)
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+class SnapshotOrderError(Exception):
+    """Snapshot pedido para um dia igual ou anterior ao último já gravado."""
+
+    def __init__(self, day, last_day):
+        self.day = day
+        self.last_day = last_day
+        super().__init__(
+            f"Já existe snapshot em {last_day:%d/%m/%Y}; "
+            f"não é possível gravar {day:%d/%m/%Y}."
+        )
+
+
+def end_of_day(day):
+    """Primeiro instante do dia seguinte no fuso da aplicação (limite exclusivo)."""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def states_at(products, moment):
+    """
+    Anota ``stock_at`` (saldo da última movimentação) e ``price_at`` (último
+    preço do histórico) de cada produto antes de ``moment``. Cada valor é uma
+    busca nos índices (produto, data) do histórico, sem reaplicar movimentações.
+    """
+    movements = ProductMovement.objects.filter(
+        product=models.OuterRef("pk"), moved_at__lt=moment
+    ).order_by("-moved_at", "-pk")
+    prices = PriceHistory.objects.filter(
+        product=models.OuterRef("pk"), changed_at__lt=moment
+    ).order_by("-changed_at", "-pk")
+    return products.annotate(
+        stock_at=Coalesce(models.Subquery(movements.values("balance_after")[:1]), 0),
+        price_at=Coalesce(models.Subquery(prices.values("price")[:1]), "price"),
+    )
+
+
+def snapshot_at(products, day, prefix):
+    """
+    Anota ``<prefix>_stock`` e ``<prefix>_price`` com a linha de snapshot mais
+    recente de cada produto até ``day`` (None quando não há nenhuma).
+    """
+    latest = ProductSnapshot.objects.filter(
+        product=models.OuterRef("pk"), day__lte=day
+    ).order_by("-day")
+    return products.annotate(
+        **{
+            f"{prefix}_stock": models.Subquery(latest.values("stock")[:1]),
+            f"{prefix}_price": models.Subquery(latest.values("price")[:1]),
+        }
+    )
+
+
+def changed_product_ids(start, end, user=None):
+    """
+    Produtos com movimentações ou mudanças de preço em [start, end), lidos
+    pelos índices de data do histórico. ``start=None`` considera todo o
+    histórico anterior a ``end``.
+    """
+    movements = ProductMovement.objects.filter(moved_at__lt=end)
+    prices = PriceHistory.objects.filter(changed_at__lt=end)
+    if start is not None:
+        movements = movements.filter(moved_at__gte=start)
+        prices = prices.filter(changed_at__gte=start)
+    if user is not None:
+        movements = movements.filter(user=user)
+        prices = prices.filter(product__user=user)
+    return set(
+        movements.order_by().values_list("product_id", flat=True).distinct()
+    ) | set(prices.order_by().values_list("product_id", flat=True).distinct())
+
+
+def deletions_between(start, end, user=None):
+    """ProductDeletion com exclusão em [start, end); ``start=None`` não limita."""
+    deletions = ProductDeletion.objects.filter(deleted_at__lt=end)
+    if start is not None:
+        deletions = deletions.filter(deleted_at__gte=start)
+    if user is not None:
+        deletions = deletions.filter(user=user)
+    return deletions
+
+
+def last_snapshot_day():
+    return InventorySnapshot.objects.aggregate(day=models.Max("day"))["day"]
+
+
+def take_snapshot(day, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Grava o snapshot do fim de ``day`` processando apenas as mudanças desde o
+    snapshot anterior. Retorna (produtos gravados, usuários atualizados).
+    Os donos de produtos excluídos no período também têm os totais recalculados.
+
+    Levanta SnapshotOrderError se já houver snapshot em ``day`` ou depois.
+    """
+    previous = last_snapshot_day()
+    if previous is not None and day <= previous:
+        raise SnapshotOrderError(day, previous)
+
+    start = end_of_day(previous) if previous else None
+    end = end_of_day(day)
+    changed = changed_product_ids(start, end)
+
+    user_ids = set()
+    with transaction.atomic():
+        for batch in batched(sorted(changed), batch_size):
+            states = states_at(Product.objects.filter(pk__in=batch), end)
+            rows = [
+                ProductSnapshot(
+                    product_id=product_id,
+                    user_id=user_id,
+                    day=day,
+                    stock=stock,
+                    price=price,
+                )
+                for product_id, user_id, stock, price in states.values_list(
+                    "pk", "user_id", "stock_at", "price_at"
+                )
+            ]
+            ProductSnapshot.objects.bulk_create(rows)
+            user_ids.update(row.user_id for row in rows if row.user_id)
+        user_ids.update(
+            deletions_between(start, end)
+            .order_by()
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+
+        # Totais só dos usuários afetados, somando a última linha de cada
+        # produto (as linhas acabaram de ser gravadas para os alterados)
+        totals = {
+            user_id: dict.fromkeys(InventorySnapshot.TOTAL_FIELDS, 0)
+            for user_id in user_ids
+        }
+        products = snapshot_at(
+            Product.objects.filter(user_id__in=user_ids, created_at__lt=end),
+            day,
+            "snapshot",
+        ).values_list("user_id", "snapshot_stock", "snapshot_price")
+        for user_id, stock, price in products.iterator(chunk_size=batch_size):
+            if stock is None:
+                continue
+            user_totals = totals[user_id]
+            user_totals["total_count"] += 1
+            user_totals["total_stock"] += stock
+            user_totals["total_value"] += Decimal(price) * stock
+
+        InventorySnapshot.objects.bulk_create(
+            [
+                InventorySnapshot(user_id=user_id, day=day, **values)
+                for user_id, values in totals.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(changed), len(user_ids)
+
+
+def inventory_as_of(user, day):
+    """
+    Quantidade de produtos, estoque e valor total do usuário no fim de ``day``.
+
+    Parte do InventorySnapshot mais recente até ``day`` e reaplica apenas os
+    produtos com movimentações ou mudanças de preço depois dele: para cada um,
+    soma a diferença entre o estado no fim de ``day`` e o do snapshot. Produtos
+    excluídos depois do snapshot saem dos totais com a parcela que tinham nele.
+    Sem snapshot, soma o estado no fim de ``day`` dos produtos criados até lá.
+    """
+    end = end_of_day(day)
+    snapshot = (
+        InventorySnapshot.objects.filter(user=user, day__lte=day)
+        .order_by("-day")
+        .first()
+    )
+    if snapshot is None:
+        totals = dict.fromkeys(InventorySnapshot.TOTAL_FIELDS, 0)
+        products = states_at(
+            Product.objects.filter(user=user, created_at__lt=end), end
+        ).values_list("stock_at", "price_at")
+    else:
+        totals = {
+            field: getattr(snapshot, field)
+            for field in InventorySnapshot.TOTAL_FIELDS
+        }
+        start = end_of_day(snapshot.day)
+        changed = changed_product_ids(start, end, user=user)
+        products = snapshot_at(
+            states_at(Product.objects.filter(pk__in=changed), end),
+            snapshot.day,
+            "previous",
+        ).values_list("stock_at", "price_at", "previous_stock", "previous_price")
+
+        # Só os produtos que estavam no snapshot: excluídos depois de gravá-lo
+        # e com uma linha de snapshot até o dia dele
+        deletions = deletions_between(start, end, user=user).filter(
+            snapshot_day__lte=snapshot.day, covered_until__gte=snapshot.day
+        )
+        for stock, price in deletions.values_list("stock", "price"):
+            totals["total_count"] -= 1
+            totals["total_stock"] -= stock
+            totals["total_value"] -= Decimal(price) * stock
+
+    replayed = 0
+    for row in products:
+        stock, price = row[0], row[1]
+        previous_stock, previous_price = row[2:] or (None, None)
+        replayed += 1
+        if previous_stock is None:
+            # Produto sem snapshot anterior: entra na contagem agora
+            totals["total_count"] += 1
+            previous_stock, previous_price = 0, 0
+        totals["total_stock"] += stock - previous_stock
+        totals["total_value"] += (
+            Decimal(price) * stock - Decimal(previous_price) * previous_stock
+        )
+
+    return {
+        "date": day,
+        "snapshot_date": snapshot.day if snapshot else None,
+        "replayed_products": replayed,
+        **totals,
+    }
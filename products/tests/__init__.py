@@ -15,3 +15,14 @@ from . import test_views
 from . import test_integration
 from . import factories
 from . import test_utils
+from . import test_query_plans
+from . import test_services
+from . import test_pagination
+from . import test_query_budgets
+from . import test_search
+from . import test_autocomplete
+from . import test_page_cache
+from . import test_snapshots  # snapshots diários e totais em uma data
+from . import test_archive  # compactação e arquivamento das movimentações
+from . import test_partitioning  # particionamento mensal do histórico
+from . import test_exports
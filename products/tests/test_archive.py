@@ -0,0 +1,123 @@
+"""
+Compactação e arquivamento do histórico de movimentações.
+
+Testa que meses antigos viram uma linha de saldo por produto, que o ledger e
+os totais continuam idênticos e que as movimentações originais podem ser lidas
+do arquivo.
+"""
+
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from products.archive import archive_movements, retention_cutoff
+from products.models import MovementArchive, MovementRollup, ProductMovement
+from products.services import register_movement
+from products.tests.factories import ProductFactory, UserFactory
+
+
+class MovementArchiveTest(TestCase):
+    """
+    Testa a compactação de dois meses antigos de um produto, mantendo intactas
+    as movimentações dentro da janela de retenção.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(user=self.user, stock=0)
+        # Janeiro e fevereiro de 2024; o corte fica em agosto de 2024
+        month = date(2024, 1, 1)
+        self.cutoff = retention_cutoff(days=180, today=date(2025, 2, 1))
+        old_days = [month + timedelta(days=offset) for offset in (2, 9, 40, 41, 42)]
+        for (type, quantity), day in zip(
+            [("IN", 10), ("OUT", 3), ("IN", 5), ("OUT", 2), ("OUT", 4)], old_days
+        ):
+            self.move(self.product, type, quantity, day)
+        register_movement(self.product, "IN", 7)
+        self.product.refresh_from_db()
+
+    def move(self, product, type, quantity, day):
+        movement = register_movement(product, type, quantity)
+        ProductMovement.objects.filter(pk=movement.pk).update(
+            moved_at=timezone.make_aware(datetime.combine(day, time(12)))
+        )
+
+    def ledger(self):
+        movements = ProductMovement.objects.filter(product=self.product)
+        return sum(movement.signed_quantity for movement in movements)
+
+    def rollups(self):
+        call_command("rebuild_movement_rollups", stdout=StringIO())
+        return list(
+            MovementRollup.objects.order_by("day").values(
+                "day", *MovementRollup.TOTAL_FIELDS
+            )
+        )
+
+    def test_old_months_become_one_balance_row_each(self):
+        """
+        Testa que cada mês antigo vira uma linha com o saldo líquido e o
+        balance_after da última movimentação do mês.
+        """
+        products, periods, movements = archive_movements(self.cutoff)
+
+        self.assertEqual((products, periods, movements), (1, 2, 5))
+        rows = list(
+            ProductMovement.objects.filter(product=self.product).order_by("moved_at")
+        )
+        self.assertEqual(
+            [(row.type, row.quantity, row.balance_after) for row in rows],
+            [("IN", 7, 7), ("OUT", 1, 6), ("IN", 7, 13)],
+        )
+        self.assertIsNotNone(rows[0].archive)
+        self.assertIsNone(rows[2].archive)
+
+    def test_ledger_totals_are_preserved(self):
+        """
+        Testa que o saldo somado das movimentações continua igual ao estoque.
+        """
+        archive_movements(self.cutoff)
+
+        self.assertEqual(self.ledger(), self.product.stock)
+        self.assertEqual(self.product.ledger_balance, 13)
+
+    def test_archive_keeps_original_movements(self):
+        """
+        Testa que o arquivo devolve as movimentações originais do mês.
+        """
+        archive_movements(self.cutoff)
+
+        archive = MovementArchive.objects.order_by("period").last()
+        self.assertEqual(archive.movement_count, 3)
+        self.assertEqual(
+            [(m.type, m.quantity, m.balance_after) for m in archive.movements()],
+            [("IN", 5, 12), ("OUT", 2, 10), ("OUT", 4, 6)],
+        )
+
+    def test_rerun_and_rollup_rebuild(self):
+        """
+        Testa que uma segunda execução não altera nada e que o rebuild das
+        linhas diárias lê os arquivos e chega ao mesmo resultado.
+        """
+        expected = self.rollups()
+
+        self.assertEqual(archive_movements(self.cutoff), (1, 2, 5))
+        self.assertEqual(archive_movements(self.cutoff), (0, 0, 0))
+        call_command("archive_movements", "--days", "180", stdout=StringIO())
+
+        self.assertEqual(self.rollups(), expected)
+
+    def test_single_movement_months_are_not_counted(self):
+        """
+        Testa que um mês com uma única movimentação não é arquivado nem
+        contado, nem na primeira execução nem nas seguintes.
+        """
+        other = ProductFactory.create(user=self.user, stock=0)
+        self.move(other, "IN", 4, date(2024, 3, 5))
+
+        self.assertEqual(archive_movements(self.cutoff), (1, 2, 5))
+        self.assertEqual(archive_movements(self.cutoff), (0, 0, 0))
+        movement = ProductMovement.objects.get(product=other)
+        self.assertEqual((movement.type, movement.quantity), ("IN", 4))
+        self.assertIsNone(movement.archive)
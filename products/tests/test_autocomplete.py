@@ -0,0 +1,154 @@
+"""
+Autocompletar de nomes de produtos.
+
+Testa o índice em memória (prefixos, erros de digitação, atualizações) e o
+endpoint usado pelo campo de busca da listagem.
+"""
+
+from unittest import mock
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from products import autocomplete
+from products.autocomplete import NameIndex
+from products.models import Product
+from products.tests.factories import ProductFactory, UserFactory
+
+
+class NameIndexTest(TestCase):
+    """
+    Testa as sugestões do índice de nomes.
+    """
+
+    def setUp(self):
+        self.index = NameIndex(
+            [
+                (1, "Cafeteira Elétrica"),
+                (2, "Café em grãos"),
+                (3, "Panela de pressão"),
+                (4, "Panela inox"),
+                (5, "Caneca"),
+            ]
+        )
+
+    def names(self, text):
+        return [name for _, name in self.index.suggest(text)]
+
+    def test_prefix(self):
+        """
+        Testa que qualquer palavra do nome casa por prefixo, sem acentos.
+        """
+        self.assertEqual(self.names("caf"), ["Café em grãos", "Cafeteira Elétrica"])
+        self.assertEqual(self.names("eletr"), ["Cafeteira Elétrica"])
+
+    def test_typos(self):
+        """
+        Testa que termos com erro de digitação sugerem os nomes parecidos.
+        """
+        self.assertEqual(self.names("cafeteria")[0], "Cafeteira Elétrica")
+        self.assertEqual(self.names("panla inox"), ["Panela inox"])
+
+    def test_all_terms_required_and_ranked(self):
+        """
+        Testa que todos os termos precisam casar e que prefixos exatos vêm
+        antes das palavras apenas parecidas.
+        """
+        self.assertEqual(self.names("panela pres"), ["Panela de pressão"])
+        self.assertEqual(
+            self.names("panela")[0:2], ["Panela de pressão", "Panela inox"]
+        )
+        self.assertEqual(self.names("xyz"), [])
+        self.assertEqual(self.names("  "), [])
+
+    def test_update_and_discard(self):
+        """
+        Testa que renomear e remover produtos atualiza as sugestões.
+        """
+        self.index.update(5, "Xícara")
+        self.index.discard(4)
+
+        self.assertEqual(self.names("caneca"), [])
+        self.assertEqual(self.names("xic"), ["Xícara"])
+        self.assertEqual(self.names("inox"), [])
+        self.assertNotIn("inox", self.index.vocabulary)
+
+
+class ProductAutocompleteViewTest(TestCase):
+    """
+    Testa o endpoint de autocompletar e a manutenção do índice pelos sinais.
+    """
+
+    def setUp(self):
+        autocomplete.clear_indexes()
+        self.addCleanup(autocomplete.clear_indexes)
+        self.client = Client()
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        self.url = reverse("product_autocomplete")
+        self.product = ProductFactory.create(user=self.user, name="Cafeteira")
+        ProductFactory.create(name="Cafeteira de outro usuário")
+
+    def suggestions(self, q):
+        response = self.client.get(self.url, {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [name for _, name in response.context["suggestions"]]
+
+    def test_suggests_own_products_only(self):
+        """
+        Testa que apenas os produtos do usuário são sugeridos.
+        """
+        response = self.client.get(self.url, {"q": "cafe"})
+
+        self.assertContains(response, '<option value="Cafeteira">')
+        self.assertNotContains(response, "outro usuário")
+
+    def test_min_length(self):
+        """
+        Testa que buscas muito curtas não consultam o índice.
+        """
+        self.assertEqual(self.suggestions("c"), [])
+        self.assertIsNone(autocomplete.loaded_index(self.user.pk))
+
+    def test_no_product_queries_once_built(self):
+        """
+        Testa que, montado o índice, as sugestões não consultam produtos.
+        """
+        self.suggestions("caf")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.suggestions("cafet"), ["Cafeteira"])
+
+        self.assertFalse(
+            any("products_product" in query["sql"] for query in ctx.captured_queries)
+        )
+
+    def test_signals_refresh_loaded_index(self):
+        """
+        Testa que criar, renomear e excluir produtos atualiza o índice após o
+        commit.
+        """
+        self.suggestions("caf")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductFactory.create(user=self.user, name="Chaleira")
+            self.product.name = "Moedor"
+            self.product.save()
+        self.assertEqual(self.suggestions("cha"), ["Chaleira"])
+        self.assertEqual(self.suggestions("moe"), ["Moedor"])
+        self.assertEqual(self.suggestions("cafet"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.suggestions("moe"), [])
+
+    def test_expired_index_is_rebuilt(self):
+        """
+        Testa que o índice expirado é remontado a partir do banco.
+        """
+        self.suggestions("caf")
+        # Alteração sem sinais (como um update em massa)
+        Product.objects.filter(pk=self.product.pk).update(name="Bule")
+        self.assertEqual(self.suggestions("bul"), [])
+
+        with mock.patch.object(autocomplete, "INDEX_TTL", 0):
+            self.assertEqual(self.suggestions("bul"), ["Bule"])
@@ -0,0 +1,122 @@
+"""
+Exportação em CSV das listagens.
+
+Testa que cada listagem responde com CSV em streaming quando recebe
+``export=csv``, com os filtros da própria página, e que as consultas das
+linhas não crescem com o número de registros.
+"""
+
+import csv
+from decimal import Decimal
+from io import StringIO
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from products.services import register_movement
+from products.tests.factories import CategoryFactory, ProductFactory, UserFactory
+
+
+def read_csv(response):
+    """Conteúdo da resposta em streaming como lista de linhas (sem o BOM)."""
+    content = b"".join(response.streaming_content).decode("utf-8-sig")
+    return list(csv.reader(StringIO(content)))
+
+
+class CsvExportTest(TestCase):
+    """
+    Testa as exportações de produtos, histórico de preços e movimentações.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.category = CategoryFactory.create(user=self.user, name="Hardware")
+        self.keyboard = ProductFactory.create(
+            user=self.user, name="Teclado", price=Decimal("100.00"), stock=5
+        )
+        self.keyboard.categories.add(self.category)
+        self.mouse = ProductFactory.create(
+            user=self.user, name="Mouse", price=Decimal("50.00"), stock=2
+        )
+        ProductFactory.create(name="Produto de outro usuário")
+        self.client.force_login(self.user)
+
+    def test_products_export_uses_list_filters(self):
+        """
+        Testa que a exportação de produtos é um streaming com as categorias e
+        apenas os produtos que passam nos filtros da listagem.
+        """
+        response = self.client.get(reverse("product_list"), {"export": "csv"})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment", response["Content-Disposition"])
+        rows = read_csv(response)
+        self.assertEqual(rows[0][:4], ["id", "nome", "descricao", "categorias"])
+        self.assertEqual([row[1] for row in rows[1:]], ["Mouse", "Teclado"])
+        self.assertEqual(rows[2][3], "Hardware")
+
+        response = self.client.get(
+            reverse("product_list"), {"export": "csv", "min_price": "60"}
+        )
+        self.assertEqual([row[1] for row in read_csv(response)[1:]], ["Teclado"])
+
+    def test_history_exports_use_view_filters(self):
+        """
+        Testa as exportações de histórico de preços e de movimentações, do
+        produto e gerais, com os filtros de tipo e categoria.
+        """
+        register_movement(self.keyboard, "OUT", 3)
+        self.keyboard.price = Decimal("120.00")
+        self.keyboard.save()
+
+        rows = read_csv(
+            self.client.get(
+                reverse("price_history", kwargs={"pk": self.keyboard.pk}),
+                {"export": "csv"},
+            )
+        )
+        self.assertEqual([row[2] for row in rows[1:]], ["120.00", "100.00"])
+
+        rows = read_csv(
+            self.client.get(
+                reverse("product_movement", kwargs={"pk": self.keyboard.pk}),
+                {"export": "csv", "tipo": "OUT"},
+            )
+        )
+        self.assertEqual(
+            [(row[3], row[4], row[5]) for row in rows[1:]], [("OUT", "3", "2")]
+        )
+
+        rows = read_csv(
+            self.client.get(
+                reverse("product_movement_overview"),
+                {"export": "csv", "category": self.category.pk},
+            )
+        )
+        self.assertEqual({row[2] for row in rows[1:]}, {"Teclado"})
+
+        rows = read_csv(
+            self.client.get(reverse("price_history_overview"), {"export": "csv"})
+        )
+        self.assertEqual(
+            sorted(row[1] for row in rows[1:]), ["Mouse", "Teclado", "Teclado"]
+        )
+
+    def test_export_queries_do_not_grow_with_rows(self):
+        """
+        Testa que as linhas são lidas em lotes: mais produtos não geram mais
+        consultas (as categorias vêm em uma consulta por lote).
+        """
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                read_csv(self.client.get(reverse("product_list"), {"export": "csv"}))
+            return len(ctx)
+
+        few = count_queries()
+        for index in range(10):
+            product = ProductFactory.create(user=self.user, name=f"Extra {index}")
+            product.categories.add(self.category)
+
+        self.assertEqual(count_queries(), few)
@@ -1,8 +1,30 @@
 from decimal import Decimal
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
-from products.models import Category, Product, PriceHistory, Profile
+from products.models import (
+    Category,
+    CategorySummary,
+    DailyInventoryChange,
+    InventorySummary,
+    MovementRollup,
+    Product,
+    PriceHistory,
+    Profile,
+    ProductMovement,
+)
+from datetime import timedelta
+from django.utils import timezone
+from products.services import (
+    InsufficientStockError,
+    bulk_create_products,
+    bulk_update_products,
+    register_movement,
+)
 from products.tests.factories import (
     UserFactory,
     CategoryFactory,
@@ -242,6 +264,39 @@ class PriceHistoryModelTest(TestCase):
         self.assertEqual(history.product, self.product)
         self.assertIn(history, self.product.price_history.all())
 
+    def test_price_history_records_change(self):
+        """
+        Testa que cada registro grava o preço anterior e as variações.
+        O primeiro registro do produto não possui preço anterior.
+        """
+        first = self.product.price_history.get()
+        self.assertIsNone(first.previous_price)
+        self.assertIsNone(first.delta)
+
+        self.product.price = first.price * 2
+        self.product.save()
+
+        latest = self.product.price_history.first()
+        assert latest is not None
+        self.assertEqual(latest.previous_price, first.price)
+        self.assertEqual(latest.delta, first.price)
+        self.assertEqual(latest.pct_change, Decimal("100.00"))
+
+    def test_backfill_price_changes_command(self):
+        """
+        Testa que o comando recalcula as variações de registros existentes.
+        """
+        self.product.price = Decimal("80.00")
+        self.product.save()
+        PriceHistory.objects.update(previous_price=None, delta=None, pct_change=None)
+
+        call_command("backfill_price_changes", stdout=StringIO())
+
+        latest = self.product.price_history.first()
+        assert latest is not None
+        self.assertEqual(latest.delta, Decimal("80.00") - latest.previous_price)
+        self.assertIsNone(self.product.price_history.last().previous_price)
+
 
 class ProfileModelTest(TestCase):
     """
@@ -304,6 +359,113 @@ class ProfileModelTest(TestCase):
         self.assertEqual(self.user.profile.theme, "dark")  # type: ignore
 
 
+class ProfileCacheTest(TestCase):
+    """
+    Testa o acesso ao perfil pelo cache e as gravações parciais de tema e
+    preferências de visualização.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_for_user_reads_cache_across_requests(self):
+        """
+        Testa que, depois da primeira leitura, o perfil vem do cache sem
+        consultas, e que dentro da requisição é reaproveitado.
+        """
+        Profile.for_user(self.fresh_user())
+
+        user = self.fresh_user()
+        with CaptureQueriesContext(connection) as ctx:
+            profile = Profile.for_user(user)
+            self.assertIs(Profile.for_user(user), profile)
+            self.assertIs(user.profile, profile)  # type: ignore
+        self.assertEqual(len(ctx), 0)
+        self.assertEqual(profile.theme, "light")
+
+    def test_for_user_creates_missing_profile(self):
+        """
+        Testa que usuários sem perfil ganham um na primeira leitura.
+        """
+        Profile.objects.filter(user=self.user).delete()
+
+        profile = Profile.for_user(self.fresh_user())
+
+        self.assertTrue(Profile.objects.filter(pk=profile.pk).exists())
+
+    def test_set_view_preference_updates_only_its_key(self):
+        """
+        Testa que gravar uma preferência preserva as outras chaves gravadas
+        no banco, mesmo que a cópia em memória esteja desatualizada.
+        """
+        stale = Profile.for_user(self.fresh_user())
+        Profile.objects.filter(user=self.user).update(
+            view_preferences={"category_list": "table"}
+        )
+
+        user = self.fresh_user()
+        user.profile = stale  # type: ignore
+        Profile.set_view_preference(user, "product_list", "table")
+
+        self.assertEqual(
+            Profile.objects.get(user=self.user).view_preferences,
+            {"category_list": "table", "product_list": "table"},
+        )
+        self.assertEqual(
+            Profile.for_user(self.fresh_user()).view_preferences["product_list"],
+            "table",
+        )
+
+    def test_unchanged_values_are_not_written(self):
+        """
+        Testa que valores iguais aos atuais não geram gravação.
+        """
+        user = self.fresh_user()
+        Profile.set_view_preference(user, "product_list", "table")
+
+        with CaptureQueriesContext(connection) as ctx:
+            Profile.set_view_preference(user, "product_list", "table")
+            Profile.set_theme(user, "light")
+        self.assertEqual(len(ctx), 0)
+
+    def test_set_theme_writes_through(self):
+        """
+        Testa que o tema gravado aparece no banco e no cache.
+        """
+        Profile.set_theme(self.fresh_user(), "dark")
+
+        self.assertEqual(Profile.objects.get(user=self.user).theme, "dark")
+        self.assertEqual(Profile.for_user(self.fresh_user()).theme, "dark")
+
+    def test_direct_save_invalidates_cache(self):
+        """
+        Testa que gravações diretas no perfil descartam a cópia do cache.
+        """
+        Profile.for_user(self.fresh_user())
+        profile = Profile.objects.get(user=self.user)
+        profile.theme = "dark"
+        profile.save()
+
+        self.assertEqual(Profile.for_user(self.fresh_user()).theme, "dark")
+
+    def test_user_save_does_not_write_profile(self):
+        """
+        Testa que salvar o usuário (ex.: last_login no login) não regrava o
+        perfil.
+        """
+        user = self.fresh_user()
+        Profile.for_user(user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        self.assertFalse(
+            any("products_profile" in query["sql"] for query in ctx.captured_queries)
+        )
+
+
 class SignalTests(TestCase):
     """
     Testa os sinais (signals) do Django.
@@ -358,3 +520,466 @@ class SignalTests(TestCase):
         product.save()
 
         self.assertEqual(product.price_history.count(), 1)  # Only initial entry
+
+    def test_price_history_signal_skips_history_on_same_price(self):
+        """
+        Testa que um save sem mudança de preço não consulta a tabela de histórico.
+        Verifica que a comparação usa o último preço registrado no produto.
+        """
+        product = ProductFactory.create(price=Decimal("100.00"))
+        self.assertEqual(product.last_recorded_price, Decimal("100.00"))
+
+        product.name = "Updated name"
+        with CaptureQueriesContext(connection) as ctx:
+            product.save()
+
+        self.assertFalse(
+            any("products_pricehistory" in q["sql"] for q in ctx.captured_queries)
+        )
+
+    def test_price_history_signal_with_stale_instance(self):
+        """
+        Testa que uma instância desatualizada ainda registra a mudança de preço.
+        Verifica que o último preço registrado é relido do banco antes do save.
+        """
+        product = ProductFactory.create(price=Decimal("100.00"))
+        stale = Product.objects.get(pk=product.pk)
+
+        product.price = Decimal("120.00")
+        product.save()
+        stale.price = Decimal("100.00")
+        stale.save()
+
+        prices = [h.price for h in product.price_history.order_by("changed_at", "id")]
+        self.assertEqual(
+            prices, [Decimal("100.00"), Decimal("120.00"), Decimal("100.00")]
+        )
+
+    def test_populate_price_history_syncs_last_recorded_price(self):
+        """
+        Testa que o comando populate_price_history preenche o último preço registrado.
+        """
+        product = ProductFactory.create(price=Decimal("80.00"))
+        Product.objects.update(last_recorded_price=None)
+
+        call_command("populate_price_history", stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.last_recorded_price, Decimal("80.00"))
+
+
+class StockLedgerTests(TestCase):
+    """
+    Testa o ledger de estoque (saldo acumulado das movimentações).
+    Verifica balance_after, ajustes via save() e o comando de backfill.
+    """
+
+    def setUp(self):
+        self.product = ProductFactory.create(stock=10)
+
+    def test_initial_movement_records_balance(self):
+        """
+        Testa que a movimentação inicial grava o saldo e atualiza o produto.
+        """
+        movement = self.product.movements.get()
+
+        self.assertEqual(movement.balance_after, 10)
+        self.assertEqual(movement.user, self.product.user)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.ledger_balance, 10)
+
+    def test_stock_adjustment_uses_ledger_balance(self):
+        """
+        Testa que alterar o estoque gera um ajuste com base no saldo do ledger.
+        Verifica que o histórico não é reagregado a cada save().
+        """
+        self.product.stock = 4
+        with CaptureQueriesContext(connection) as ctx:
+            self.product.save()
+
+        self.assertFalse(any("SUM(" in q["sql"] for q in ctx.captured_queries))
+
+        adjustment = self.product.movements.order_by("-id").first()
+        self.assertEqual(adjustment.type, "OUT")  # type: ignore
+        self.assertEqual(adjustment.quantity, 6)  # type: ignore
+        self.assertEqual(adjustment.balance_after, 4)  # type: ignore
+
+    def test_save_without_stock_change_creates_no_movement(self):
+        """
+        Testa que salvar o produto sem alterar o estoque não cria movimentações.
+        """
+        self.product.name = "Renamed"
+        self.product.save()
+
+        self.assertEqual(self.product.movements.count(), 1)
+
+    def test_stale_instance_does_not_overwrite_ledger(self):
+        """
+        Testa que um save() completo de uma instância desatualizada não
+        sobrescreve o saldo do ledger; o estoque salvo gera um ajuste.
+        """
+        stale = Product.objects.get(pk=self.product.pk)
+        ProductMovement.objects.create(product=self.product, type="IN", quantity=5)
+
+        stale.name = "Stale"
+        stale.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertEqual(self.product.ledger_balance, 10)
+        adjustment = self.product.movements.order_by("-id").first()
+        self.assertEqual(adjustment.type, "OUT")  # type: ignore
+        self.assertEqual(adjustment.quantity, 5)  # type: ignore
+
+    def test_backfill_command_rebuilds_balances(self):
+        """
+        Testa que o comando backfill_stock_ledger recalcula os saldos em ordem.
+        """
+        ProductMovement.objects.create(product=self.product, type="OUT", quantity=3)
+        ProductMovement.objects.create(product=self.product, type="IN", quantity=8)
+        ProductMovement.objects.update(balance_after=None)
+        Product.objects.update(ledger_balance=0)
+
+        call_command("backfill_stock_ledger", stdout=StringIO())
+
+        balances = list(
+            self.product.movements.order_by("id").values_list(
+                "balance_after", flat=True
+            )
+        )
+        self.assertEqual(balances, [10, 7, 15])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.ledger_balance, 15)
+
+
+class InventorySummaryTests(TestCase):
+    """
+    Testa o resumo de inventário por usuário mantido incrementalmente.
+    Verifica criação, edição, movimentação e exclusão de produtos.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(
+            user=self.user, price=Decimal("10.00"), stock=3, is_public=True
+        )
+        # Primeira leitura cria a linha com os totais atuais
+        InventorySummary.for_user(self.user)
+
+    def assertSummaryMatchesProducts(self):
+        summary = InventorySummary.objects.get(user=self.user)
+        expected = InventorySummary.compute(Product.objects.all()).get(
+            self.user.pk, dict.fromkeys(InventorySummary.TOTAL_FIELDS, 0)
+        )
+        for field in InventorySummary.TOTAL_FIELDS:
+            self.assertEqual(getattr(summary, field), expected[field], field)
+        return summary
+
+    def test_product_create_and_update(self):
+        """
+        Testa que criar e editar produtos atualiza o resumo pelo delta.
+        """
+        other = ProductFactory.create(user=self.user, price=Decimal("2.50"), stock=4)
+        other.price = Decimal("5.00")
+        other.is_public = True
+        other.save()
+
+        summary = self.assertSummaryMatchesProducts()
+        self.assertEqual(summary.total_count, 2)
+        self.assertEqual(summary.total_value, Decimal("50.00"))
+        self.assertEqual(summary.public_count, 2)
+
+    def test_movement_updates_summary(self):
+        """
+        Testa que movimentações de estoque atualizam estoque e valor do resumo.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            register_movement(self.product, "IN", 7)
+            register_movement(self.product, "OUT", 2)
+
+        summary = self.assertSummaryMatchesProducts()
+        self.assertEqual(summary.total_stock, 8)
+        self.assertEqual(summary.total_value, Decimal("80.00"))
+
+    def test_movement_summary_waits_for_commit(self):
+        """
+        Testa que a movimentação só altera o resumo depois do commit, fora do
+        bloqueio do produto, e que uma transação desfeita não o altera.
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            register_movement(self.product, "IN", 7)
+        self.assertEqual(InventorySummary.objects.get(user=self.user).total_stock, 3)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(InventorySummary.objects.get(user=self.user).total_stock, 10)
+
+        with self.assertRaises(InsufficientStockError):
+            with self.captureOnCommitCallbacks() as callbacks:
+                with transaction.atomic():
+                    register_movement(self.product, "OUT", 1)
+                    register_movement(self.product, "OUT", 100)
+        for callback in callbacks:
+            callback()
+        summary = self.assertSummaryMatchesProducts()
+        self.assertEqual(summary.total_stock, 10)
+
+    def test_product_delete_updates_summary(self):
+        """
+        Testa que excluir um produto retira sua parcela do resumo.
+        """
+        self.product.delete()
+
+        summary = self.assertSummaryMatchesProducts()
+        self.assertEqual(summary.total_count, 0)
+        self.assertEqual(summary.total_value, Decimal("0.00"))
+
+    def test_stats_by_status(self):
+        """
+        Testa os totais por status (público/privado) lidos do resumo.
+        """
+        ProductFactory.create(user=self.user, price=Decimal("1.00"), stock=5)
+        summary = InventorySummary.objects.get(user=self.user)
+
+        self.assertEqual(summary.stats()["total_count"], 2)
+        self.assertEqual(summary.stats("public")["total_stock"], 3)
+        self.assertEqual(summary.stats("private")["total_value"], Decimal("5.00"))
+
+    def test_check_command_detects_and_fixes_drift(self):
+        """
+        Testa que o verificador detecta divergências e as corrige com --fix.
+        """
+        call_command("check_inventory_summary", stdout=StringIO())
+
+        InventorySummary.objects.filter(user=self.user).update(total_stock=99)
+        with self.assertRaises(CommandError):
+            call_command("check_inventory_summary", stdout=StringIO())
+
+        call_command("check_inventory_summary", "--fix", stdout=StringIO())
+        self.assertSummaryMatchesProducts()
+
+    def test_rebuild_command(self):
+        """
+        Testa que o comando de rebuild recria os resumos a partir dos produtos.
+        """
+        InventorySummary.objects.all().delete()
+
+        call_command("rebuild_inventory_summary", stdout=StringIO())
+
+        self.assertEqual(self.assertSummaryMatchesProducts().total_stock, 3)
+
+
+class MovementRollupTests(TestCase):
+    """
+    Testa as linhas diárias de movimentação mantidas incrementalmente.
+    Verifica movimentações avulsas, em lote, a série por período e o rebuild.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(user=self.user, stock=10)
+
+    def rollup_totals(self):
+        return list(
+            MovementRollup.objects.order_by("product_id", "day").values(
+                "product_id", "day", *MovementRollup.TOTAL_FIELDS
+            )
+        )
+
+    def test_movements_update_daily_row(self):
+        """
+        Testa que as movimentações do dia se acumulam em uma única linha.
+        """
+        register_movement(self.product, "OUT", 4)
+        register_movement(self.product, "IN", 2)
+
+        rollup = MovementRollup.objects.get(product=self.product)
+        self.assertEqual(rollup.day, timezone.localdate())
+        self.assertEqual(rollup.user, self.user)
+        self.assertEqual((rollup.in_quantity, rollup.in_count), (12, 2))
+        self.assertEqual((rollup.out_quantity, rollup.out_count), (4, 1))
+
+    def test_bulk_services_update_rollups(self):
+        """
+        Testa que criação e ajuste de estoque em lote também alimentam as linhas.
+        """
+        products = bulk_create_products(
+            [
+                Product(user=self.user, name=f"Lote {i}", price=1, stock=5)
+                for i in range(3)
+            ]
+        )
+        for product in products:
+            product.stock = 1
+        bulk_update_products(products, ["stock"])
+
+        rollups = MovementRollup.objects.filter(product__in=products)
+        self.assertEqual(rollups.count(), 3)
+        for rollup in rollups:
+            self.assertEqual((rollup.in_quantity, rollup.out_quantity), (5, 4))
+
+    def test_series_by_bucket(self):
+        """
+        Testa o agrupamento das linhas diárias por dia e por mês.
+        """
+        register_movement(self.product, "OUT", 3)
+        ProductMovement.objects.filter(type="OUT").update(
+            moved_at=timezone.now() - timedelta(days=40)
+        )
+        call_command("rebuild_movement_rollups", stdout=StringIO())
+
+        daily = list(MovementRollup.objects.series("day"))
+        self.assertEqual([row["net_flow"] for row in daily], [-3, 10])
+        monthly = MovementRollup.objects.series("month")
+        self.assertEqual(sum(row["in_count"] for row in monthly), 1)
+
+    def test_rebuild_command_matches_incremental_rows(self):
+        """
+        Testa que o comando de rebuild recria exatamente as linhas incrementais.
+        """
+        other = ProductFactory.create(user=self.user, stock=3)
+        register_movement(self.product, "OUT", 6)
+        register_movement(other, "IN", 1)
+        expected = self.rollup_totals()
+
+        MovementRollup.objects.all().delete()
+        call_command("rebuild_movement_rollups", stdout=StringIO())
+
+        self.assertEqual(self.rollup_totals(), expected)
+
+
+class CategorySummaryTests(TestCase):
+    """
+    Testa os totais por categoria mantidos incrementalmente.
+    Verifica associação, edição, movimentação, lote e exclusão de produtos.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.hardware = CategoryFactory.create(user=self.user, name="Hardware")
+        self.office = CategoryFactory.create(user=self.user, name="Escritório")
+        self.product = ProductFactory.create(
+            user=self.user, price=Decimal("10.00"), stock=3
+        )
+        self.product.categories.add(self.hardware, self.office)
+
+    def assertSummariesMatchProducts(self):
+        expected = CategorySummary.compute(Category.objects.filter(user=self.user))
+        for summary in CategorySummary.objects.filter(user=self.user):
+            for field in CategorySummary.TOTAL_FIELDS:
+                self.assertEqual(
+                    getattr(summary, field),
+                    expected[summary.category_id][field],
+                    f"{summary.category.name}.{field}",
+                )
+        return {
+            summary.category_id: summary
+            for summary in CategorySummary.objects.filter(user=self.user)
+        }
+
+    def test_membership_changes(self):
+        """
+        Testa que adicionar e remover categorias, pelos dois lados da relação,
+        move a parcela do produto entre as categorias.
+        """
+        summaries = self.assertSummariesMatchProducts()
+        self.assertEqual(summaries[self.hardware.pk].total_value, Decimal("30.00"))
+
+        self.product.categories.remove(self.office)
+        other = ProductFactory.create(user=self.user, price=Decimal("2.00"), stock=5)
+        self.office.products.add(other)
+        self.hardware.products.clear()
+
+        summaries = self.assertSummariesMatchProducts()
+        self.assertEqual(summaries[self.hardware.pk].product_count, 0)
+        self.assertEqual(summaries[self.office.pk].total_value, Decimal("10.00"))
+
+    def test_product_writes_update_categories(self):
+        """
+        Testa que edição, movimentação, atualização em lote e exclusão de
+        produtos mantêm os totais das categorias.
+        """
+        self.product.price = Decimal("20.00")
+        self.product.save()
+        with self.captureOnCommitCallbacks() as callbacks:
+            register_movement(self.product, "IN", 2)
+        # A linha da categoria só muda depois do commit da movimentação
+        self.assertEqual(
+            CategorySummary.objects.get(category=self.office).total_stock, 3
+        )
+        for callback in callbacks:
+            callback()
+        summaries = self.assertSummariesMatchProducts()
+        self.assertEqual(summaries[self.office.pk].total_value, Decimal("100.00"))
+
+        self.product.stock = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update_products([self.product], ["stock"])
+        self.assertSummariesMatchProducts()
+
+        self.product.delete()
+        summaries = self.assertSummariesMatchProducts()
+        self.assertEqual(summaries[self.hardware.pk].product_count, 0)
+
+    def test_rebuild_command(self):
+        """
+        Testa que o rebuild recria os totais das categorias.
+        """
+        CategorySummary.objects.all().delete()
+
+        call_command("rebuild_inventory_summary", stdout=StringIO())
+
+        summaries = self.assertSummariesMatchProducts()
+        self.assertEqual(summaries[self.hardware.pk].total_stock, 3)
+
+
+class DailyInventoryChangeTests(TestCase):
+    """
+    Testa as variações diárias do inventário e a evolução calculada a partir
+    delas e do resumo atual.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(
+            user=self.user, price=Decimal("10.00"), stock=3
+        )
+        InventorySummary.for_user(self.user)
+
+    def test_writes_accumulate_in_todays_row(self):
+        """
+        Testa que as escritas do dia somam na mesma linha de variação.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            register_movement(self.product, "IN", 2)
+        self.product.refresh_from_db()
+        self.product.price = Decimal("20.00")
+        self.product.save()
+
+        change = DailyInventoryChange.objects.get(user=self.user)
+        self.assertEqual(change.day, timezone.localdate())
+        self.assertEqual(change.stock_change, 2)
+        self.assertEqual(change.value_change, Decimal("70.00"))
+
+    def test_trend_walks_back_from_current_totals(self):
+        """
+        Testa que a evolução parte dos totais atuais e desfaz as variações de
+        cada dia para chegar aos dias anteriores.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            register_movement(self.product, "IN", 2)
+        DailyInventoryChange.objects.filter(user=self.user).update(
+            day=timezone.localdate() - timedelta(days=3)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            register_movement(self.product, "OUT", 1)
+
+        summary = InventorySummary.objects.get(user=self.user)
+        trend = DailyInventoryChange.trend(summary)
+
+        self.assertEqual(len(trend), DailyInventoryChange.TREND_DAYS)
+        self.assertEqual(trend[-1]["date"], timezone.localdate())
+        self.assertEqual(
+            [point["total_stock"] for point in trend[-5:]], [3, 5, 5, 5, 4]
+        )
+        self.assertEqual(trend[0]["total_value"], Decimal("30.00"))
+
@@ -0,0 +1,297 @@
+"""
+Cache das páginas do catálogo público.
+
+Testa que ``public_product_list`` e ``user_public_catalog`` reutilizam as
+consultas guardadas no cache e que as alterações em produtos e categorias
+invalidam apenas os catálogos afetados.
+"""
+
+import pickle
+import tempfile
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from products import page_cache
+from products.models import Product
+from products.services import (
+    bulk_create_products,
+    bulk_update_products,
+    register_movement,
+)
+from products.tests.factories import CategoryFactory, ProductFactory, UserFactory
+
+
+class PageCacheKeyTest(TestCase):
+    """
+    Testa a chave do cache e os contadores de geração.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def key(self, params):
+        return page_cache.page_cache_key(self.factory.get("/", params), "public")
+
+    def test_normalized_params(self):
+        """
+        Testa que parâmetros equivalentes geram a mesma chave e que
+        parâmetros desconhecidos são ignorados.
+        """
+        self.assertEqual(
+            self.key({"q": "  Panela   Inox ", "sort": "price", "utm": "x"}),
+            self.key({"sort": "price", "q": "panela inox", "min_price": ""}),
+        )
+        self.assertNotEqual(self.key({"sort": "price"}), self.key({"sort": "name"}))
+
+    def test_bump_changes_only_its_scope(self):
+        """
+        Testa que incrementar uma geração muda apenas as chaves daquele
+        catálogo.
+        """
+        public = page_cache.get_generation("public")
+        other = page_cache.get_generation("user:1")
+
+        page_cache.bump_generation("public")
+
+        self.assertEqual(page_cache.get_generation("public"), public + 1)
+        self.assertEqual(page_cache.get_generation("user:1"), other)
+
+    def test_lost_generation_restarts_ahead(self):
+        """
+        Testa que um contador descartado pelo backend recomeça à frente dos
+        valores já usados.
+        """
+        page_cache.bump_generation("public")
+        before = page_cache.get_generation("public")
+        cache.delete(page_cache.generation_key("public"))
+
+        self.assertGreater(page_cache.get_generation("public"), before)
+
+
+class CatalogPageCacheTest(TestCase):
+    """
+    Testa o uso do cache pelas páginas do catálogo e a invalidação pelos
+    sinais e serviços de escrita.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.owner = UserFactory.create()
+        self.other = UserFactory.create()
+        self.category = CategoryFactory.create(user=self.owner, name="Cozinha")
+        self.product = ProductFactory.create(
+            user=self.owner,
+            name="Panela",
+            price=Decimal("10.00"),
+            stock=5,
+            is_public=True,
+        )
+        self.public_url = reverse("public_product_list")
+        self.owner_url = reverse(
+            "user_public_catalog", kwargs={"username": self.owner.username}
+        )
+        self.other_url = reverse(
+            "user_public_catalog", kwargs={"username": self.other.username}
+        )
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [p.name for p in response.context["products"]]
+
+    def captured(self, url, params):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, params)
+        return [query["sql"] for query in ctx.captured_queries]
+
+    def test_hit_skips_catalog_queries(self):
+        """
+        Testa que a segunda requisição não repete as consultas do catálogo.
+        """
+        for url in (self.public_url, self.owner_url):
+            with self.subTest(url=url):
+                miss = self.captured(url, {"sort": "price"})
+                hit = self.captured(url, {"sort": "price"})
+                self.assertTrue(any("products_product" in sql for sql in miss))
+                self.assertFalse(any("products_product" in sql for sql in hit))
+
+    def test_cached_page_keeps_links_and_stats(self):
+        """
+        Testa que a página lida do cache mantém estatísticas e paginação.
+        """
+        first = self.client.get(self.public_url)
+        second = self.client.get(self.public_url)
+
+        self.assertEqual(first.context["stats"], second.context["stats"])
+        self.assertEqual([p.pk for p in second.context["products"]], [self.product.pk])
+        self.assertFalse(second.context["products"].has_next)
+
+    def test_cache_keeps_no_model_instances(self):
+        """
+        Testa que o cache guarda apenas os campos exibidos, sem instâncias de
+        Product, Category ou do dono (e o hash da senha dele).
+        """
+        self.product.categories.add(self.category)
+        for url, scope in (
+            (self.public_url, page_cache.PUBLIC_SCOPE),
+            (self.owner_url, page_cache.user_scope(self.owner.pk)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                key = page_cache.page_cache_key(RequestFactory().get(url), scope)
+                data = pickle.dumps(cache.get(key))
+
+                self.assertNotIn(b"django.contrib.auth", data)
+                self.assertNotIn(b"products.models", data)
+                self.assertNotIn(self.owner.password.encode(), data)
+                row = response.context["products"][0]
+                self.assertEqual(row.user.username, self.owner.username)
+                self.assertEqual([c.name for c in row.categories.all()], ["Cozinha"])
+
+    def test_product_changes_invalidate(self):
+        """
+        Testa que criar, alterar e excluir produtos públicos invalida o
+        catálogo geral e o do dono.
+        """
+        self.names(self.public_url)
+        self.names(self.owner_url)
+
+        ProductFactory.create(user=self.owner, name="Tampa", is_public=True)
+        self.assertEqual(self.names(self.public_url), ["Panela", "Tampa"])
+        self.assertEqual(self.names(self.owner_url), ["Tampa", "Panela"])
+
+        self.product.is_public = False
+        self.product.save()
+        self.assertEqual(self.names(self.public_url), ["Tampa"])
+
+        Product.objects.get(name="Tampa").delete()
+        self.assertEqual(self.names(self.public_url), [])
+        self.assertEqual(self.names(self.owner_url), [])
+
+    def test_private_changes_keep_cache(self):
+        """
+        Testa que produtos privados não invalidam os catálogos.
+        """
+        self.names(self.public_url)
+        generation = page_cache.get_generation(page_cache.PUBLIC_SCOPE)
+
+        product = Product.objects.create(user=self.owner, name="Rascunho", price=1)
+        product.stock = 3
+        product.save()
+        product.delete()
+
+        self.assertEqual(page_cache.get_generation(page_cache.PUBLIC_SCOPE), generation)
+
+    def test_other_catalog_is_kept(self):
+        """
+        Testa que alterações de um usuário não invalidam o catálogo de outro.
+        """
+        self.names(self.other_url)
+        generation = page_cache.get_generation(page_cache.user_scope(self.other.pk))
+
+        Product.objects.create(user=self.owner, name="Tampa", price=1, is_public=True)
+
+        self.assertEqual(
+            page_cache.get_generation(page_cache.user_scope(self.other.pk)),
+            generation,
+        )
+
+    def test_category_changes_invalidate(self):
+        """
+        Testa que categorias (e a ligação com produtos) invalidam o catálogo.
+        """
+        response = self.client.get(self.owner_url)
+        self.assertEqual(list(response.context["products"][0].categories.all()), [])
+
+        self.product.categories.add(self.category)
+        response = self.client.get(self.owner_url)
+        self.assertEqual(
+            [c.name for c in response.context["products"][0].categories.all()],
+            ["Cozinha"],
+        )
+
+        self.category.name = "Utensílios"
+        self.category.save()
+        response = self.client.get(self.owner_url)
+        self.assertEqual(
+            [c.name for c in response.context["products"][0].categories.all()],
+            ["Utensílios"],
+        )
+
+    def test_services_invalidate(self):
+        """
+        Testa que movimentações e escritas em lote (sem sinais de save)
+        invalidam o catálogo.
+        """
+        self.client.get(self.public_url)
+
+        register_movement(self.product, "OUT", 2)
+        response = self.client.get(self.public_url)
+        self.assertEqual(response.context["products"][0].stock, 3)
+
+        self.product.price = Decimal("12.00")
+        bulk_update_products([self.product], ["price"])
+        response = self.client.get(self.public_url)
+        self.assertEqual(response.context["products"][0].price, Decimal("12.00"))
+
+        bulk_create_products(
+            [Product(user=self.owner, name="Tampa", price=1, is_public=True)]
+        )
+        self.assertEqual(self.names(self.public_url), ["Panela", "Tampa"])
+
+    def test_bulk_visibility_action_invalidates(self):
+        """
+        Testa que a ação em massa de visibilidade (update sem sinais)
+        invalida o catálogo.
+        """
+        self.client.force_login(self.owner)
+        self.names(self.public_url)
+
+        self.client.post(
+            reverse("product_bulk_action"),
+            {"product_ids": [self.product.pk], "action": "make_private"},
+        )
+
+        self.assertEqual(self.names(self.public_url), [])
+
+
+class FileBasedPageCacheTest(TestCase):
+    """
+    Testa o cache das páginas com o backend de arquivos.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": self.directory.name,
+                }
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+
+    def test_hit_and_invalidation(self):
+        """
+        Testa que o backend de arquivos guarda a página e acompanha as gerações.
+        """
+        user = UserFactory.create()
+        ProductFactory.create(user=user, name="Panela", is_public=True)
+        url = reverse("public_product_list")
+        self.client.get(url)
+
+        response = self.client.get(url)
+        self.assertEqual([p.name for p in response.context["products"]], ["Panela"])
+
+        ProductFactory.create(user=user, name="Tampa", is_public=True)
+        response = self.client.get(url)
+        self.assertEqual(
+            [p.name for p in response.context["products"]], ["Panela", "Tampa"]
+        )
@@ -0,0 +1,223 @@
+from decimal import Decimal
+from urllib.parse import parse_qs
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from products.models import Product
+from products.pagination import (
+    CURSOR_PARAM,
+    PAGE_SIZE,
+    encode_cursor,
+    keyset_paginate,
+    sort_queryset,
+)
+from products.tests.factories import CategoryFactory, ProductFactory, UserFactory
+from products.tests.test_utils import BaseTestCase
+from products.views import PRODUCT_SORTS, PUBLIC_SORTS
+
+
+class KeysetPaginationTest(TestCase):
+    """
+    Testa a paginação por chave em todas as ordenações das listagens.
+    Verifica que percorrer as páginas devolve cada produto uma única vez,
+    na mesma ordem da consulta completa.
+    """
+
+    PAGE = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory.create()
+        other = UserFactory.create(username="aaa-owner")
+        categories = [
+            CategoryFactory.create(user=cls.user, name=name, slug=name)
+            for name in ["bebidas", "limpeza"]
+        ]
+        for i in range(15):
+            product = ProductFactory.create(
+                user=cls.user if i % 4 else other,
+                name=f"Produto {i % 5}",
+                price=Decimal(i % 3) + Decimal("0.50"),
+                stock=i % 4,
+                is_public=i % 2 == 0,
+            )
+            if i % 3:
+                product.categories.add(categories[i % 2])
+
+    def walk(self, queryset, ordering):
+        """Percorre todas as páginas seguindo os links de próxima página."""
+        factory = RequestFactory()
+        request = factory.get("/")
+        pages = []
+        while True:
+            page = keyset_paginate(request, queryset, ordering, self.PAGE)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            request = factory.get(f"/?{page.next_query}")
+
+    def assertPaginatesInOrder(self, sort_options, sort_field, direction):
+        queryset, ordering = sort_queryset(
+            Product.objects.all(), sort_options, sort_field, direction, "name"
+        )
+        pages = self.walk(queryset, ordering)
+
+        expected = list(queryset.values_list("pk", flat=True))
+        paged = [product.pk for page in pages for product in page]
+        self.assertEqual(paged, expected)
+        self.assertTrue(all(len(page) <= self.PAGE for page in pages))
+        return pages
+
+    def test_every_sort_and_direction(self):
+        """
+        Testa as ordenações de todas as listagens, ascendente e descendente.
+        """
+        for sort_options in [PRODUCT_SORTS, PUBLIC_SORTS]:
+            for sort_field in sort_options:
+                for direction in ["asc", "desc"]:
+                    with self.subTest(sort=sort_field, dir=direction):
+                        self.assertPaginatesInOrder(sort_options, sort_field, direction)
+
+    def test_previous_page_returns_same_rows(self):
+        """
+        Testa que voltar uma página devolve exatamente a página anterior.
+        """
+        pages = self.assertPaginatesInOrder(PRODUCT_SORTS, "price", "desc")
+        queryset, ordering = sort_queryset(
+            Product.objects.all(), PRODUCT_SORTS, "price", "desc", "name"
+        )
+
+        request = RequestFactory().get(f"/?{pages[2].previous_query}")
+        previous = keyset_paginate(request, queryset, ordering, self.PAGE)
+
+        self.assertEqual(list(previous), list(pages[1]))
+        self.assertTrue(previous.has_previous)
+        self.assertTrue(previous.has_next)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """
+        Testa que um cursor inválido leva de volta à primeira página.
+        """
+        queryset, ordering = sort_queryset(
+            Product.objects.all(), PRODUCT_SORTS, "name", "asc", "name"
+        )
+        request = RequestFactory().get("/", {CURSOR_PARAM: "não-é-um-cursor"})
+
+        page = keyset_paginate(request, queryset, ordering, self.PAGE)
+
+        self.assertFalse(page.has_previous)
+        self.assertEqual(list(page), list(queryset[: self.PAGE]))
+
+    def test_mismatched_cursor_returns_first_page(self):
+        """
+        Testa que um cursor com valores do tipo errado para a ordenação (ex.:
+        texto no lugar do preço) leva de volta à primeira página.
+        """
+        queryset, ordering = sort_queryset(
+            Product.objects.all(), PRODUCT_SORTS, "price", "asc", "name"
+        )
+        for values in (["abc", 1], [True, "x"], ["1.50", 10**30]):
+            with self.subTest(values=values):
+                cursor = encode_cursor("next", values)
+                request = RequestFactory().get("/", {CURSOR_PARAM: cursor})
+
+                page = keyset_paginate(request, queryset, ordering, self.PAGE)
+
+                self.assertFalse(page.has_previous)
+                self.assertEqual(list(page), list(queryset[: self.PAGE]))
+
+    def test_page_query_uses_keyset_instead_of_offset(self):
+        """
+        Testa que as páginas seguintes filtram pela chave em vez de usar OFFSET.
+        """
+        queryset, ordering = sort_queryset(
+            Product.objects.all(), PRODUCT_SORTS, "stock", "asc", "name"
+        )
+        first = keyset_paginate(RequestFactory().get("/"), queryset, ordering, 4)
+        request = RequestFactory().get(f"/?{first.next_query}")
+
+        with CaptureQueriesContext(connection) as ctx:
+            list(keyset_paginate(request, queryset, ordering, 4))
+
+        self.assertNotIn("OFFSET", ctx.captured_queries[-1]["sql"])
+
+
+class PaginatedViewsTest(BaseTestCase):
+    """
+    Testa a paginação nas views de listagem de produtos e movimentações.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        for i in range(PAGE_SIZE + 5):
+            ProductFactory.create(
+                user=self.user, name=f"Produto {i:02d}", stock=1, is_public=True
+            )
+
+    def follow_pages(self, url, params, context_key):
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            page = response.context[context_key]
+            seen.extend(obj.pk for obj in page)
+            if not page.has_next:
+                return seen
+            response = self.client.get(url, parse_qs(page.next_query))
+
+    def test_product_list_pages(self):
+        """
+        Testa que o dashboard exibe todas as páginas sem repetir produtos.
+        """
+        response = self.client.get(reverse("product_list"), {"sort": "name"})
+        self.assertEqual(len(response.context["products"]), PAGE_SIZE)
+        self.assertContains(response, "Próxima")
+
+        seen = self.follow_pages(
+            reverse("product_list"), {"sort": "name", "dir": "desc"}, "products"
+        )
+        self.assertEqual(len(seen), PAGE_SIZE + 5)
+        self.assertEqual(len(set(seen)), PAGE_SIZE + 5)
+
+    def test_public_lists_pages(self):
+        """
+        Testa a paginação do catálogo público e do catálogo do usuário.
+        """
+        for url in [
+            reverse("public_product_list"),
+            reverse("user_public_catalog", kwargs={"username": self.user.username}),
+        ]:
+            with self.subTest(url=url):
+                seen = self.follow_pages(url, {"sort": "price"}, "products")
+                self.assertEqual(sorted(seen), sorted(set(seen)))
+                self.assertEqual(len(seen), PAGE_SIZE + 5)
+
+    def test_public_list_ignores_mismatched_cursor(self):
+        """
+        Testa que o catálogo público (anônimo) responde com a primeira página
+        a um cursor adulterado, em vez de erro.
+        """
+        self.client.logout()
+        cursor = encode_cursor("next", ["abc", 1])
+
+        response = self.client.get(
+            reverse("public_product_list"), {"sort": "price", CURSOR_PARAM: cursor}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["products"]), PAGE_SIZE)
+
+    def test_movement_views_pages(self):
+        """
+        Testa a paginação da seleção de produto e do dashboard de movimentações.
+        """
+        seen = self.follow_pages(
+            reverse("movement_select_product", kwargs={"type": "IN"}), {}, "products"
+        )
+        self.assertEqual(len(seen), PAGE_SIZE + 5)
+
+        response = self.client.get(reverse("product_movement_overview"))
+        self.assertEqual(response.context["total_movements"], PAGE_SIZE + 5)
+        self.assertEqual(len(response.context["movements"]), PAGE_SIZE + 5)
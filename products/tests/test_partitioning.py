@@ -0,0 +1,210 @@
+"""
+Particionamento mensal das tabelas de histórico.
+
+Os cálculos de meses, nomes e limites das partições e os filtros de data das
+views rodam em qualquer banco; a conversão das tabelas só roda no PostgreSQL.
+"""
+
+from datetime import date, datetime, time
+from io import StringIO
+from unittest import skipUnless
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.utils import timezone
+from products.db_operations import is_partitioned
+from products.models import PriceHistory, ProductMovement
+from products.partitioning import (
+    add_months,
+    convert_table,
+    detach_partitions,
+    ensure_partitions,
+    list_partitions,
+    month_range,
+    partition_bound,
+    partition_month,
+    partition_name,
+    reconcile_rows,
+)
+from products.services import register_movement
+from products.tests.factories import ProductFactory, UserFactory
+from products.views import parse_date_range
+
+MOVEMENTS = ProductMovement._meta.db_table
+PRICES = PriceHistory._meta.db_table
+
+
+class PartitionHelpersTest(TestCase):
+    """
+    Testa os cálculos de meses e nomes das partições e os limites de data
+    usados pelas views.
+    """
+
+    def test_month_arithmetic(self):
+        """
+        Testa a soma de meses e o intervalo de meses atravessando o ano.
+        """
+        self.assertEqual(add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+        self.assertEqual(
+            list(month_range(date(2024, 11, 15), date(2025, 1, 2))),
+            [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)],
+        )
+
+    def test_partition_names(self):
+        """
+        Testa que o mês é lido de volta do nome e que outras tabelas filhas
+        (como a partição DEFAULT) são ignoradas.
+        """
+        name = partition_name(MOVEMENTS, date(2025, 3, 1))
+        self.assertEqual(name, f"{MOVEMENTS}_p202503")
+        self.assertEqual(partition_month(MOVEMENTS, name), date(2025, 3, 1))
+        self.assertIsNone(partition_month(MOVEMENTS, f"{MOVEMENTS}_default"))
+
+    def test_partition_bound_is_local_midnight(self):
+        """
+        Testa que o limite da partição é a meia-noite no fuso da aplicação.
+        """
+        bound = datetime.fromisoformat(partition_bound(date(2025, 3, 1)))
+        self.assertEqual(timezone.localtime(bound).time(), time.min)
+        self.assertEqual(timezone.localdate(bound), date(2025, 3, 1))
+
+    def test_parse_date_range(self):
+        """
+        Testa que os filtros de data viram limites cientes [início, fim + 1 dia)
+        e que datas inválidas são ignoradas.
+        """
+        request = RequestFactory().get(
+            "/", {"data_inicio": "2025-03-01", "data_fim": "2025-03-31"}
+        )
+        start, end = parse_date_range(request)
+        self.assertTrue(timezone.is_aware(start))
+        self.assertEqual(timezone.localdate(start), date(2025, 3, 1))
+        self.assertEqual(timezone.localdate(end), date(2025, 4, 1))
+
+        request = RequestFactory().get("/", {"data_inicio": "01/03/2025"})
+        self.assertEqual(parse_date_range(request), (None, None))
+
+    def test_command_requires_postgresql(self):
+        """
+        Testa que o comando recusa bancos sem particionamento declarativo.
+        """
+        if connection.vendor == "postgresql":
+            self.skipTest("Banco de testes é PostgreSQL")
+        with self.assertRaises(CommandError):
+            call_command("partition_history", stdout=StringIO())
+
+
+@skipUnless(connection.vendor == "postgresql", "Particionamento requer PostgreSQL")
+class TablePartitioningTest(TransactionTestCase):
+    """
+    Testa a conversão das tabelas com dados, a manutenção das partições e o
+    uso normal dos modelos depois da troca.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(user=self.user, stock=0)
+        register_movement(self.product, "IN", 10)
+        old = timezone.make_aware(datetime(2024, 1, 15, 12))
+        ProductMovement.objects.filter(product=self.product).update(moved_at=old)
+        PriceHistory.objects.filter(product=self.product).update(changed_at=old)
+
+    def tearDown(self):
+        # Remove as tabelas originais mantidas pela conversão
+        with connection.cursor() as cursor:
+            for table in (MOVEMENTS, PRICES):
+                cursor.execute(f'DROP TABLE IF EXISTS "{table}_unpartitioned"')
+
+    def test_convert_keeps_rows_and_writes(self):
+        """
+        Testa que a conversão copia as linhas para as partições mensais e que
+        novas escritas e leituras continuam funcionando.
+        """
+        for table in (MOVEMENTS, PRICES):
+            self.assertTrue(convert_table(connection, table, batch_size=1))
+            self.assertTrue(is_partitioned(connection, table))
+            self.assertIn(date(2024, 1, 1), list_partitions(connection, table))
+            self.assertFalse(convert_table(connection, table))
+
+        register_movement(self.product, "OUT", 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 6)
+        self.assertEqual(
+            list(
+                ProductMovement.objects.filter(product=self.product)
+                .order_by("moved_at")
+                .values_list("balance_after", flat=True)
+            ),
+            [10, 6],
+        )
+
+        # A original mantida não guarda as chaves estrangeiras
+        self.product.delete()
+        self.assertFalse(ProductMovement.objects.exists())
+
+    def test_ensure_and_detach_partitions(self):
+        """
+        Testa a criação das partições futuras e a remoção das antigas da
+        tabela sem apagar seus dados.
+        """
+        convert_table(connection, MOVEMENTS)
+        today = timezone.localdate()
+
+        ensure_partitions(connection, months_ahead=6)
+        self.assertIn(
+            add_months(today.replace(day=1), 6), list_partitions(connection, MOVEMENTS)
+        )
+
+        detached = detach_partitions(connection, date(2024, 2, 1))
+        self.assertIn(partition_name(MOVEMENTS, date(2024, 1, 1)), detached)
+        self.assertFalse(ProductMovement.objects.filter(moved_at__year=2024).exists())
+        with connection.cursor() as cursor:
+            for name in detached:
+                cursor.execute(f'DROP TABLE "{name}"')
+
+    def test_ensure_partitions_moves_default_rows(self):
+        """
+        Testa que a criação de uma partição leva para ela as linhas do mês que
+        estavam na DEFAULT, em vez de falhar.
+        """
+        convert_table(connection, MOVEMENTS)
+        month = add_months(timezone.localdate().replace(day=1), 5)
+        movement = register_movement(self.product, "IN", 2)
+        moment = timezone.make_aware(datetime.combine(month, time(12)))
+        ProductMovement.objects.filter(pk=movement.pk).update(moved_at=moment)
+
+        created = ensure_partitions(connection, months_ahead=6)
+
+        name = partition_name(MOVEMENTS, month)
+        self.assertIn(name, created)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM "{name}"')
+            self.assertEqual(cursor.fetchall(), [(movement.pk,)])
+            cursor.execute(f'SELECT count(*) FROM "{MOVEMENTS}_default"')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(ProductMovement.objects.get(pk=movement.pk).moved_at, moment)
+
+    def test_reconcile_applies_writes_made_during_copy(self):
+        """
+        Testa que a reconciliação leva para a cópia as linhas inseridas,
+        alteradas e excluídas na original depois da cópia.
+        """
+        register_movement(self.product, "IN", 5)
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE "copy" (LIKE "{MOVEMENTS}")')
+            cursor.execute(f'INSERT INTO "copy" SELECT * FROM "{MOVEMENTS}"')
+        first, second = ProductMovement.objects.order_by("pk")
+        ProductMovement.objects.filter(pk=first.pk).update(reason="Alterada")
+        second.delete()
+        added = register_movement(self.product, "OUT", 1)
+
+        with connection.cursor() as cursor:
+            self.assertEqual(reconcile_rows(cursor, MOVEMENTS, "copy"), (2, 2))
+            cursor.execute('SELECT id, reason FROM "copy" ORDER BY id')
+            rows = cursor.fetchall()
+            cursor.execute('DROP TABLE "copy"')
+        self.assertEqual(
+            rows,
+            [(first.pk, "Alterada"), (added.pk, added.reason)],
+        )
@@ -0,0 +1,92 @@
+"""
+Orçamento de consultas das listagens.
+
+Cada listagem tem um número máximo de consultas por requisição, que não pode
+crescer com a quantidade de produtos exibidos (sem N+1 de categorias ou dono).
+"""
+
+from decimal import Decimal
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from products.tests.factories import CategoryFactory, ProductFactory, UserFactory
+
+# Consultas máximas por requisição de cada listagem (sessão e autenticação
+# incluídas)
+QUERY_BUDGETS = {
+    "product_list": 10,
+    "public_product_list": 7,
+    "user_public_catalog": 8,
+    "movement_select_product": 6,
+    # Maior aumento e maior redução vêm do banco, sobre todos os produtos,
+    # já que a página traz apenas parte deles
+    "price_history_overview": 10,
+    "product_movement_overview": 7,
+}
+
+
+# Sem cache: mede o pipeline completo de consultas de cada listagem
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class ListingQueryBudgetTest(TestCase):
+    """
+    Testa que as listagens respeitam o orçamento de consultas e que o número
+    de consultas é o mesmo com poucos ou muitos produtos.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        self.categories = [
+            CategoryFactory.create(user=self.user, name=f"Cat {i}", slug=f"cat-{i}")
+            for i in range(3)
+        ]
+
+    def add_products(self, count):
+        for i in range(count):
+            product = ProductFactory.create(
+                user=self.user, price=Decimal("5.00"), stock=1, is_public=True
+            )
+            product.categories.add(*self.categories[: i % 3 + 1])
+
+    def urls(self):
+        return {
+            "product_list": reverse("product_list"),
+            "public_product_list": reverse("public_product_list"),
+            "user_public_catalog": reverse(
+                "user_public_catalog", kwargs={"username": self.user.username}
+            ),
+            "movement_select_product": reverse(
+                "movement_select_product", kwargs={"type": "IN"}
+            ),
+            "price_history_overview": reverse("price_history_overview"),
+            "product_movement_overview": reverse("product_movement_overview"),
+        }
+
+    def count_queries(self):
+        counts = {}
+        for name, url in self.urls().items():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, name)
+            counts[name] = len(ctx)
+        return counts
+
+    def test_listings_within_budget(self):
+        """
+        Testa que o número de consultas não cresce com o número de produtos.
+        """
+        self.add_products(2)
+        # Primeira rodada cria sessão e resumo de inventário
+        self.count_queries()
+        few = self.count_queries()
+        self.add_products(18)
+        many = self.count_queries()
+
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(view=name):
+                self.assertEqual(many[name], few[name])
+                self.assertLessEqual(many[name], budget)
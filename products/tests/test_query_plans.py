@@ -0,0 +1,176 @@
+"""
+Testes de regressão de plano de consulta.
+
+Popula o banco com um volume representativo e verifica, via EXPLAIN, que as
+consultas mais usadas pelas views continuam apoiadas nos índices: sem varredura
+sequencial da tabela e sem ordenação em árvore temporária (temp B-tree / Sort).
+"""
+
+import re
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from products.models import Product, PriceHistory, ProductMovement
+from products.pagination import keyset_filter, sort_queryset
+from products.views import PRODUCT_SORTS, PUBLIC_SORTS
+
+USERS = 20
+PRODUCTS_PER_USER = 100
+HISTORY_PER_PRODUCT = 5
+
+
+class QueryPlanTests(TestCase):
+    """
+    Verifica os planos das consultas quentes de produtos, histórico de preços
+    e movimentações em uma base semeada.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # bulk_create não dispara signals, o que mantém a carga rápida
+        cls.users = User.objects.bulk_create(
+            [User(username=f"plan-user-{i}") for i in range(USERS)]
+        )
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    user=user,
+                    name=f"Produto {user.pk}-{i}",
+                    price=Decimal(i % 97) + Decimal("0.99"),
+                    stock=i % 31,
+                    is_public=i % 3 == 0,
+                )
+                for user in cls.users
+                for i in range(PRODUCTS_PER_USER)
+            ]
+        )
+        PriceHistory.objects.bulk_create(
+            [
+                PriceHistory(product=product, price=Decimal(i + 1))
+                for product in products
+                for i in range(HISTORY_PER_PRODUCT)
+            ]
+        )
+        ProductMovement.objects.bulk_create(
+            [
+                ProductMovement(
+                    product=product, user=product.user, type="IN", quantity=i + 1
+                )
+                for product in products
+                for i in range(HISTORY_PER_PRODUCT)
+            ]
+        )
+        cls.user = cls.users[0]
+        cls.product = products[0]
+
+        # Atualiza as estatísticas usadas pelo otimizador
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Com poucas linhas o PostgreSQL pode preferir Seq Scan mesmo com
+                # índice disponível; desencorajar o plano expõe a falta de índice.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("SET LOCAL enable_sort = off")
+        return queryset.explain()
+
+    def assertIndexedPlan(self, queryset):
+        plan = self.explain(queryset)
+        if connection.vendor == "postgresql":
+            bad_nodes = [r"Seq Scan", r"(^|->\s*)(Incremental )?Sort\b"]
+        else:
+            bad_nodes = [r"\bSCAN \w+\s*$", r"USE TEMP B-TREE"]
+
+        for line in plan.splitlines():
+            for pattern in bad_nodes:
+                self.assertIsNone(
+                    re.search(pattern, line.strip()),
+                    f"Plano sem índice para:\n{queryset.query}\n\n{plan}",
+                )
+
+    def test_price_history_by_product(self):
+        """
+        Testa que o histórico de preços de um produto usa o índice (produto, data).
+        """
+        self.assertIndexedPlan(PriceHistory.objects.filter(product=self.product))
+        self.assertIndexedPlan(
+            PriceHistory.objects.filter(product=self.product).order_by(
+                "-changed_at", "-pk"
+            )
+        )
+
+    def test_movements_by_product(self):
+        """
+        Testa que as movimentações de um produto usam o índice (produto, data).
+        """
+        self.assertIndexedPlan(ProductMovement.objects.filter(product=self.product))
+        self.assertIndexedPlan(
+            ProductMovement.objects.filter(product=self.product).order_by(
+                "-moved_at", "-pk"
+            )
+        )
+
+    def test_movements_by_user(self):
+        """
+        Testa que as movimentações do usuário usam o índice (usuário, data).
+        """
+        self.assertIndexedPlan(ProductMovement.objects.filter(user=self.user))
+
+    def test_movement_cursor_by_user(self):
+        """
+        Testa a paginação por cursor das movimentações do usuário (API e
+        dashboard): data decrescente com a chave primária como desempate.
+        """
+        movements = ProductMovement.objects.filter(user=self.user).order_by(
+            "-moved_at", "-pk"
+        )
+        self.assertIndexedPlan(movements)
+        last = movements[250]
+        self.assertIndexedPlan(
+            movements.filter(
+                Q(moved_at__lt=last.moved_at)
+                | Q(moved_at=last.moved_at, pk__lt=last.pk)
+            )
+        )
+
+    def test_owner_dashboard_sorts(self):
+        """
+        Testa as ordenações do dashboard do dono (nome, preço, estoque, status)
+        como as views as aplicam: campo + chave primária, nas duas direções, e
+        a consulta da página seguinte.
+        """
+        owner_products = Product.objects.filter(user=self.user)
+        for field in ["name", "price", "stock", "status"]:
+            for direction in ["asc", "desc"]:
+                with self.subTest(sort=field, dir=direction):
+                    products, ordering = sort_queryset(
+                        owner_products, PRODUCT_SORTS, field, direction, "name"
+                    )
+                    self.assertIndexedPlan(products)
+                    last = products[50]
+                    values = [getattr(last, PRODUCT_SORTS[field]), last.pk]
+                    self.assertIndexedPlan(
+                        products.filter(keyset_filter(ordering, values))
+                    )
+
+        self.assertIndexedPlan(
+            owner_products.filter(is_public=True).order_by("name", "pk")
+        )
+
+    def test_public_catalog_sorts(self):
+        """
+        Testa as ordenações do catálogo público (nome, preço, estoque) com a
+        chave primária como desempate.
+        """
+        public_products = Product.objects.filter(is_public=True)
+        for field in ["name", "price", "stock"]:
+            for direction in ["asc", "desc"]:
+                with self.subTest(sort=field, dir=direction):
+                    products, _ = sort_queryset(
+                        public_products, PUBLIC_SORTS, field, direction, "name"
+                    )
+                    self.assertIndexedPlan(products)
@@ -0,0 +1,229 @@
+"""
+Busca textual de produtos.
+
+Testa o índice de texto (FTS5 no SQLite dos testes), a sincronização com as
+escritas em produtos, o ranking por relevância e o uso do índice em todas as
+caixas de busca.
+"""
+
+from decimal import Decimal
+from django.test import Client, TestCase
+from django.urls import reverse
+from products.models import Product
+from products.search import search_products, search_rank, search_terms
+from products.services import register_movement
+from products.tests.factories import ProductFactory, UserFactory
+
+
+class SearchIndexTest(TestCase):
+    """
+    Testa que a busca casa nome e descrição pelo índice e acompanha criações,
+    alterações e exclusões de produtos.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+
+    def search(self, q):
+        return set(
+            search_products(Product.objects.all(), q).values_list("name", flat=True)
+        )
+
+    def test_matches_name_and_description_prefix(self):
+        """
+        Testa que cada termo casa como prefixo, no nome ou na descrição.
+        """
+        ProductFactory.create(user=self.user, name="Cafeteira elétrica")
+        ProductFactory.create(
+            user=self.user, name="Moedor", description="Ideal para café em grãos"
+        )
+        ProductFactory.create(user=self.user, name="Chaleira")
+
+        self.assertEqual(self.search("cafe"), {"Cafeteira elétrica", "Moedor"})
+        self.assertEqual(self.search("GRÃO"), {"Moedor"})
+
+    def test_all_terms_required(self):
+        """
+        Testa que todos os termos da busca precisam aparecer no produto.
+        """
+        ProductFactory.create(user=self.user, name="Caneca azul")
+        ProductFactory.create(user=self.user, name="Caneca vermelha")
+
+        self.assertEqual(self.search("caneca azul"), {"Caneca azul"})
+
+    def test_operators_are_ignored(self):
+        """
+        Testa que pontuação e operadores do FTS não quebram a consulta.
+        """
+        ProductFactory.create(user=self.user, name="Copo")
+
+        self.assertEqual(self.search('"copo* (^'), {"Copo"})
+        self.assertEqual(search_terms("--"), [])
+        self.assertEqual(self.search("--"), set())
+        self.assertEqual(self.search(""), set())
+
+    def test_substring_fallback_without_index_hits(self):
+        """
+        Testa que, sem resultados no índice (trecho no meio da palavra) ou sem
+        palavras na busca, a busca cai para ``icontains``; com resultados no
+        índice, a busca por trecho não é usada.
+        """
+        ProductFactory.create(user=self.user, name="Smartphone")
+        ProductFactory.create(user=self.user, name="Cabo USB-C", description="1,5m")
+
+        self.assertEqual(self.search("phone"), {"Smartphone"})
+        self.assertEqual(self.search(","), {"Cabo USB-C"})
+
+        ProductFactory.create(user=self.user, name="Phone case")
+        self.assertEqual(self.search("phone"), {"Phone case"})
+
+        results = search_products(Product.objects.all(), "martph").annotate(
+            rank=search_rank(Product.objects.all(), "martph")
+        )
+        self.assertEqual([p.rank for p in results], [0.0])
+
+    def test_index_follows_writes(self):
+        """
+        Testa que o índice acompanha atualizações, exclusões e bulk_create.
+        """
+        product = ProductFactory.create(user=self.user, name="Garrafa")
+        Product.objects.filter(pk=product.pk).update(name="Cantil")
+        self.assertEqual(self.search("garrafa"), set())
+        self.assertEqual(self.search("cantil"), {"Cantil"})
+
+        product.refresh_from_db()
+        product.description = "Térmico"
+        product.save()
+        self.assertEqual(self.search("termico"), {"Cantil"})
+
+        product.delete()
+        self.assertEqual(self.search("cantil"), set())
+
+        Product.objects.bulk_create(
+            [Product(user=self.user, name="Marmita", price=Decimal("1.00"))]
+        )
+        self.assertEqual(self.search("marmita"), {"Marmita"})
+
+    def test_name_ranks_above_description(self):
+        """
+        Testa que produtos com o termo no nome têm relevância maior.
+        """
+        ProductFactory.create(
+            user=self.user, name="Suporte", description="Para panela de pressão"
+        )
+        ProductFactory.create(user=self.user, name="Panela de pressão")
+
+        results = (
+            search_products(Product.objects.all(), "panela")
+            .annotate(rank=search_rank(Product.objects.all(), "panela"))
+            .order_by("-rank")
+        )
+        self.assertEqual([p.name for p in results], ["Panela de pressão", "Suporte"])
+
+
+class SearchViewsTest(TestCase):
+    """
+    Testa que as caixas de busca das páginas usam o índice e ordenam por
+    relevância quando nenhuma ordenação é escolhida.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        self.in_description = ProductFactory.create(
+            user=self.user,
+            name="Aaa suporte",
+            description="Acessório de panela",
+            price=Decimal("5.00"),
+            stock=10,
+            is_public=True,
+        )
+        self.in_name = ProductFactory.create(
+            user=self.user,
+            name="Panela inox",
+            price=Decimal("7.00"),
+            stock=10,
+            is_public=True,
+        )
+        self.other = ProductFactory.create(
+            user=self.user,
+            name="Travessa",
+            price=Decimal("9.00"),
+            stock=10,
+            is_public=True,
+        )
+
+    def listed(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [p.pk for p in response.context["products"]]
+
+    def test_product_listings_rank_by_relevance(self):
+        """
+        Testa a ordem por relevância nas listagens de produtos.
+        """
+        expected = [self.in_name.pk, self.in_description.pk]
+        urls = [
+            reverse("product_list"),
+            reverse("public_product_list"),
+            reverse("user_public_catalog", kwargs={"username": self.user.username}),
+            reverse("movement_select_product", kwargs={"type": "IN"}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.listed(url, q="panela"), expected)
+
+        # Ordenação explícita continua valendo sobre a relevância
+        for url in urls[:3]:
+            with self.subTest(url=url, sort="name"):
+                self.assertEqual(
+                    self.listed(url, q="panela", sort="name", dir="asc"),
+                    [self.in_description.pk, self.in_name.pk],
+                )
+
+    def test_relevance_pages(self):
+        """
+        Testa que a paginação percorre os resultados ordenados por relevância.
+        """
+        for i in range(30):
+            ProductFactory.create(
+                user=self.user,
+                name=f"Item {i}",
+                description="panela " * (i % 3 + 1),
+                is_public=True,
+            )
+        url = reverse("public_product_list")
+        response = self.client.get(url, {"q": "panela"})
+        seen = [p.pk for p in response.context["products"]]
+        next_query = response.context["products"].next_query
+        response = self.client.get(f"{url}?{next_query}")
+        seen += [p.pk for p in response.context["products"]]
+
+        self.assertEqual(len(seen), 32)
+        self.assertEqual(len(set(seen)), 32)
+        self.assertEqual(seen[0], self.in_name.pk)
+
+    def test_price_history_overview_search(self):
+        """
+        Testa a busca do dashboard de histórico de preços.
+        """
+        response = self.client.get(reverse("price_history_overview"), {"q": "panela"})
+
+        self.assertEqual(
+            [item["produto"].pk for item in response.context["produtos_com_historico"]],
+            [self.in_name.pk, self.in_description.pk],
+        )
+
+    def test_movement_overview_search(self):
+        """
+        Testa a busca do dashboard de movimentações.
+        """
+        register_movement(self.in_name, "IN", 1)
+        register_movement(self.other, "IN", 1)
+
+        response = self.client.get(reverse("product_movement_overview"), {"q": "inox"})
+
+        self.assertEqual(
+            {m.product_id for m in response.context["movements"]}, {self.in_name.pk}
+        )
@@ -0,0 +1,194 @@
+from decimal import Decimal
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from products.models import InventorySummary, Product, ProductMovement
+from products.services import (
+    InsufficientStockError,
+    bulk_create_products,
+    bulk_update_products,
+    register_movement,
+)
+from products.tests.factories import ProductFactory, UserFactory
+
+
+class RegisterMovementTest(TestCase):
+    """
+    Testa o serviço de movimentação de estoque compartilhado pela view e pela API.
+    Verifica o UPDATE condicional, o ledger e a proteção contra estoque negativo.
+    """
+
+    def setUp(self):
+        self.product = ProductFactory.create(stock=10, price=Decimal("5.00"))
+
+    def test_in_movement_increments_stock(self):
+        """
+        Testa que uma entrada soma a quantidade ao estoque e grava o saldo.
+        """
+        movement = register_movement(self.product, "IN", 5, "Compra")
+
+        self.assertEqual(self.product.stock, 15)
+        self.assertEqual(movement.balance_after, 15)
+        self.assertEqual(movement.user, self.product.user)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 15)
+        self.assertEqual(self.product.ledger_balance, 15)
+
+    def test_out_movement_decrements_stock(self):
+        """
+        Testa que uma saída subtrai a quantidade do estoque.
+        """
+        movement = register_movement(self.product, "OUT", 4)
+
+        self.assertEqual(movement.type, "OUT")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 6)
+        self.assertEqual(self.product.ledger_balance, 6)
+
+    def test_out_movement_insufficient_stock(self):
+        """
+        Testa que uma saída maior que o estoque é rejeitada sem gravar nada.
+        """
+        with self.assertRaises(InsufficientStockError):
+            register_movement(self.product, "OUT", 11)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertEqual(self.product.movements.count(), 1)  # Apenas o inicial
+
+    def test_out_movement_checks_current_stock_not_instance(self):
+        """
+        Testa que a verificação usa o estoque do banco, e não o da instância.
+        Simula outro terminal que consumiu o estoque após a leitura do produto.
+        """
+        stale = Product.objects.get(pk=self.product.pk)
+        register_movement(self.product, "OUT", 8)
+
+        with self.assertRaises(InsufficientStockError):
+            register_movement(stale, "OUT", 8)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+
+    def test_movement_does_not_create_adjustment(self):
+        """
+        Testa que o serviço não gera movimentações de ajuste via signal.
+        """
+        register_movement(self.product, "OUT", 3)
+        self.product.save()
+
+        self.assertEqual(
+            list(self.product.movements.order_by("id").values_list("type", "quantity")),
+            [("IN", 10), ("OUT", 3)],
+        )
+
+    def test_stock_check_constraint(self):
+        """
+        Testa que o banco rejeita estoque negativo mesmo fora do serviço.
+        """
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Product.objects.filter(pk=self.product.pk).update(stock=-1)
+
+        self.assertEqual(ProductMovement.objects.count(), 1)
+
+
+class BulkProductServiceTest(TestCase):
+    """
+    Testa a criação e atualização de produtos em lote.
+    Verifica que o histórico gerado equivale ao dos signals de save().
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+
+    def build_products(self, count):
+        return [
+            Product(
+                user=self.user,
+                name=f"Bulk {i}",
+                price=Decimal("10.00"),
+                stock=i,
+            )
+            for i in range(count)
+        ]
+
+    def test_bulk_create_records_initial_history(self):
+        """
+        Testa que a criação em lote registra o preço inicial e a entrada inicial.
+        """
+        products = bulk_create_products(self.build_products(3))
+
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.price_history.get().price, Decimal("10.00"))
+            self.assertEqual(product.last_recorded_price, Decimal("10.00"))
+            self.assertEqual(product.ledger_balance, product.stock)
+
+        # Produto com estoque zero não gera movimentação inicial
+        self.assertFalse(products[0].movements.exists())
+        movement = products[2].movements.get()
+        self.assertEqual((movement.type, movement.quantity), ("IN", 2))
+        self.assertEqual(movement.balance_after, 2)
+        self.assertEqual(movement.user, self.user)
+
+    def test_bulk_update_records_changes(self):
+        """
+        Testa que a atualização em lote registra mudanças de preço e ajustes de
+        estoque apenas para os produtos que realmente mudaram.
+        """
+        changed, unchanged = bulk_create_products(self.build_products(2))
+        changed.price = Decimal("12.50")
+        changed.stock = 7
+
+        bulk_update_products([changed, unchanged], ["price", "stock"])
+
+        self.assertEqual(changed.price_history.count(), 2)
+        self.assertEqual(unchanged.price_history.count(), 1)
+        adjustment = changed.movements.get()
+        self.assertEqual((adjustment.type, adjustment.quantity), ("IN", 7))
+        self.assertEqual(adjustment.reason, "Ajuste de estoque")
+        self.assertEqual(unchanged.movements.count(), 1)
+
+        changed.refresh_from_db()
+        self.assertEqual(changed.last_recorded_price, Decimal("12.50"))
+        self.assertEqual(changed.ledger_balance, 7)
+
+        # Um save() posterior não deve gerar nada novo
+        changed.save()
+        self.assertEqual(changed.price_history.count(), 2)
+        self.assertEqual(changed.movements.count(), 1)
+
+    def test_bulk_update_query_count_is_per_batch(self):
+        """
+        Testa que a quantidade de consultas não cresce com o número de produtos.
+        """
+        small = bulk_create_products(self.build_products(5))
+        large = bulk_create_products(self.build_products(50))
+        for product in small + large:
+            product.price += 1
+            product.stock += 1
+
+        with CaptureQueriesContext(connection) as small_ctx:
+            bulk_update_products(small, ["price", "stock"])
+        with CaptureQueriesContext(connection) as large_ctx:
+            bulk_update_products(large, ["price", "stock"])
+
+        self.assertEqual(len(small_ctx), len(large_ctx))
+
+    def test_bulk_operations_update_inventory_summary(self):
+        """
+        Testa que criação e atualização em lote mantêm o resumo de inventário.
+        """
+        InventorySummary.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            products = bulk_create_products(self.build_products(3))
+            for product in products:
+                product.stock += 2
+                product.is_public = True
+            bulk_update_products(products, ["stock", "is_public"])
+
+        summary = InventorySummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_count, 3)
+        self.assertEqual(summary.total_stock, 9)
+        self.assertEqual(summary.total_value, Decimal("90.00"))
+        self.assertEqual(summary.public_count, 3)
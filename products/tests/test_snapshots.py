@@ -0,0 +1,191 @@
+"""
+Snapshots diários de inventário.
+
+Testa a gravação incremental dos snapshots (apenas produtos alterados desde o
+anterior), os totais por usuário e a consulta de estoque/valor em uma data a
+partir do snapshot mais próximo.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+from products.models import (
+    InventorySnapshot,
+    PriceHistory,
+    Product,
+    ProductDeletion,
+    ProductMovement,
+    ProductSnapshot,
+)
+from products.services import register_movement
+from products.snapshots import SnapshotOrderError, inventory_as_of, take_snapshot
+from products.tests.factories import ProductFactory, UserFactory
+
+
+class InventorySnapshotTest(TestCase):
+    """
+    Testa snapshots e consultas "em uma data" com produtos criados em dias
+    passados.
+    """
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.today = timezone.localdate()
+        self.keyboard = self.create_product("Teclado", "10.00", 5, days_ago=3)
+        self.mouse = self.create_product("Mouse", "4.00", 2, days_ago=3)
+
+    def create_product(self, name, price, stock, days_ago):
+        """Cria o produto e move sua criação e histórico para dias atrás."""
+        product = ProductFactory.create(
+            user=self.user, name=name, price=Decimal(price), stock=stock
+        )
+        moment = timezone.make_aware(
+            datetime.combine(self.today - timedelta(days=days_ago), time(12))
+        )
+        Product.objects.filter(pk=product.pk).update(created_at=moment)
+        ProductMovement.objects.filter(product=product).update(moved_at=moment)
+        PriceHistory.objects.filter(product=product).update(changed_at=moment)
+        return product
+
+    def day(self, days_ago):
+        return self.today - timedelta(days=days_ago)
+
+    def test_first_snapshot_includes_every_product(self):
+        """
+        Testa que o primeiro snapshot grava todos os produtos e os totais.
+        """
+        self.assertEqual(take_snapshot(self.day(3)), (2, 1))
+
+        snapshot = InventorySnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.total_count, 2)
+        self.assertEqual(snapshot.total_stock, 7)
+        self.assertEqual(snapshot.total_value, Decimal("58.00"))
+
+    def test_next_snapshot_processes_only_changes(self):
+        """
+        Testa que o snapshot seguinte grava apenas os produtos alterados e
+        mantém os totais do usuário corretos.
+        """
+        take_snapshot(self.day(3))
+        register_movement(self.keyboard, "OUT", 2)
+        self.keyboard.price = Decimal("20.00")
+        self.keyboard.save()
+
+        self.assertEqual(take_snapshot(self.today), (1, 1))
+
+        self.assertFalse(
+            ProductSnapshot.objects.filter(product=self.mouse, day=self.today).exists()
+        )
+        snapshot = InventorySnapshot.objects.get(user=self.user, day=self.today)
+        self.assertEqual(snapshot.total_stock, 5)
+        self.assertEqual(snapshot.total_value, Decimal("68.00"))
+
+    def test_days_without_changes_write_nothing(self):
+        """
+        Testa que um dia sem mudanças não grava linhas.
+        """
+        take_snapshot(self.day(3))
+
+        self.assertEqual(take_snapshot(self.day(2)), (0, 0))
+        self.assertEqual(InventorySnapshot.objects.count(), 1)
+
+    def test_snapshot_order_is_enforced(self):
+        """
+        Testa que não é possível gravar um snapshot igual ou anterior ao último.
+        """
+        take_snapshot(self.day(2))
+
+        with self.assertRaises(SnapshotOrderError):
+            take_snapshot(self.day(2))
+        with self.assertRaises(CommandError):
+            call_command(
+                "take_inventory_snapshot",
+                "--date",
+                self.day(3).isoformat(),
+                stdout=StringIO(),
+            )
+
+    def test_as_of_replays_changes_after_snapshot(self):
+        """
+        Testa que a consulta em uma data parte do snapshot mais próximo e
+        reaplica apenas os produtos alterados depois dele.
+        """
+        take_snapshot(self.day(3))
+        register_movement(self.keyboard, "OUT", 2)
+        self.keyboard.price = Decimal("20.00")
+        self.keyboard.save()
+        self.create_product("Monitor", "100.00", 1, days_ago=0)
+
+        totals = inventory_as_of(self.user, self.today)
+        self.assertEqual(totals["snapshot_date"], self.day(3))
+        self.assertEqual(totals["replayed_products"], 2)
+        self.assertEqual(totals["total_count"], 3)
+        self.assertEqual(totals["total_stock"], 6)
+        self.assertEqual(totals["total_value"], Decimal("168.00"))
+
+        # Antes das mudanças de hoje, o snapshot responde sozinho
+        totals = inventory_as_of(self.user, self.day(1))
+        self.assertEqual(totals["replayed_products"], 0)
+        self.assertEqual(totals["total_value"], Decimal("58.00"))
+
+    def test_as_of_matches_snapshot_totals(self):
+        """
+        Testa que a consulta sem snapshot (lendo o estado de cada produto) e o
+        snapshot gravado depois chegam aos mesmos totais.
+        """
+        register_movement(self.mouse, "IN", 3)
+        expected = inventory_as_of(self.user, self.today)
+        self.assertIsNone(expected["snapshot_date"])
+        self.assertEqual(expected["replayed_products"], 2)
+
+        call_command(
+            "take_inventory_snapshot",
+            "--date",
+            self.today.isoformat(),
+            stdout=StringIO(),
+        )
+
+        snapshot = InventorySnapshot.objects.get(user=self.user)
+        for field in InventorySnapshot.TOTAL_FIELDS:
+            self.assertEqual(getattr(snapshot, field), expected[field], field)
+        self.assertEqual(inventory_as_of(self.user, self.today)["replayed_products"], 0)
+
+    def test_deleted_product_leaves_totals(self):
+        """
+        Testa que um produto excluído depois do snapshot sai dos totais das
+        datas seguintes, continua nas anteriores e faz o snapshot seguinte
+        recalcular o dono mesmo sem outras mudanças.
+        """
+        take_snapshot(self.day(3))
+        self.mouse.delete()
+
+        totals = inventory_as_of(self.user, self.today)
+        self.assertEqual(totals["total_count"], 1)
+        self.assertEqual(totals["total_stock"], 5)
+        self.assertEqual(totals["total_value"], Decimal("50.00"))
+        self.assertEqual(inventory_as_of(self.user, self.day(1))["total_count"], 2)
+
+        self.assertEqual(take_snapshot(self.today), (0, 1))
+        snapshot = InventorySnapshot.objects.get(user=self.user, day=self.today)
+        self.assertEqual(snapshot.total_count, 1)
+        self.assertEqual(snapshot.total_value, Decimal("50.00"))
+        totals = inventory_as_of(self.user, self.today)
+        self.assertEqual((totals["total_count"], totals["total_stock"]), (1, 5))
+
+    def test_deletions_outside_snapshots_are_not_recorded(self):
+        """
+        Testa que produtos sem snapshot não gravam ProductDeletion e que a
+        exclusão do usuário apaga os registros dos seus produtos.
+        """
+        ProductFactory.create(user=self.user).delete()
+        self.assertFalse(ProductDeletion.objects.exists())
+
+        take_snapshot(self.day(3))
+        self.keyboard.delete()
+        self.assertEqual(ProductDeletion.objects.count(), 1)
+
+        self.user.delete()
+        self.assertFalse(ProductDeletion.objects.exists())
@@ -1,16 +1,23 @@
+from datetime import timedelta
 from decimal import Decimal
 from django.forms import ModelForm
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.messages import get_messages
-from products.models import Product, Category, PriceHistory
+from products.models import Product, Category, PriceHistory, Profile
 from products.tests.factories import (
     UserFactory,
     CategoryFactory,
     ProductFactory,
     PriceHistoryFactory,
 )
+from products.pagination import PAGE_SIZE
+from products.services import register_movement
 from products.tests.test_utils import BaseTestCase
 
 
@@ -317,6 +324,27 @@ class ProductViewTest(BaseTestCase):
         self.assertContains(response, "150,00")
         self.assertContains(response, "130,00")
 
+    def test_price_history_view_single_history_query(self):
+        """
+        Testa que o histórico é renderizado com uma única consulta ao histórico,
+        independentemente da quantidade de registros.
+        """
+        product = ProductFactory.create(user=self.user, price=Decimal("10.00"))
+        for price in range(11, 31):
+            product.price = Decimal(price)
+            product.save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse("price_history", kwargs={"pk": product.pk})
+            )
+
+        self.assertEqual(response.status_code, 200)
+        history_queries = [
+            q for q in ctx.captured_queries if "products_pricehistory" in q["sql"]
+        ]
+        self.assertEqual(len(history_queries), 1)
+
     def test_price_history_overview_view(self):
         """Test price history overview view"""
         product1 = ProductFactory.create(user=self.user)
@@ -332,6 +360,55 @@ class ProductViewTest(BaseTestCase):
         # 4 alterações, pois o primeiro valor é contabilizado como alteração.
         self.assertEqual(response.context["total_alteracoes"], 4)
 
+    def test_price_history_overview_uses_recent_prices(self):
+        """
+        Testa que a visão geral traz apenas os últimos preços de cada produto,
+        com tendência, variação e total de alterações calculados no banco.
+        """
+        product = ProductFactory.create(user=self.user, price=Decimal("10.00"))
+        for price in range(11, 26):
+            product.price = Decimal(price)
+            product.save()
+
+        response = self.client.get(reverse("price_history_overview"))
+
+        item = response.context["produtos_com_historico"][0]
+        self.assertEqual(item["total_alteracoes"], 16)
+        self.assertEqual(item["historico_precos"], [float(p) for p in range(16, 26)])
+        self.assertEqual(item["trend"], "up")
+        self.assertAlmostEqual(float(item["variacao_percentual"]), 100 / 24, places=2)
+        self.assertEqual(response.context["maior_aumento"]["produto"], product)
+
+    def test_price_history_overview_is_paginated(self):
+        """
+        Testa que a visão geral é paginada pela data da última alteração e que
+        os destaques consideram também os produtos fora da página.
+        """
+        products = [
+            ProductFactory.create(user=self.user, price=Decimal("10.00"))
+            for _ in range(PAGE_SIZE + 1)
+        ]
+        # O primeiro produto criado fica por último na ordenação
+        products[0].price = Decimal("5.00")
+        products[0].save()
+        PriceHistory.objects.filter(product=products[0]).update(
+            changed_at=timezone.now() - timedelta(days=30)
+        )
+
+        response = self.client.get(reverse("price_history_overview"))
+        page = response.context["page"]
+        self.assertEqual(len(response.context["produtos_com_historico"]), PAGE_SIZE)
+        self.assertTrue(page.has_next)
+        self.assertEqual(response.context["maior_reducao"]["produto"], products[0])
+
+        response = self.client.get(
+            reverse("price_history_overview") + "?" + page.next_query
+        )
+        self.assertEqual(
+            [item["produto"] for item in response.context["produtos_com_historico"]],
+            [products[0]],
+        )
+
 
 class CategoryViewTest(BaseTestCase):
     """
@@ -493,6 +570,67 @@ class PublicCatalogViewTest(BaseTestCase):
         self.assertContains(response, "Other Product")
         self.assertNotContains(response, "My Product")
 
+    def test_user_public_catalog_stats(self):
+        """
+        Testa que as estatísticas do catálogo seguem os filtros e vêm de uma
+        única consulta agregada.
+        """
+        ProductFactory.create(
+            user=self.other_user, price=Decimal("10.00"), stock=2, is_public=True
+        )
+        ProductFactory.create(
+            user=self.other_user, price=Decimal("4.00"), stock=5, is_public=True
+        )
+        ProductFactory.create(
+            user=self.other_user, price=Decimal("99.00"), stock=1, is_public=False
+        )
+        url = reverse("user_public_catalog", kwargs={"username": "cataloguser"})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(
+            response.context["stats"],
+            {"total_count": 2, "total_stock": 7, "total_value": Decimal("40.00")},
+        )
+        aggregates = [
+            query["sql"] for query in ctx.captured_queries if "SUM(" in query["sql"]
+        ]
+        self.assertEqual(len(aggregates), 1)
+
+        response = self.client.get(url, {"max_price": "5"})
+        self.assertEqual(
+            response.context["stats"],
+            {"total_count": 1, "total_stock": 5, "total_value": Decimal("20.00")},
+        )
+
+    def test_user_public_catalog_sorts(self):
+        """
+        Testa que o catálogo do usuário aceita as ordenações do dashboard.
+        """
+        cheap = ProductFactory.create(
+            user=self.other_user, name="B", price=Decimal("1.00"), is_public=True
+        )
+        expensive = ProductFactory.create(
+            user=self.other_user, name="A", price=Decimal("9.00"), is_public=True
+        )
+        cheap.categories.add(CategoryFactory.create(user=self.other_user, name="Z"))
+        expensive.categories.add(CategoryFactory.create(user=self.other_user, name="Y"))
+        url = reverse("user_public_catalog", kwargs={"username": "cataloguser"})
+
+        for sort, direction, expected in (
+            ("created", None, [expensive, cheap]),
+            ("name", "asc", [expensive, cheap]),
+            ("price", "desc", [expensive, cheap]),
+            ("category", "desc", [cheap, expensive]),
+            ("status", "asc", [cheap, expensive]),
+        ):
+            with self.subTest(sort=sort):
+                params = {"sort": sort}
+                if direction:
+                    params["dir"] = direction
+                response = self.client.get(url, params)
+                self.assertEqual(list(response.context["products"]), expected)
+
     def test_user_public_catalog_not_found(self):
         """Test user catalog for non-existent user"""
         response = self.client.get(
@@ -653,3 +791,214 @@ class MessageTest(BaseTestCase):
         response = self.client.get(reverse("product_update", kwargs={"pk": product.pk}))
 
         self.assertEqual(response.status_code, 404)
+
+
+class MovementViewTest(BaseTestCase):
+    """
+    Testa as views de movimentação de estoque.
+    Verifica entradas, saídas e a rejeição de saídas sem estoque.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create_admin()
+        self.client.force_login(self.user)
+        self.product = ProductFactory.create(user=self.user, stock=10)
+
+    def test_perform_out_movement(self):
+        """
+        Testa que uma saída válida reduz o estoque e redireciona para o dashboard.
+        """
+        response = self.client.post(
+            reverse("perform_movement", kwargs={"pk": self.product.pk, "type": "OUT"}),
+            {"quantity": 4, "reason": "Venda"},
+        )
+
+        self.assertRedirects(response, reverse("product_movement_overview"))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 6)
+        self.assertEqual(
+            self.product.movements.filter(type="OUT").get().reason, "Venda"
+        )
+
+    def test_perform_out_movement_insufficient_stock(self):
+        """
+        Testa que uma saída maior que o estoque exibe erro e não altera o estoque.
+        """
+        response = self.client.post(
+            reverse("perform_movement", kwargs={"pk": self.product.pk, "type": "OUT"}),
+            {"quantity": 11},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Estoque insuficiente")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
+    def test_movement_overview_stats(self):
+        """
+        Testa que as estatísticas do dashboard de movimentações (contagens,
+        totais por tipo, saldo e produtos) vêm de uma única consulta agregada
+        e seguem os filtros.
+        """
+        other = ProductFactory.create(user=self.user, name="Tampa", stock=0)
+        register_movement(self.product, "OUT", 4)
+        register_movement(other, "IN", 3)
+        ProductFactory.create(name="De outro usuário", stock=7)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("product_movement_overview"))
+        stats = {
+            key: response.context[key]
+            for key in (
+                "total_movements",
+                "total_in",
+                "total_out",
+                "net_flow",
+                "products_touched",
+            )
+        }
+        self.assertEqual(
+            stats,
+            {
+                "total_movements": 3,
+                "total_in": 13,
+                "total_out": 4,
+                "net_flow": 9,
+                "products_touched": 2,
+            },
+        )
+        movement_queries = [
+            query["sql"]
+            for query in ctx.captured_queries
+            if "products_productmovement" in query["sql"]
+        ]
+        # Uma consulta para a página e uma para as estatísticas
+        self.assertEqual(len(movement_queries), 2)
+
+        response = self.client.get(
+            reverse("product_movement_overview"), {"tipo": "OUT"}
+        )
+        self.assertEqual(response.context["total_movements"], 1)
+        self.assertEqual(response.context["net_flow"], -4)
+        self.assertEqual(response.context["products_touched"], 1)
+
+    def test_movement_overview_series(self):
+        """
+        Testa que o fluxo por período do dashboard vem das linhas diárias,
+        agrupado conforme o parâmetro ``periodo``.
+        """
+        register_movement(self.product, "OUT", 4)
+
+        response = self.client.get(
+            reverse("product_movement_overview"), {"periodo": "week"}
+        )
+        self.assertEqual(response.context["periodo"], "week")
+        series = list(response.context["series"])
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]["in_quantity"], 10)
+        self.assertEqual(series[0]["out_quantity"], 4)
+        self.assertEqual(series[0]["net_flow"], 6)
+
+        response = self.client.get(
+            reverse("product_movement_overview"), {"periodo": "ano"}
+        )
+        self.assertEqual(response.context["periodo"], "day")
+
+
+class DashboardFiltersTest(BaseTestCase):
+    """
+    Testa os filtros lembrados pelo dashboard de produtos e que uma
+    visualização sem alterações não grava a sessão.
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        self.url = reverse("product_list")
+
+    def session_writes(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return [
+            query["sql"]
+            for query in ctx.captured_queries
+            if "django_session" in query["sql"]
+            and not query["sql"].startswith("SELECT")
+        ]
+
+    def test_unchanged_filters_skip_session_write(self):
+        """
+        Testa que apenas a mudança de filtros grava a sessão.
+        """
+        self.assertEqual(self.session_writes(), [])
+        self.assertNotEqual(self.session_writes({"q": "panela"}), [])
+        self.assertEqual(self.session_writes(), [])
+        self.assertEqual(self.session_writes({"q": "panela"}), [])
+        self.assertNotEqual(self.session_writes({"q": "tampa"}), [])
+
+    def test_filters_are_restored_and_cleared(self):
+        """
+        Testa que os filtros voltam na próxima visita e que "clear" os remove.
+        """
+        self.client.get(self.url, {"status": "public", "min_price": "5"})
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["status"], "public")
+        self.assertEqual(response.context["min_price"], "5")
+
+        self.client.get(self.url, {"clear": "1"})
+        self.assertNotIn("filters_dashboard", self.client.session)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["status"], "")
+
+    @override_settings(DASHBOARD_FILTERS_STORAGE="profile")
+    def test_profile_storage(self):
+        """
+        Testa que, guardados no perfil, os filtros não tocam a sessão.
+        """
+        self.assertEqual(self.session_writes({"status": "private"}), [])
+        self.assertNotIn("filters_dashboard", self.client.session)
+        self.assertEqual(
+            Profile.objects.get(user=self.user).view_preferences["filters_dashboard"][
+                "status"
+            ],
+            "private",
+        )
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["status"], "private")
+
+    @override_settings(DASHBOARD_FILTERS_STORAGE="profile")
+    def test_profile_storage_clear_reaches_database(self):
+        """
+        Testa que limpar os filtros guardados no perfil substitui o valor no
+        banco (não apenas no cache): com o cache vazio, os filtros antigos
+        não voltam.
+        """
+        self.client.get(self.url, {"q": "abc", "min_price": "5"})
+        cache.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["q"], "abc")
+
+        self.client.get(self.url, {"clear": "1"})
+        cache.clear()
+        self.assertEqual(
+            Profile.objects.get(user=self.user).view_preferences["filters_dashboard"],
+            {},
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["q"], "")
+        self.assertEqual(response.context["min_price"], "")
+
+    @override_settings(DASHBOARD_FILTERS_STORAGE="url")
+    def test_url_storage(self):
+        """
+        Testa que, com os filtros apenas na URL, nada é lembrado nem gravado.
+        """
+        self.assertEqual(self.session_writes({"status": "private"}), [])
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["status"], "")
@@ -21,6 +21,7 @@ urlpatterns = [
         name="perform_movement",
     ),
     path("public/", views.public_product_list, name="public_product_list"),
+    path("autocomplete/", views.product_autocomplete, name="product_autocomplete"),
     path("add/", views.product_create, name="product_create"),
     path("edit/<int:pk>/", views.product_update, name="product_update"),
     path("delete/<int:pk>/", views.product_delete, name="product_delete"),
@@ -1,82 +1,184 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db import models
 from django.contrib.auth.models import User
-from .models import Product, Category, PriceHistory, ProductMovement
+from .models import (
+    Category,
+    InventorySummary,
+    MovementRollup,
+    PriceHistory,
+    Product,
+    ProductMovement,
+    Profile,
+)
 from .forms import ProductForm, CategoryForm, MovementForm
+from .page_cache import (
+    PUBLIC_SCOPE,
+    cached_category,
+    cached_page,
+    cached_page_state,
+    invalidate_catalogs,
+    user_scope,
+)
+from .pagination import KeysetPage, keyset_paginate, sort_queryset
+from .autocomplete import get_index
+from .exports import (
+    export_movements,
+    export_price_history,
+    export_products,
+    wants_csv,
+)
+from .search import search_products, search_rank, search_sorts, search_terms
+from .services import InsufficientStockError, register_movement
 from django.contrib import messages
-from django.db.models import Min, Sum, F, ExpressionWrapper, DecimalField, Q
+from django.db.models import Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.db.models import Count
 
+# Quantidade de preços exibidos no sparkline de cada produto
+SPARKLINE_SIZE = 10
+
+# Opções do parâmetro "sort" das listagens de produtos. Expressões são anotadas
+# como sort_key; Coalesce evita NULL na chave usada pela paginação.
+CATEGORY_SORT = Coalesce(Min("categories__name"), Value(""))
+PRODUCT_SORTS = {
+    "name": "name",
+    "price": "price",
+    "stock": "stock",
+    "status": "is_public",
+    "category": CATEGORY_SORT,
+}
+PUBLIC_SORTS = {
+    "name": "name",
+    "price": "price",
+    "stock": "stock",
+    "category": CATEGORY_SORT,
+    "user": Coalesce("user__username", Value("")),
+}
+CATALOG_SORTS = {
+    "created": "created_at",
+    **PRODUCT_SORTS,
+}
+
+# Movimentações por página no dashboard de movimentações
+MOVEMENT_PAGE_SIZE = 50
+
+# Filtros do dashboard de produtos lembrados entre visitas
+DASHBOARD_FILTERS_KEY = "filters_dashboard"
+DASHBOARD_FILTERS = (
+    "q",
+    "status",
+    "category",
+    "min_price",
+    "max_price",
+    "min_stock",
+    "max_stock",
+)
+
+# Caracteres mínimos digitados para o autocompletar responder
+AUTOCOMPLETE_MIN_LENGTH = 2
+
+
+def get_view_mode(request, context, default="grid"):
+    """Modo de visualização (grade/tabela) escolhido para a tela ``context``."""
+    if request.user.is_authenticated:
+        return Profile.for_user(request.user).view_preferences.get(context, default)
+    return request.session.get(f"view_mode_{context}", default)
+
+
+def load_dashboard_filters(request):
+    """
+    Últimos filtros do dashboard, de onde DASHBOARD_FILTERS_STORAGE manda
+    guardá-los: sessão, perfil (cache) ou nenhum lugar ("url", os filtros
+    vivem apenas nos parâmetros da URL).
+    """
+    storage = settings.DASHBOARD_FILTERS_STORAGE
+    if storage == "session":
+        stored = request.session.get(DASHBOARD_FILTERS_KEY, {})
+    elif storage == "profile":
+        profile = Profile.for_user(request.user)
+        stored = profile.view_preferences.get(DASHBOARD_FILTERS_KEY, {})
+    else:
+        stored = {}
+    return {name: stored.get(name, "") for name in DASHBOARD_FILTERS}
+
+
+def save_dashboard_filters(request, filters):
+    storage = settings.DASHBOARD_FILTERS_STORAGE
+    if storage == "session":
+        if filters:
+            request.session[DASHBOARD_FILTERS_KEY] = filters
+        elif DASHBOARD_FILTERS_KEY in request.session:
+            del request.session[DASHBOARD_FILTERS_KEY]
+    elif storage == "profile":
+        Profile.set_view_preference(request.user, DASHBOARD_FILTERS_KEY, filters)
+
+
+def parse_date_range(request):
+    """
+    Limites dos filtros ``data_inicio``/``data_fim`` (AAAA-MM-DD) como
+    datetimes cientes no fuso da aplicação: [início do dia inicial, início do
+    dia seguinte ao final). Datas ausentes ou inválidas viram None.
+
+    Os limites são comparados diretamente com a coluna de data, o que permite
+    ao PostgreSQL ler apenas as partições do período nas tabelas particionadas.
+    """
+    bounds = []
+    for name, offset in (("data_inicio", 0), ("data_fim", 1)):
+        try:
+            day = datetime.strptime(request.GET.get(name) or "", "%Y-%m-%d")
+        except ValueError:
+            bounds.append(None)
+        else:
+            bounds.append(timezone.make_aware(day + timedelta(days=offset)))
+    return tuple(bounds)
+
 
 # --- Product Views ---
 @login_required
 def product_list(request):
     # Lógica para limpar filtros
     if "clear" in request.GET:
-        if "filters_dashboard" in request.session:
-            del request.session["filters_dashboard"]
+        save_dashboard_filters(request, {})
         return redirect("product_list")
 
-    # Recuperação de filtros da sessão
-    session_filters = request.session.get("filters_dashboard", {})
-
-    q = request.GET.get("q") if "q" in request.GET else session_filters.get("q", "")
-    status = (
-        request.GET.get("status")
-        if "status" in request.GET
-        else session_filters.get("status", "")
-    )
-    min_price = (
-        request.GET.get("min_price")
-        if "min_price" in request.GET
-        else session_filters.get("min_price", "")
-    )
-    max_price = (
-        request.GET.get("max_price")
-        if "max_price" in request.GET
-        else session_filters.get("max_price", "")
-    )
-    min_stock = (
-        request.GET.get("min_stock")
-        if "min_stock" in request.GET
-        else session_filters.get("min_stock", "")
-    )
-    max_stock = (
-        request.GET.get("max_stock")
-        if "max_stock" in request.GET
-        else session_filters.get("max_stock", "")
-    )
-    category_id = (
-        request.GET.get("category")
-        if "category" in request.GET
-        else session_filters.get("category", "")
+    # Filtros da URL, completados pelos últimos filtros guardados
+    stored_filters = load_dashboard_filters(request)
+    filters = {
+        name: (
+            request.GET.get(name)
+            if name in request.GET
+            else stored_filters.get(name, "")
+        )
+        for name in DASHBOARD_FILTERS
+    }
+    q = filters["q"]
+    status = filters["status"]
+    category_id = filters["category"]
+    min_price = filters["min_price"]
+    max_price = filters["max_price"]
+    min_stock = filters["min_stock"]
+    max_stock = filters["max_stock"]
+
+    # Parâmetros de Ordenação (com busca, o padrão é a relevância)
+    sort_field = request.GET.get("sort", "relevance" if q else "name")
+    sort_direction = request.GET.get(
+        "dir", "desc" if sort_field == "relevance" else "asc"
     )
 
-    # Parâmetros de Ordenação
-    sort_field = request.GET.get("sort", "name")
-    sort_direction = request.GET.get("dir", "asc")
-    prefix = "" if sort_direction == "asc" else "-"
-
-    # Salva filtros na sessão
-    request.session["filters_dashboard"] = {
-        "q": q,
-        "status": status,
-        "category": category_id,
-        "min_price": min_price,
-        "max_price": max_price,
-        "min_stock": min_stock,
-        "max_stock": max_stock,
-    }
+    # Guarda os filtros apenas se mudaram: uma visualização sem alterações
+    # não grava a sessão (nem o perfil)
+    if filters != stored_filters:
+        save_dashboard_filters(request, filters)
 
     # QuerySet Base
     products = Product.objects.filter(user=request.user)
 
     # Filtros
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(description__icontains=q))
+        products = search_products(products, q)
     if category_id:
         products = products.filter(categories__id=category_id)
     if status == "public":
@@ -92,46 +194,38 @@ def product_list(request):
     if max_stock:
         products = products.filter(stock__lte=max_stock)
 
-    # Ordenação com Annotate para evitar duplicados
-    if sort_field == "category":
-        products = products.annotate(sort_key=Min("categories__name")).order_by(
-            f"{prefix}sort_key"
-        )
-    else:
-        valid_fields = {
-            "name": "name",
-            "price": "price",
-            "stock": "stock",
-            "status": "is_public",
-        }
-        target = valid_fields.get(sort_field, "name")
-        products = products.order_by(f"{prefix}{target}")
-
-    # Remove duplicatas residuais de filtros M2M
-    products = products.distinct()
-
-    # Cálculo de Estatísticas usando agregação do Banco de Dados
-    stats = {
-        "total_count": products.count(),
-        "total_stock": products.aggregate(Sum("stock"))["stock__sum"] or 0,
-        "total_value": products.annotate(
-            val=ExpressionWrapper(F("price") * F("stock"), output_field=DecimalField())
-        ).aggregate(total=Sum("val"))["total"]
-        or 0,
-    }
+    # Ordenação (categoria via Annotate para evitar duplicados)
+    products, ordering = sort_queryset(
+        products,
+        search_sorts(products, q, PRODUCT_SORTS),
+        sort_field,
+        sort_direction,
+        "name",
+    )
 
-    # Determine view mode
-    view_mode = "grid"
-    if request.user.is_authenticated:
-        view_mode = request.user.profile.view_preferences.get("product_list", "grid")
+    # Remove duplicatas residuais de filtros M2M. O DISTINCT impede o uso dos
+    # índices de ordenação, então só é aplicado quando há junção com categorias.
+    if category_id:
+        products = products.distinct()
+
+    # Exportação com os mesmos filtros e ordenação da página
+    if wants_csv(request):
+        return export_products(products)
+
+    # Estatísticas: sem filtros, lê a linha do resumo materializado do usuário;
+    # com filtros, uma única consulta agregada sobre o queryset filtrado.
+    if any([q, category_id, min_price, max_price, min_stock, max_stock]):
+        stats = InventorySummary.totals(products)
     else:
-        view_mode = request.session.get("view_mode_product_list", "grid")
+        stats = InventorySummary.for_user(request.user).stats(status)
+
+    view_mode = get_view_mode(request, "product_list")
 
     return render(
         request,
         "products/product_list.html",
         {
-            "products": products,
+            "products": keyset_paginate(request, products.for_listing(), ordering),
             "categories": Category.objects.filter(user=request.user),
             "stats": stats,
             "title": "Meus Produtos",
@@ -149,6 +243,21 @@ def product_list(request):
     )
 
 
+@login_required
+def product_autocomplete(request):
+    """
+    Sugestões de nomes dos produtos do usuário para o campo de busca, servidas
+    pelo índice em memória (sem consulta ao banco depois de montado).
+    """
+    q = request.GET.get("q", "").strip()
+    suggestions = []
+    if len(q) >= AUTOCOMPLETE_MIN_LENGTH:
+        suggestions = get_index(request.user.pk).suggest(q)
+    return render(
+        request, "products/autocomplete_options.html", {"suggestions": suggestions}
+    )
+
+
 @login_required
 def product_create(request):
     if request.method == "POST":
@@ -227,9 +336,15 @@ def product_bulk_action(request):
             messages.success(request, f"{count} produtos excluídos com sucesso.")
         elif action == "make_public":
             products.update(is_public=True)
+            # update() não dispara signals: recalcula o resumo do usuário e
+            # invalida as páginas dos catálogos
+            InventorySummary.rebuild(request.user.pk)
+            invalidate_catalogs(request.user.pk)
             messages.success(request, f"{count} produtos marcados como Públicos.")
         elif action == "make_private":
             products.update(is_public=False)
+            InventorySummary.rebuild(request.user.pk)
+            invalidate_catalogs(request.user.pk)
             messages.success(request, f"{count} produtos marcados como Privados.")
         elif action == "add_category":
             category_id = request.POST.get("bulk_category_id")
@@ -237,8 +352,8 @@ def product_bulk_action(request):
                 category = get_object_or_404(
                     Category, id=category_id, user=request.user
                 )
-                for product in products:
-                    product.categories.add(category)
+                # Uma única inserção na tabela M2M para todos os produtos
+                category.products.add(*products)
                 messages.success(
                     request,
                     f"Categoria '{category.name}' adicionada a {count} produtos.",
@@ -278,34 +393,25 @@ def price_history_view(request, pk):
     data_inicio = request.GET.get("data_inicio")
     data_fim = request.GET.get("data_fim")
 
-    if data_inicio:
-        try:
-            # Converte string para datetime ingênuo
-            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
-            # Torna o datetime ciente (aware) do fuso horário do projeto
-            data_inicio_obj = timezone.make_aware(data_inicio_obj)
-            price_history = price_history.filter(changed_at__gte=data_inicio_obj)
-        except ValueError:
-            pass
+    start, end = parse_date_range(request)
+    if start:
+        price_history = price_history.filter(changed_at__gte=start)
+    if end:
+        price_history = price_history.filter(changed_at__lt=end)
 
-    if data_fim:
-        try:
-            # Converte string para datetime ingênuo
-            data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d")
-            # Adiciona 1 dia para incluir todo o dia final (até 23:59:59)
-            data_fim_obj = data_fim_obj + timedelta(days=1)
-            # Torna o datetime ciente (aware)
-            data_fim_obj = timezone.make_aware(data_fim_obj)
-            price_history = price_history.filter(changed_at__lt=data_fim_obj)
-        except ValueError:
-            pass
+    if wants_csv(request):
+        return export_price_history(
+            price_history.order_by("-changed_at", "-pk"),
+            f"historico_precos_{product.pk}.csv",
+        )
 
     return render(
         request,
         "products/price_history.html",
         {
             "product": product,
-            "price_history": price_history,
+            # Avaliado uma única vez: a variação de cada linha já vem gravada
+            "price_history": list(price_history),
             "data_inicio": data_inicio,
             "data_fim": data_fim,
         },
@@ -319,25 +425,34 @@ def price_history_overview(request):
         messages.error(request, "Você precisa estar logado para acessar esta página.")
         return redirect("account_login")
 
-    # Base Queryset com otimização de prefetch
-    user_products = Product.objects.filter(user=request.user).prefetch_related(
-        "price_history"
-    )
+    # Base Queryset (o histórico é lido em uma consulta limitada por produto)
+    user_products = Product.objects.filter(user=request.user)
 
     # Filtro por Termo de Busca (q)
     q = request.GET.get("q", "")
     if q:
-        user_products = user_products.filter(
-            models.Q(name__icontains=q) | models.Q(description__icontains=q)
-        )
+        user_products = search_products(user_products, q)
 
     # Filtro por Categoria
     category_id = request.GET.get("category")
     if category_id:
         user_products = user_products.filter(categories__id=category_id)
 
-    # Estatísticas gerais
-    total_alteracoes = PriceHistory.objects.filter(product__in=user_products).count()
+    if wants_csv(request):
+        return export_price_history(
+            PriceHistory.objects.filter(
+                product__in=user_products.values("pk")
+            ).order_by("-changed_at", "-pk")
+        )
+
+    # Estatísticas gerais em uma única agregação
+    totals = user_products.aggregate(
+        total_produtos=Count("pk", distinct=True),
+        total_alteracoes=Count("price_history"),
+    )
+    total_alteracoes = totals["total_alteracoes"]
+    total_produtos = totals["total_produtos"]
+    media_alteracoes = total_alteracoes / total_produtos if total_produtos > 0 else 0
 
     # Produto com mais alterações
     produto_mais_alteracoes_obj = (
@@ -354,81 +469,83 @@ def price_history_overview(request):
         ),
     }
 
-    # Calcular maior aumento e redução percentual
+    # Última alteração de cada produto, lida do índice (produto, data) por uma
+    # subconsulta: exclui os produtos sem histórico sem montar uma lista de ids
+    # e serve de chave para a ordenação e a paginação
+    latest_entries = PriceHistory.objects.filter(product=OuterRef("pk")).order_by(
+        "-changed_at", "-pk"
+    )
+    products_with_history = user_products.annotate(
+        last_change=Subquery(latest_entries.values("changed_at")[:1]),
+        last_pct_change=Subquery(latest_entries.values("pct_change")[:1]),
+    ).filter(last_change__isnull=False)
+
+    # Maior aumento e maior redução da última alteração, entre todos os produtos
     maior_aumento = {"produto": None, "percentual": 0}
     maior_reducao = {"produto": None, "percentual": 0}
-
-    # Query otimizada para buscar os dois últimos preços de todos os produtos
-    from django.db.models import OuterRef, Subquery
-
-    latest_prices = PriceHistory.objects.filter(product=OuterRef("pk")).order_by(
-        "-changed_at"
+    product = (
+        products_with_history.filter(last_pct_change__gt=0)
+        .order_by("-last_pct_change", "-pk")
+        .first()
     )
-    products_with_prices = user_products.annotate(
-        current_price=Subquery(latest_prices.values("price")[:1]),
-        previous_price=Subquery(latest_prices.values("price")[1:2]),
-    ).filter(previous_price__isnull=False)
-
-    for p in products_with_prices:
-        if p.current_price > p.previous_price:  # type: ignore
-            percentual = ((p.current_price - p.previous_price) / p.previous_price) * 100  # type: ignore
-            if percentual > maior_aumento["percentual"]:
-                maior_aumento["percentual"] = percentual
-                maior_aumento["produto"] = p
-        elif p.current_price < p.previous_price:  # type: ignore
-            percentual = ((p.previous_price - p.current_price) / p.previous_price) * 100  # type: ignore
-            if percentual > maior_reducao["percentual"]:
-                maior_reducao["percentual"] = percentual
-                maior_reducao["produto"] = p
-
-    # Média de alterações por produto
-    total_produtos = user_products.count()
-    media_alteracoes = total_alteracoes / total_produtos if total_produtos > 0 else 0
-
-    # Produtos com seus históricos (para lista principal)
-    produtos_com_historico = []
-    for product in user_products:
-        # Ordenação em Python para aproveitar o prefetch_related e evitar N+1 queries
-        history = sorted(
-            product.price_history.all(), key=lambda x: x.changed_at, reverse=True
+    if product:
+        maior_aumento = {"produto": product, "percentual": product.last_pct_change}
+    product = (
+        products_with_history.filter(last_pct_change__lt=0)
+        .order_by("last_pct_change", "-pk")
+        .first()
+    )
+    if product:
+        maior_reducao = {"produto": product, "percentual": -product.last_pct_change}
+
+    # Página de produtos por relevância da busca (quando houver) e data da
+    # última alteração; o histórico é lido só para os produtos da página
+    ordering = ["-last_change", "-pk"]
+    if search_terms(q):
+        products_with_history = products_with_history.annotate(
+            relevance=search_rank(user_products, q)
         )
+        ordering.insert(0, "-relevance")
+    page = keyset_paginate(
+        request,
+        products_with_history.order_by(*ordering).for_listing(),
+        ordering,
+    )
 
-        if not history:
-            continue
-
-        # Dados para o Sparkline (últimos 10 preços, ordem cronológica)
-        history_prices = [float(h.price) for h in history[:10]]
-        history_prices.reverse()  # Reverte para o gráfico (do mais antigo para o mais novo)
+    historicos = {}
+    for row in PriceHistory.recent_by_product(
+        [product.pk for product in page], limit=SPARKLINE_SIZE
+    ).values("product_id", "price", "changed_at", "pct_change", "change_count"):
+        historicos.setdefault(row["product_id"], []).append(row)
 
-        # Determinar tendência
+    produtos_com_historico = []
+    for product in page:
+        # Linhas do mais recente para o mais antigo
+        history = historicos[product.pk]
         latest = history[0]
-        previous = history[1] if len(history) > 1 else None
-        trend = "stable"
 
-        if previous:
-            if latest.price > previous.price:
-                trend = "up"
-            elif latest.price < previous.price:
-                trend = "down"
+        # Dados para o Sparkline (últimos preços, ordem cronológica)
+        history_prices = [float(h["price"]) for h in reversed(history)]
+
+        # Tendência e variação da última alteração
+        percentual = latest["pct_change"] or 0
+        trend = "stable"
+        if percentual > 0:
+            trend = "up"
+        elif percentual < 0:
+            trend = "down"
 
         produtos_com_historico.append(
             {
                 "produto": product,
                 "historico_precos": history_prices,
-                "total_alteracoes": len(history),
+                "total_alteracoes": latest["change_count"],
                 "ultima_alteracao": latest,
                 "trend": trend,
+                "variacao_percentual": percentual,
             }
         )
 
-    # Ordenar por data da última alteração
-    produtos_com_historico.sort(
-        key=lambda x: (
-            x["ultima_alteracao"].changed_at if x["ultima_alteracao"] else datetime.min
-        ),
-        reverse=True,
-    )
-
     context = {
         "total_alteracoes": total_alteracoes,
         "produto_mais_alteracoes": produto_mais_alteracoes,
@@ -436,6 +553,7 @@ def price_history_overview(request):
         "maior_reducao": maior_reducao,
         "media_alteracoes": media_alteracoes,
         "produtos_com_historico": produtos_com_historico,
+        "page": page,
         "categorias": Category.objects.filter(user=request.user).distinct(),
         "selected_category": int(category_id) if category_id else "",
         "q": q,
@@ -460,26 +578,20 @@ def product_movement_view(request, pk):
     data_fim = request.GET.get("data_fim")
     tipo = request.GET.get("tipo")
 
-    if data_inicio:
-        try:
-            from datetime import datetime
-
-            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
-            movements = movements.filter(moved_at__gte=data_inicio_obj)
-        except ValueError:
-            pass
-
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d")
-            data_fim_obj = data_fim_obj + timedelta(days=1)
-            movements = movements.filter(moved_at__lt=data_fim_obj)
-        except ValueError:
-            pass
+    start, end = parse_date_range(request)
+    if start:
+        movements = movements.filter(moved_at__gte=start)
+    if end:
+        movements = movements.filter(moved_at__lt=end)
 
     if tipo in ["IN", "OUT"]:
         movements = movements.filter(type=tipo)
 
+    if wants_csv(request):
+        return export_movements(
+            movements.order_by("-moved_at", "-pk"), f"movimentacoes_{product.pk}.csv"
+        )
+
     return render(
         request,
         "products/product_movement.html",
@@ -489,9 +601,7 @@ def product_movement_view(request, pk):
             "data_inicio": data_inicio,
             "data_fim": data_fim,
             "tipo": tipo,
-            "view_mode": request.user.profile.view_preferences.get(
-                "product_movement", "table"
-            ),
+            "view_mode": get_view_mode(request, "product_movement", "table"),
             "view_context": "product_movement",
         },
     )
@@ -503,73 +613,67 @@ def product_movement_overview(request):
         messages.error(request, "Você precisa estar logado para acessar esta página.")
         return redirect("account_login")
 
-    # Base Queryset
-    user_products = Product.objects.filter(user=request.user)
+    # Movimentações do usuário pela coluna desnormalizada (índice
+    # user, -moved_at, -id), sem subconsulta de produtos quando não há filtro
+    movements = ProductMovement.objects.filter(user=request.user)
+    # Série por período lida das linhas diárias, com os mesmos filtros
+    rollups = MovementRollup.objects.filter(user=request.user)
 
-    # Filtro por Termo de Busca (q)
+    # Filtros de produto (busca e categoria) restringem pelos produtos
     q = request.GET.get("q", "")
-    if q:
-        user_products = user_products.filter(
-            models.Q(name__icontains=q) | models.Q(description__icontains=q)
-        )
-
-    # Filtro por Categoria
     category_id = request.GET.get("category")
-    if category_id:
-        user_products = user_products.filter(categories__id=category_id)
-
-    movements = ProductMovement.objects.filter(
-        product__in=user_products
-    ).select_related("product")
+    if q or category_id:
+        user_products = Product.objects.filter(user=request.user)
+        if q:
+            user_products = search_products(user_products, q)
+        if category_id:
+            user_products = user_products.filter(categories__id=category_id)
+        movements = movements.filter(product__in=user_products.values("pk"))
+        rollups = rollups.filter(product__in=user_products.values("pk"))
 
     # Filtros de data e tipo
     data_inicio = request.GET.get("data_inicio")
     data_fim = request.GET.get("data_fim")
     tipo = request.GET.get("tipo")
-
-    if data_inicio:
-        try:
-            from datetime import datetime
-
-            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
-            movements = movements.filter(moved_at__gte=data_inicio_obj)
-        except ValueError:
-            pass
-
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d")
-            data_fim_obj = data_fim_obj + timedelta(days=1)
-            movements = movements.filter(moved_at__lt=data_fim_obj)
-        except ValueError:
-            pass
+    periodo = request.GET.get("periodo")
+    if periodo not in MovementRollup.BUCKETS:
+        periodo = "day"
+
+    start, end = parse_date_range(request)
+    if start:
+        movements = movements.filter(moved_at__gte=start)
+        rollups = rollups.filter(day__gte=timezone.localdate(start))
+    else:
+        rollups = rollups.filter(day__gte=MovementRollup.default_start(periodo))
+    if end:
+        movements = movements.filter(moved_at__lt=end)
+        rollups = rollups.filter(day__lt=timezone.localdate(end))
 
     if tipo in ["IN", "OUT"]:
         movements = movements.filter(type=tipo)
 
-    # Estatísticas
-    from django.db.models import Sum
-
-    total_in = (
-        movements.filter(type="IN").aggregate(total=Sum("quantity"))["total"] or 0
-    )
-    total_out = (
-        movements.filter(type="OUT").aggregate(total=Sum("quantity"))["total"] or 0
-    )
+    ordering = ["-moved_at", "-pk"]
+    if wants_csv(request):
+        return export_movements(movements.order_by(*ordering))
 
     context = {
-        "movements": movements,
-        "total_in": total_in,
-        "total_out": total_out,
+        "movements": keyset_paginate(
+            request,
+            movements.select_related("product").order_by(*ordering),
+            ordering,
+            MOVEMENT_PAGE_SIZE,
+        ),
+        # Estatísticas em uma única consulta agregada
+        **movements.stats(),
+        "series": rollups.series(periodo),
+        "periodo": periodo,
         "q": q,
         "selected_category": int(category_id) if category_id else "",
         "categorias": Category.objects.filter(user=request.user).distinct(),
         "data_inicio": data_inicio,
         "data_fim": data_fim,
         "tipo": tipo,
-        "view_mode": request.user.profile.view_preferences.get(
-            "movement_overview", "table"
-        ),
+        "view_mode": get_view_mode(request, "movement_overview", "table"),
         "view_context": "movement_overview",
     }
 
@@ -591,7 +695,7 @@ def movement_select_product(request, type):
     status = request.GET.get("status", "")
 
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(description__icontains=q))
+        products = search_products(products, q)
     if category_id:
         products = products.filter(categories__id=category_id)
     if status == "public":
@@ -599,10 +703,19 @@ def movement_select_product(request, type):
     elif status == "private":
         products = products.filter(is_public=False)
 
-    products = products.distinct().order_by("name")
+    if category_id:
+        products = products.distinct()
+    # Com busca, os produtos mais relevantes aparecem primeiro
+    products, ordering = sort_queryset(
+        products,
+        search_sorts(products, q, {"name": "name"}),
+        "relevance" if q else "name",
+        "desc" if q else "asc",
+        "name",
+    )
 
     context = {
-        "products": products,
+        "products": keyset_paginate(request, products.for_listing(), ordering),
         "type": type,
         "type_display": "Entrada" if type == "IN" else "Saída",
         "categories": Category.objects.filter(user=request.user),
@@ -610,9 +723,7 @@ def movement_select_product(request, type):
         "category_id": category_id,
         "status": status,
         "title": f"Selecionar Produto para {('Entrada' if type == 'IN' else 'Saída')}",
-        "view_mode": request.user.profile.view_preferences.get(
-            "movement_select", "grid"
-        ),
+        "view_mode": get_view_mode(request, "movement_select"),
         "view_context": "movement_select",
     }
     return render(request, "products/movement_select_product.html", context)
@@ -628,33 +739,30 @@ def perform_movement(request, pk, type):
     if request.method == "POST":
         form = MovementForm(request.POST)
         if form.is_valid():
-            movement = form.save(commit=False)
-            movement.product = product
-            movement.type = type
-
-            # Atualiza o estoque do produto
-            if type == "IN":
-                product.stock += movement.quantity
-            else:
-                if product.stock < movement.quantity:
-                    messages.error(
-                        request,
-                        f"Estoque insuficiente para realizar esta saída. Estoque atual: {product.stock}",
-                    )
-                    return render(
-                        request,
-                        "products/movement_form.html",
-                        {
-                            "form": form,
-                            "product": product,
-                            "type": type,
-                            "type_display": "Entrada" if type == "IN" else "Saída",
-                        },
-                    )
-                product.stock -= movement.quantity
-
-            movement.save()
-            product.save()
+            # Atualiza o estoque de forma atômica (sem ler e regravar o valor)
+            try:
+                register_movement(
+                    product,
+                    type,
+                    form.cleaned_data["quantity"],
+                    form.cleaned_data["reason"],
+                )
+            except InsufficientStockError:
+                product.refresh_from_db(fields=["stock"])
+                messages.error(
+                    request,
+                    f"Estoque insuficiente para realizar esta saída. Estoque atual: {product.stock}",
+                )
+                return render(
+                    request,
+                    "products/movement_form.html",
+                    {
+                        "form": form,
+                        "product": product,
+                        "type": type,
+                        "type_display": "Entrada" if type == "IN" else "Saída",
+                    },
+                )
 
             messages.success(
                 request,
@@ -702,12 +810,7 @@ def category_list(request):
         f"{prefix}{target_field}"
     )
 
-    # Determine view mode
-    view_mode = "grid"
-    if request.user.is_authenticated:
-        view_mode = request.user.profile.view_preferences.get("category_list", "grid")
-    else:
-        view_mode = request.session.get("view_mode_category_list", "grid")
+    view_mode = get_view_mode(request, "category_list")
 
     return render(
         request,
@@ -839,60 +942,81 @@ def delete_account_view(request):
 
 def user_public_catalog(request, username):
     catalog_user = get_object_or_404(User, username=username)
+
+    # Captura de filtros
+    q = request.GET.get("q", "")
+    category_id = request.GET.get("category", "")
+    min_price = request.GET.get("min_price", "")
+    max_price = request.GET.get("max_price", "")
+    min_stock = request.GET.get("min_stock", "")
+    max_stock = request.GET.get("max_stock", "")
+
+    # Sem ordenação escolhida, os produtos mais relevantes para a busca (ou,
+    # sem busca, os mais recentes) aparecem primeiro
+    sort_field = request.GET.get("sort", "relevance" if q else "created")
+    sort_direction = request.GET.get(
+        "dir",
+        "desc" if sort_field in ("relevance", "created") else "asc",
+    )
+
+    # QuerySet Inicial
     products = Product.objects.filter(user=catalog_user, is_public=True)
 
-    q = request.GET.get("q")
+    # Filtros
     if q:
-        products = products.filter(name__icontains=q) | products.filter(
-            description__icontains=q
-        )
-
-    category_id = request.GET.get("category")
+        products = search_products(products, q)
     if category_id:
-        products = products.filter(categories=category_id)
-
-    min_price = request.GET.get("min_price")
-    max_price = request.GET.get("max_price")
+        products = products.filter(categories__id=category_id)
     if min_price:
         products = products.filter(price__gte=min_price)
     if max_price:
         products = products.filter(price__lte=max_price)
-
-    min_stock = request.GET.get("min_stock")
-    max_stock = request.GET.get("max_stock")
     if min_stock:
         products = products.filter(stock__gte=min_stock)
     if max_stock:
         products = products.filter(stock__lte=max_stock)
 
-    products = products.distinct().order_by("-created_at")
+    # Ordenação com Annotate
+    products, ordering = sort_queryset(
+        products,
+        search_sorts(products, q, CATALOG_SORTS),
+        sort_field,
+        sort_direction,
+        "created",
+    )
 
-    stats = {
-        "total_count": products.count(),
-        "total_stock": sum(p.stock for p in products),
-        "total_value": sum(p.price * p.stock for p in products),
-    }
+    # Distinct final (apenas com a junção M2M de categorias)
+    if category_id:
+        products = products.distinct()
+
+    def build_page():
+        page = keyset_paginate(request, products.for_listing(), ordering)
+        return {
+            "page": cached_page_state(page),
+            "categories": [
+                cached_category(category)
+                for category in Category.objects.filter(user=catalog_user)
+            ],
+            # Estatísticas em uma única consulta agregada
+            "stats": InventorySummary.totals(products),
+        }
 
-    # Determine view mode
-    view_mode = "grid"
-    if request.user.is_authenticated:
-        view_mode = request.user.profile.view_preferences.get(
-            "user_public_catalog", "grid"
-        )
-    else:
-        view_mode = request.session.get("view_mode_user_public_catalog", "grid")
+    # Consultas guardadas no cache até a próxima alteração no catálogo
+    data = cached_page(request, user_scope(catalog_user.pk), build_page)
+
+    view_mode = get_view_mode(request, "user_public_catalog")
 
     return render(
         request,
         "products/product_list.html",
         {
-            "products": products,
-            "categories": Category.objects.filter(user=catalog_user),
-            "stats": stats,
+            "products": KeysetPage.restore(data["page"], ordering, request),
+            "categories": data["categories"],
+            "stats": data["stats"],
             "title": f"Catálogo de {catalog_user.username}",
             "is_public_view": True,
             "q": q,
-            "category_id": request.GET.get("category", ""),
+            "category_id": category_id,
             "min_price": min_price,
             "max_price": max_price,
             "min_stock": min_stock,
@@ -912,17 +1036,18 @@ def public_product_list(request):
     min_stock = request.GET.get("min_stock", "")
     max_stock = request.GET.get("max_stock", "")
 
-    # Parâmetros de Ordenação
-    sort_field = request.GET.get("sort", "name")
-    sort_direction = request.GET.get("dir", "asc")
-    prefix = "" if sort_direction == "asc" else "-"
+    # Parâmetros de Ordenação (com busca, o padrão é a relevância)
+    sort_field = request.GET.get("sort", "relevance" if q else "name")
+    sort_direction = request.GET.get(
+        "dir", "desc" if sort_field == "relevance" else "asc"
+    )
 
     # QuerySet Inicial
     products = Product.objects.filter(is_public=True)
 
     # Filtros
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(description__icontains=q))
+        products = search_products(products, q)
     if category_id:
         products = products.filter(categories__id=category_id)
     if min_price:
@@ -935,46 +1060,44 @@ def public_product_list(request):
         products = products.filter(stock__lte=max_stock)
 
     # Ordenação com Annotate
-    if sort_field == "category":
-        products = products.annotate(sort_key=Min("categories__name")).order_by(
-            f"{prefix}sort_key"
-        )
-    elif sort_field == "user":
-        products = products.order_by(f"{prefix}user__username")
-    else:
-        valid_fields = {"name": "name", "price": "price", "stock": "stock"}
-        target = valid_fields.get(sort_field, "name")
-        products = products.order_by(f"{prefix}{target}")
-
-    # Distinct final
-    products = products.distinct()
-
-    # Estatísticas
-    stats = {
-        "total_count": products.count(),
-        "total_stock": products.aggregate(Sum("stock"))["stock__sum"] or 0,
-        "total_value": products.annotate(
-            val=ExpressionWrapper(F("price") * F("stock"), output_field=DecimalField())
-        ).aggregate(total=Sum("val"))["total"]
-        or 0,
-    }
+    products, ordering = sort_queryset(
+        products,
+        search_sorts(products, q, PUBLIC_SORTS),
+        sort_field,
+        sort_direction,
+        "name",
+    )
 
-    # Determine view mode
-    view_mode = "grid"
-    if request.user.is_authenticated:
-        view_mode = request.user.profile.view_preferences.get(
-            "public_product_list", "grid"
-        )
-    else:
-        view_mode = request.session.get("view_mode_public_product_list", "grid")
+    # Distinct final (apenas com a junção M2M de categorias)
+    if category_id:
+        products = products.distinct()
+
+    def build_page():
+        page = keyset_paginate(request, products.for_listing(), ordering)
+        return {
+            "page": cached_page_state(page),
+            "categories": [
+                cached_category(category)
+                for category in Category.objects.filter(
+                    products__is_public=True
+                ).distinct()
+            ],
+            # Estatísticas em uma única consulta agregada
+            "stats": InventorySummary.totals(products),
+        }
+
+    # Consultas guardadas no cache até a próxima alteração no catálogo
+    data = cached_page(request, PUBLIC_SCOPE, build_page)
+
+    view_mode = get_view_mode(request, "public_product_list")
 
     return render(
         request,
         "products/product_list.html",
         {
-            "products": products,
-            "categories": Category.objects.filter(products__is_public=True).distinct(),
-            "stats": stats,
+            "products": KeysetPage.restore(data["page"], ordering, request),
+            "categories": data["categories"],
+            "stats": data["stats"],
             "title": "Catálogo Público",
             "is_public_view": True,
             "q": q,
@@ -994,9 +1117,7 @@ def toggle_theme(request):
     new_theme = "dark" if current_theme == "light" else "light"
     request.session["theme"] = new_theme
     if request.user.is_authenticated:
-        profile = request.user.profile
-        profile.theme = new_theme
-        profile.save()
+        Profile.set_theme(request.user, new_theme)
     return redirect(request.META.get("HTTP_REFERER", "/"))
 
 
@@ -1017,12 +1138,7 @@ def logout_view(request):
 def set_view_mode(request, context, mode):
     if mode in ["grid", "table"]:
         if request.user.is_authenticated:
-            profile = request.user.profile
-            # Ensure view_preferences is a dict
-            if not isinstance(profile.view_preferences, dict):
-                profile.view_preferences = {}
-            profile.view_preferences[context] = mode
-            profile.save()
+            Profile.set_view_preference(request.user, context, mode)
         else:
             request.session[f"view_mode_{context}"] = mode
     return redirect(request.META.get("HTTP_REFERER", "/"))